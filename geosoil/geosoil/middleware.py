@@ -0,0 +1,43 @@
+"""Compression of the API payloads (production profile)."""
+import re
+
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+ACCEPTS_BROTLI = re.compile(r"\bbr\b")
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """Brotli when the client accepts it, gzip otherwise, for ``COMPRESS_CONTENT_TYPES`` only.
+
+    HTML pages are left as they are: they carry the CSRF token (BREACH).
+    Streaming responses (GeoJSON, SSE excluded by type) go through gzip.
+    """
+
+    def process_response(self, request, response):
+        content_type = response.get("Content-Type", "").split(";")[0].strip()
+        if response.has_header("Content-Encoding") or content_type not in settings.COMPRESS_CONTENT_TYPES:
+            return response
+        accepted = request.META.get("HTTP_ACCEPT_ENCODING", "")
+        if brotli is None or response.streaming or not ACCEPTS_BROTLI.search(accepted):
+            return super().process_response(request, response)
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        if len(response.content) < 200:
+            return response
+        compressed = brotli.compress(response.content, quality=settings.BROTLI_QUALITY)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response["Content-Length"] = str(len(compressed))
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response["ETag"] = "W/" + etag
+        response["Content-Encoding"] = "br"
+        return response
@@ -160,3 +160,61 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Google Earth Engine
+# Service account (headless, preferred in the gunicorn/cron containers) or an
+# authorized-user token file. See soils/earth_engine.py.
+EE_SERVICE_ACCOUNT = os.getenv('EE_SERVICE_ACCOUNT', '')
+EE_PRIVATE_KEY_FILE = os.getenv('EE_PRIVATE_KEY_FILE', '')
+EE_PROJECT = os.getenv('EE_PROJECT', '')
+EE_TOKEN_FILE = os.getenv('EE_TOKEN_FILE', str(BASE_DIR / 'token.json'))
+EE_CREDENTIALS_FILE = os.getenv('EE_CREDENTIALS_FILE', str(BASE_DIR / 'credentials.json'))
+# refresh the access token this many seconds before it expires
+EE_REFRESH_MARGIN = int(os.getenv('EE_REFRESH_MARGIN', '300'))
+
+
+# SOC models (PyTorch MLP + joblib preprocessing), mounted from ./models
+SOC_MODELS_DIR = Path(os.getenv('SOC_MODELS_DIR', '/models'))
+# torch intra-op threads per gunicorn worker
+SOC_TORCH_THREADS = int(os.getenv('SOC_TORCH_THREADS', '1'))
+# registered versions live in SOC_MODELS_DIR/registry/<version>; workers poll
+# the promoted version this often and swap it in without a restart
+SOC_MODEL_CHECK_SECONDS = float(os.getenv('SOC_MODEL_CHECK_SECONDS', '10'))
+# model versions kept loaded per worker (live, shadow, A/B)
+SOC_MODEL_CACHE_SIZE = int(os.getenv('SOC_MODEL_CACHE_SIZE', '3'))
+
+
+# Wall-to-wall SOC maps (manage.py build_soc_rasters)
+# one single-band raster per model feature, e.g. B4.tif, SR_B5.tif
+SOC_COVARIATES_DIR = Path(os.getenv('SOC_COVARIATES_DIR', '/data/covariates'))
+# the map reads soc10.tif / soc30.tif from here
+SOC_RASTER_DIR = Path(os.getenv('SOC_RASTER_DIR', str(BASE_DIR / 'static' / 'data')))
+SOC_RASTER_WORK_DIR = Path(os.getenv('SOC_RASTER_WORK_DIR', '/data/soc_tiles'))
+
+# a purge job (soils.purge) silent for this long lost its thread (worker
+# recycled or killed) and is restarted by the next purge request
+PURGE_STALE_SECONDS = int(os.getenv('PURGE_STALE_SECONDS', '600'))
+
+# rendered map tiles, one directory per layer and raster version
+# (<layer>/<mtime>/<z>/<x>/<y>.<fmt>); older versions are removed
+SOC_TILE_DIR = Path(os.getenv('SOC_TILE_DIR', '/tmp/geosoil-xyz'))
+
+# the "tiles" cache holds raster stats, zonal stats and point blobs, on disk so
+# every gunicorn worker shares it; entries are keyed by raster / prediction
+# version. The file cache lists its directory on every set() to cull, so it
+# is kept small: expiring entries, no tiles.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'tiles': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('SOC_TILE_CACHE_DIR', '/tmp/geosoil-tiles'),
+        'TIMEOUT': 7 * 24 * 3600,
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
+
+# fitted preprocessing cached by data hash (manage.py train_soc_models)
+SOC_TRAINING_CACHE_DIR = Path(os.getenv('SOC_TRAINING_CACHE_DIR', '/data/soc_training_cache'))
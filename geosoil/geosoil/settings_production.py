@@ -0,0 +1,99 @@
+"""Production profile: ``DJANGO_SETTINGS_MODULE=geosoil.settings_production``.
+
+Same project settings, plus:
+
+- no DEBUG (which keeps every SQL query of a request in memory), secrets and
+  hosts from the environment;
+- database connections reused: Django's psycopg 3 pool (``DB_POOL=1``,
+  default) or persistent connections (``DB_POOL=0``, ``CONN_MAX_AGE``);
+- static files served by WhiteNoise, hashed names cached forever, gzip and
+  brotli precompressed at collectstatic;
+- brotli/gzip compression of the API payloads (``geosoil.middleware``).
+
+Gunicorn itself is tuned in ``gunicorn.conf.py``.
+"""
+import os
+
+from whitenoise.compress import Compressor
+
+from .settings import *  # noqa: F401,F403
+from .settings import DATABASES, MIDDLEWARE
+
+DEBUG = False
+SECRET_KEY = os.environ['DJANGO_SECRET_KEY']
+ALLOWED_HOSTS = [h.strip() for h in os.getenv('ALLOWED_HOSTS', 'localhost').split(',') if h.strip()]
+CSRF_TRUSTED_ORIGINS = [o for o in os.getenv('CSRF_TRUSTED_ORIGINS', '').split(',') if o]
+
+
+# Database connections
+# The pool (psycopg 3) is per worker process. Its size is the number of
+# connections one worker may hold at the same time:
+# - WSGI (gthread): one per request thread, plus the background threads
+#   (purge jobs, model swap) -> GUNICORN_THREADS + DB_POOL_BACKGROUND;
+# - ASGI (uvicorn): one per in-flight request, each request running its ORM
+#   calls in its own thread -> the expected concurrency, ASGI_CONCURRENCY.
+#   job_events gives its connection back between two polls.
+# Keep workers x DB_POOL_MAX under PostgreSQL's max_connections (100 by default).
+ASGI = 'uvicorn' in os.getenv('GUNICORN_WORKER_CLASS', '').lower()
+if ASGI:
+    DB_POOL_SIZE = int(os.getenv('ASGI_CONCURRENCY', '20'))
+else:
+    DB_POOL_SIZE = int(os.getenv('GUNICORN_THREADS', '4')) + int(os.getenv('DB_POOL_BACKGROUND', '2'))
+
+if os.getenv('DB_POOL', '1') == '1':
+    DATABASES['default']['CONN_MAX_AGE'] = 0  # required by the pool
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': int(os.getenv('DB_POOL_MIN', '2')),
+            'max_size': int(os.getenv('DB_POOL_MAX', DB_POOL_SIZE)),
+            'timeout': float(os.getenv('DB_POOL_TIMEOUT', '10')),
+        },
+    }
+elif ASGI:
+    # persistent connections are per thread, and ASGI requests do not reuse threads
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+else:
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.getenv('CONN_MAX_AGE', '60'))
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+
+
+# Static files
+MIDDLEWARE = list(MIDDLEWARE)
+MIDDLEWARE.insert(MIDDLEWARE.index('django.middleware.security.SecurityMiddleware') + 1,
+                  'whitenoise.middleware.WhiteNoiseMiddleware')
+MIDDLEWARE.insert(MIDDLEWARE.index('whitenoise.middleware.WhiteNoiseMiddleware') + 1,
+                  'geosoil.middleware.CompressionMiddleware')
+
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    # hashed names (served with a one-year immutable Cache-Control) + .gz/.br
+    'staticfiles': {'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage'},
+}
+# a {% static %} of a file missing from the manifest falls back to its plain name
+WHITENOISE_MANIFEST_STRICT = False
+# plain (unhashed) names, e.g. static/data/soc10.tif fetched directly: the
+# rasters are rebuilt in place, so only the hashed copies are cached forever
+WHITENOISE_MAX_AGE = int(os.getenv('STATIC_MAX_AGE', '3600'))
+# the COG rasters are already deflate-compressed
+WHITENOISE_SKIP_COMPRESS_EXTENSIONS = list(Compressor.SKIP_COMPRESS_EXTENSIONS) + ['tif', 'tiff']
+
+# API payloads compressed by geosoil.middleware.CompressionMiddleware
+COMPRESS_CONTENT_TYPES = (
+    'application/json',
+    'application/geo+json',
+    'application/octet-stream',
+    'text/csv',
+)
+BROTLI_QUALITY = int(os.getenv('BROTLI_QUALITY', '5'))
+
+
+SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
+SESSION_COOKIE_SECURE = os.getenv('SECURE_COOKIES', '1') == '1'
+CSRF_COOKIE_SECURE = SESSION_COOKIE_SECURE
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {'console': {'class': 'logging.StreamHandler'}},
+    'root': {'handlers': ['console'], 'level': os.getenv('LOG_LEVEL', 'INFO')},
+}
@@ -0,0 +1,26 @@
+"""Gunicorn settings (``gunicorn -c gunicorn.conf.py``), overridable from the environment.
+
+Defaults: one worker per core plus one, four threads each (``gthread``),
+the application preloaded in the master so the workers share its imported
+modules, and workers recycled after ``max_requests`` to bound memory. The
+ASGI service sets ``GUNICORN_WORKER_CLASS=uvicorn_worker.UvicornWorker``.
+"""
+import multiprocessing
+import os
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("GUNICORN_WORKERS", multiprocessing.cpu_count() + 1))
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+# development only: reloading and preloading exclude each other
+reload = os.getenv("GUNICORN_RELOAD", "0") == "1"
+if reload:
+    preload_app = False
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "2000"))
+max_requests_jitter = max_requests // 10
+accesslog = "-"
@@ -1,41 +1,266 @@
+import json
+
 from django.contrib import admin
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.gis.geos import Polygon
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import Count, IntegerField, Max, OuterRef, QuerySet, Subquery
+from django.utils.functional import cached_property
 
+from . import stats
 from .models import (
     SoilProfile,
     Layer,
     ProfileProperty,
     LayerProperty,
     Source,
-    Property
-
+    Property,
+    RemoteSensingFeature,
+    SamplingAttempt,
+    RefreshRun,
+    SocPrediction,
+    SocExplanationSet,
+    SocModelVersion,
+    Zone,
+    TrainingTrial,
+    PropertySet,
+    HarmonizedValue,
+    PurgeJob,
 )
 
 
+# below this many rows (planner estimate) the changelists still show an exact count
+EXACT_COUNT_LIMIT = 20000
+
+
+def estimated_rows(queryset: QuerySet):
+    """PostgreSQL row estimate of ``queryset``: table statistics, or the plan when filtered."""
+    with connection.cursor() as cursor:
+        if not queryset.query.where:
+            cursor.execute("SELECT reltuples FROM pg_class WHERE oid = %s::regclass", [queryset.model._meta.db_table])
+            row = cursor.fetchone()
+            # -1 (or 0) until the table has been analysed
+            return int(row[0]) if row and row[0] > 0 else None
+        sql, params = queryset.order_by().query.sql_with_params()
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+class EstimatedCountPaginator(Paginator):
+    """Exact ``COUNT(*)`` on small results, the planner's estimate on large ones."""
+
+    @cached_property
+    def count(self):
+        if isinstance(self.object_list, QuerySet):
+            estimate = estimated_rows(self.object_list)
+            if estimate is not None and estimate >= EXACT_COUNT_LIMIT:
+                return estimate
+        return super().count
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    # the "N total" link runs an unfiltered COUNT(*) on every page view
+    show_full_result_count = False
+
+
+class BBoxListFilter(admin.SimpleListFilter):
+    """``?bbox=xmin,ymin,xmax,ymax`` (EPSG:4326), set from the changelist map."""
+
+    title = "emprise"
+    parameter_name = "bbox"
+    field = "location"
+
+    def lookups(self, request, model_admin):
+        # no fixed choices: the filter is listed (and can be cleared) only while active
+        value = request.GET.get(self.parameter_name)
+        return [(value, "sélection sur la carte")] if value else ()
+
+    def queryset(self, request, queryset):
+        if not self.value():
+            return queryset
+        try:
+            bbox = Polygon.from_bbox([float(v) for v in self.value().split(",")])
+        except (TypeError, ValueError):
+            raise IncorrectLookupParameters("bbox must be xmin,ymin,xmax,ymax")
+        bbox.srid = 4326
+        return queryset.filter(**{f"{self.field}__within": bbox})
+
+
 @admin.register(SoilProfile)
-class SoilProfileAdmin(admin.ModelAdmin):
-    list_display = ("profile_id", "code", "created_at","teledection_data")
-    search_fields = ("profile_id","source__name")
-    list_filter=("source",)
+class SoilProfileAdmin(LargeTableAdmin):
+    list_display = ("profile_id", "code", "source", "created_at", "remote_sensing")
+    list_select_related = ("source",)
+    # prefix searches, served by the upper(...) text_pattern_ops indexes
+    search_fields = ("^code", "^profile_id")
+    list_filter = ("source", BBoxListFilter)
+    change_list_template = "admin/soils/soilprofile/change_list.html"
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        if request.resolver_match and request.resolver_match.url_name.endswith("changelist"):
+            # bands per sensor from the feature store (teledection_data is no longer written);
+            # correlated subqueries, evaluated for the rows of the page only
+            bands = RemoteSensingFeature.objects.filter(profile=OuterRef("pk"), derived=False).order_by()
+            queryset = queryset.defer("teledection_data").annotate(
+                last_window=Subquery(bands.values("profile").annotate(at=Max("window_end")).values("at")),
+                **{
+                    f"bands_{sensor}": Subquery(
+                        bands.filter(sensor=sensor).values("profile").annotate(n=Count("pk")).values("n"),
+                        output_field=IntegerField(),
+                    )
+                    for sensor, _ in RemoteSensingFeature.SENSORS
+                },
+            )
+        return queryset
+
+    @admin.display(description="remote sensing")
+    def remote_sensing(self, obj):
+        if hasattr(obj, "last_window"):
+            counts = {sensor: getattr(obj, f"bands_{sensor}") for sensor, _ in RemoteSensingFeature.SENSORS}
+            last_window = obj.last_window
+        else:
+            bands = obj.features.filter(derived=False)
+            counts = dict(bands.values_list("sensor").annotate(n=Count("pk")).order_by())
+            last_window = bands.aggregate(at=Max("window_end"))["at"]
+        summary = ", ".join(f"{sensor} {n}" for sensor, n in counts.items() if n)
+        if not summary:
+            return "-"
+        return f"{summary} (→ {last_window})" if last_window else summary
 
 
 @admin.register(Layer)
-class LayerAdmin(admin.ModelAdmin):
+class LayerAdmin(LargeTableAdmin):
     list_display = ("profile", "name", "depth_top", "depth_bottom")
+    list_select_related = ("profile",)
+    raw_id_fields = ("profile",)
 
 
 @admin.register(ProfileProperty)
-class ProfilePropertyAdmin(admin.ModelAdmin):
-    list_display = ("profile", "name", "value", "unit")
+class ProfilePropertyAdmin(LargeTableAdmin):
+    list_display = ("profile", "name", "value", "value_num", "value_date", "unit")
+    list_select_related = ("profile",)
+    raw_id_fields = ("profile", "property")
+    readonly_fields = ("value_num", "value_date")
 
 
 @admin.register(LayerProperty)
-class LayerPropertyAdmin(admin.ModelAdmin):
-    list_display = ("layer", "name", "value", "unit")
+class LayerPropertyAdmin(LargeTableAdmin):
+    list_display = ("layer", "name", "value", "value_num", "value_date", "unit")
+    list_select_related = ("layer__profile",)
+    raw_id_fields = ("layer",)
+    readonly_fields = ("value_num", "value_date")
+
+
+@admin.register(RemoteSensingFeature)
+class RemoteSensingFeatureAdmin(LargeTableAdmin):
+    list_display = ("profile", "sensor", "band", "value", "window_start", "window_end")
+    list_select_related = ("profile",)
+    list_filter = ("sensor",)
+    raw_id_fields = ("profile",)
+
+
+@admin.register(SamplingAttempt)
+class SamplingAttemptAdmin(LargeTableAdmin):
+    list_display = ("profile", "sensor", "window_start", "failures", "attempted_at", "retry_at")
+    list_select_related = ("profile",)
+    list_filter = ("sensor",)
+    raw_id_fields = ("profile",)
+
+
+@admin.register(RefreshRun)
+class RefreshRunAdmin(admin.ModelAdmin):
+    list_display = (
+        "started_at", "profiles_processed", "requests_made", "cache_hits",
+        "features_written", "errors", "wall_time",
+    )
+    readonly_fields = [f.name for f in RefreshRun._meta.fields]
+
+
+@admin.register(SocPrediction)
+class SocPredictionAdmin(LargeTableAdmin):
+    list_display = ("profile", "model_version", "soc10", "soc30", "predicted_at")
+    list_select_related = ("profile",)
+    list_filter = ("model_version",)
+    raw_id_fields = ("profile",)
+
+
+@admin.register(SocModelVersion)
+class SocModelVersionAdmin(admin.ModelAdmin):
+    # promotion goes through manage.py soc_models (one live / one shadow)
+    list_display = ("version", "role", "created_at", "promoted_at", "notes")
+    list_filter = ("role",)
+    readonly_fields = [f.name for f in SocModelVersion._meta.fields if f.name != "notes"]
+
+
+@admin.register(SocExplanationSet)
+class SocExplanationSetAdmin(admin.ModelAdmin):
+    list_display = ("model_version", "expected10", "expected30", "created_at", "updated_at")
+    readonly_fields = [f.name for f in SocExplanationSet._meta.fields]
+
+
+@admin.register(Zone)
+class ZoneAdmin(admin.ModelAdmin):
+    list_display = ("name", "kind", "created_at")
+    list_filter = ("kind",)
+    search_fields = ("name",)
+
+
+@admin.register(TrainingTrial)
+class TrainingTrialAdmin(admin.ModelAdmin):
+    list_display = (
+        "study", "number", "state", "value", "r2", "rmse", "feature_set", "epochs", "duration",
+    )
+    list_filter = ("study", "state", "target")
+    readonly_fields = [f.name for f in TrainingTrial._meta.fields]
+
+
+@admin.register(PropertySet)
+class PropertySetAdmin(admin.ModelAdmin):
+    # tables are created and refreshed by manage.py property_pivots
+    list_display = ("name", "level", "refreshed_at", "created_at")
+    list_filter = ("level",)
+    readonly_fields = [f.name for f in PropertySet._meta.fields if f.name != "description"]
+
+
+@admin.register(HarmonizedValue)
+class HarmonizedValueAdmin(LargeTableAdmin):
+    # computed by manage.py harmonize_layers
+    list_display = ("profile", "variable", "method", "depth_top", "depth_bottom", "value", "computed_at")
+    list_select_related = ("profile",)
+    list_filter = ("method", "variable", "depth_top")
+    raw_id_fields = ("profile",)
+    readonly_fields = [f.name for f in HarmonizedValue._meta.fields]
+
+
+@admin.register(PurgeJob)
+class PurgeJobAdmin(admin.ModelAdmin):
+    list_display = ("created_at", "source", "scope", "status", "deleted", "total", "finished_at")
+    list_filter = ("status", "scope")
+    readonly_fields = [f.name for f in PurgeJob._meta.fields]
 
 
 @admin.register(Source)
 class SourceAdmin(admin.ModelAdmin):
-    list_display = ("name", "description", "url")
+    list_display = ("name", "description", "url", "profile_count", "layer_count", "imported_at")
+    list_select_related = ("stats",)
+    actions = ["refresh_stats"]
+
+    @admin.display(description="layers")
+    def layer_count(self, obj):
+        return getattr(getattr(obj, "stats", None), "layer_count", None)
+
+    @admin.display(description="imported at")
+    def imported_at(self, obj):
+        return getattr(getattr(obj, "stats", None), "imported_at", None)
+
+    @admin.action(description="Refresh the statistics")
+    def refresh_stats(self, request, queryset):
+        stats.refresh(queryset)
 
 @admin.register(Property)
 class PropertyAdmin(admin.ModelAdmin):
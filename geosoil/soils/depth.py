@@ -0,0 +1,284 @@
+"""Depth harmonisation of the layer values over standard intervals.
+
+Two methods, both run on every profile at once from flat, profile-sorted layer
+arrays:
+
+``overlap``
+    Thickness-weighted mean of the horizons overlapping the interval, with
+    grouped sums (``np.add.reduceat``).
+``spline``
+    Equal-area quadratic spline (Bishop et al., 1999; ``mpspline`` in R).
+    Profiles are grouped by their number of horizons, and each group's
+    linear systems are solved as one stacked ``np.linalg.solve``. Interval
+    means are the exact integrals of the spline pieces.
+
+An interval that is not fully covered by the profile's horizons is NaN. With
+``extensive=True`` the layer value is an amount over the horizon (a stock):
+it is spread per cm and the interval result is the amount over the interval.
+
+The engine only needs NumPy; :func:`refresh_harmonized` reads the ``Layer``
+table and stores :class:`~soils.models.HarmonizedValue` rows, recomputing only
+the profiles whose layers or run parameters (intervals, ``lam``,
+``extensive``) changed.
+"""
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+METHODS = ("spline", "overlap")
+# SocPrediction: soc10 is 0-10 cm, soc30 is 10-30 cm
+INTERVALS = ((0, 10), (10, 30))
+DEPTH_TARGETS = {"SOC_10": (0, 10), "SOC_30": (10, 30)}
+VARIABLE = "carbon_content"
+LAMBDA = 0.1
+
+
+def _groups(pids: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """``(profile_ids, starts, counts)`` of a profile-sorted id array."""
+    profile_ids, starts, counts = np.unique(pids, return_index=True, return_counts=True)
+    return profile_ids, starts, counts
+
+
+def overlap_means(pids, top, bottom, y, intervals=INTERVALS, extensive=False):
+    """``(profile_ids, values (P, K))`` by thickness-weighted overlap."""
+    profile_ids, starts, _ = _groups(pids)
+    density = y / (bottom - top) if extensive else y
+    values = np.full((len(profile_ids), len(intervals)), np.nan)
+    for k, (a, b) in enumerate(intervals):
+        w = np.clip(np.minimum(bottom, b) - np.maximum(top, a), 0, None)
+        covered = np.add.reduceat(w, starts)
+        total = np.add.reduceat(w * density, starts)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            values[:, k] = total if extensive else total / covered
+        values[covered < (b - a) - 1e-6, k] = np.nan
+    return profile_ids, values
+
+
+def _spline_pieces(U, V, Y, lam):
+    """Quadratic pieces ``(origin, lo, hi, c0, c1, c2)``, each ``(P, 2n - 1)``.
+
+    ``U``/``V``/``Y`` are ``(P, n)`` tops, bottoms and values of profiles with
+    ``n`` contiguous-or-gapped, non-overlapping horizons. The first ``n``
+    pieces are the horizons, the others the linear segments across the gaps.
+    """
+    P, n = Y.shape
+    delta = V - U
+    if n == 1:
+        zeros = np.zeros_like(Y)
+        return U, U, V, Y, zeros, zeros
+
+    m = n - 1
+    gap = U[:, 1:] - V[:, :-1]
+    R = np.zeros((P, m, m))
+    idx = np.arange(m)
+    R[:, idx, idx] = 2 * (delta[:, :-1] + delta[:, 1:]) + 6 * gap
+    R[:, idx[:-1], idx[1:]] = delta[:, 1:-1]
+    R[:, idx[1:], idx[:-1]] = delta[:, 1:-1]
+    Q = np.zeros((m, n))
+    Q[idx, idx] = -1
+    Q[idx, idx + 1] = 1
+
+    RinvQ = np.linalg.solve(R, np.broadcast_to(Q, (P, m, n)))
+    Z = 6 * n * lam * np.einsum("ji,pjk->pik", Q, RinvQ)
+    sbar = np.linalg.solve(np.eye(n) + Z, Y[..., None])[..., 0]
+    b = 6 * np.einsum("pij,pj->pi", RinvQ, sbar)
+
+    b0 = np.concatenate([np.zeros((P, 1)), b], axis=1)
+    b1 = np.concatenate([b, np.zeros((P, 1))], axis=1)
+    gamma = (b1 - b0) / (2 * delta)
+    alfa = sbar - b0 * delta / 2 - gamma * delta ** 2 / 3
+
+    # across a gap the spline is linear, with slope b1 from the horizon above
+    f_bottom = (alfa + b0 * delta + gamma * delta ** 2)[:, :-1]
+    origin = np.concatenate([U, V[:, :-1]], axis=1)
+    lo = origin
+    hi = np.concatenate([V, U[:, 1:]], axis=1)
+    c0 = np.concatenate([alfa, f_bottom], axis=1)
+    c1 = np.concatenate([b0, b], axis=1)
+    c2 = np.concatenate([gamma, np.zeros((P, m))], axis=1)
+    return origin, lo, hi, c0, c1, c2
+
+
+def _integrate(pieces, a: float, b: float) -> np.ndarray:
+    origin, lo, hi, c0, c1, c2 = pieces
+    t0 = np.clip(a, lo, hi) - origin
+    t1 = np.clip(b, lo, hi) - origin
+
+    def F(t):
+        return c0 * t + c1 * t ** 2 / 2 + c2 * t ** 3 / 3
+
+    return (F(t1) - F(t0)).sum(axis=1)
+
+
+def spline_means(pids, top, bottom, y, intervals=INTERVALS, extensive=False, lam: float = LAMBDA):
+    """``(profile_ids, values (P, K))`` from the equal-area spline.
+
+    Profiles with overlapping horizons get NaN.
+    """
+    profile_ids, starts, counts = _groups(pids)
+    values = np.full((len(profile_ids), len(intervals)), np.nan)
+    y = y / (bottom - top) if extensive else y
+    for n in np.unique(counts):
+        rows = np.flatnonzero(counts == n)
+        index = starts[rows][:, None] + np.arange(n)
+        U, V, Y = top[index], bottom[index], y[index]
+        valid = (U[:, 1:] >= V[:, :-1] - 1e-9).all(axis=1) if n > 1 else np.ones(len(rows), bool)
+        if not valid.any():
+            continue
+        rows, U, V, Y = rows[valid], U[valid], V[valid], Y[valid]
+        pieces = _spline_pieces(U, V, Y, lam)
+        for k, (a, b) in enumerate(intervals):
+            total = _integrate(pieces, a, b)
+            result = total if extensive else total / (b - a)
+            # the fitted profile is only defined between the first top and last bottom
+            result[(a < U[:, 0] - 1e-9) | (b > V[:, -1] + 1e-9)] = np.nan
+            values[rows, k] = np.maximum(result, 0)
+    return profile_ids, values
+
+
+def harmonize(pids, top, bottom, y, method: str = "spline", intervals=INTERVALS,
+              extensive: bool = False, lam: float = LAMBDA):
+    """Harmonised ``(profile_ids, values (P, len(intervals)))``.
+
+    Arrays are flat per layer and sorted by profile then top depth. Layers
+    with a missing value or a non-positive thickness must be removed first.
+    """
+    pids = np.asarray(pids, dtype=np.int64)
+    top, bottom, y = (np.asarray(a, dtype=np.float64) for a in (top, bottom, y))
+    if not len(pids):
+        return np.empty(0, np.int64), np.empty((0, len(intervals)))
+    if method == "overlap":
+        return overlap_means(pids, top, bottom, y, intervals, extensive)
+    if method == "spline":
+        return spline_means(pids, top, bottom, y, intervals, extensive, lam)
+    raise ValueError(f"unknown method {method}")
+
+
+# ---------------------------------------------------------------------------
+# database
+
+def layer_arrays(profiles: Optional[Sequence[int]] = None, variable: str = VARIABLE):
+    """Flat ``(pids, top, bottom, y)`` of the usable layers, profile/top sorted."""
+    from django.db.models import F
+
+    from .models import Layer
+
+    qs = Layer.objects.filter(**{f"{variable}__isnull": False}, depth_bottom__gt=F("depth_top"))
+    if profiles is not None:
+        qs = qs.filter(profile_id__in=profiles)
+    rows = list(qs.order_by("profile_id", "depth_top").values_list("profile_id", "depth_top", "depth_bottom", variable))
+    if not rows:
+        return np.empty(0, np.int64), np.empty(0), np.empty(0), np.empty(0)
+    pids, top, bottom, y = zip(*rows)
+    return (np.array(pids, dtype=np.int64), np.array(top, dtype=np.float64),
+            np.array(bottom, dtype=np.float64), np.array(y, dtype=np.float64))
+
+
+def run_params(method: str, intervals: Sequence[Tuple[int, int]], extensive: bool, lam: float) -> str:
+    """Parameters a stored value depends on besides the layers, e.g. ``0-10,10-30;lambda=0.1``."""
+    text = ",".join(f"{a}-{b}" for a, b in intervals)
+    if method == "spline":
+        text += f";lambda={lam:g}"
+    return text + (";extensive" if extensive else "")
+
+
+def changed_profiles(variable: str = VARIABLE, method: str = "spline", params: str = "") -> Tuple[List[int], List[int]]:
+    """``(to_compute, to_delete)``: profiles whose layers or ``params`` changed since the stored values."""
+    from django.db.models import Count, Max, Min
+
+    from .models import HarmonizedValue, Layer
+
+    current = {
+        row["profile_id"]: (row["at"], row["n"], params, params)
+        for row in Layer.objects.filter(**{f"{variable}__isnull": False})
+        .values("profile_id").annotate(at=Max("updated_at"), n=Count("pk"))
+    }
+    stored = {
+        row["profile_id"]: (row["at"], row["n"], row["p_min"], row["p_max"])
+        for row in HarmonizedValue.objects.filter(variable=variable, method=method)
+        .values("profile_id").annotate(
+            at=Max("layers_at"), n=Max("layer_count"), p_min=Min("params"), p_max=Max("params")
+        )
+    }
+    to_compute = [pk for pk, state in current.items() if stored.get(pk) != state]
+    to_delete = [pk for pk in stored if pk not in current]
+    return sorted(to_compute), to_delete
+
+
+def refresh_harmonized(
+    method: str = "spline",
+    intervals: Sequence[Tuple[int, int]] = INTERVALS,
+    variable: str = VARIABLE,
+    extensive: bool = False,
+    lam: float = LAMBDA,
+    full: bool = False,
+) -> Dict[str, int]:
+    """Recompute and store the harmonised values of the changed profiles.
+
+    A recomputed profile's previous rows are replaced, so values of intervals
+    that are no longer requested do not linger.
+    """
+    from django.db import transaction
+    from django.db.models import Count, Max
+
+    from .models import HarmonizedValue, Layer
+
+    params = run_params(method, intervals, extensive, lam)
+    if full:
+        profiles = None
+        to_delete: List[int] = []
+    else:
+        profiles, to_delete = changed_profiles(variable, method, params)
+        if not profiles and not to_delete:
+            return {"profiles": 0, "values": 0, "deleted": 0}
+
+    pids, top, bottom, y = layer_arrays(profiles, variable)
+    profile_ids, values = harmonize(pids, top, bottom, y, method, intervals, extensive, lam)
+    state = {
+        row["profile_id"]: (row["at"], row["n"])
+        for row in Layer.objects.filter(**{f"{variable}__isnull": False}, profile_id__in=profile_ids.tolist())
+        .values("profile_id").annotate(at=Max("updated_at"), n=Count("pk"))
+    }
+    objs = [
+        HarmonizedValue(
+            profile_id=pk, variable=variable, method=method, depth_top=a, depth_bottom=b,
+            value=None if np.isnan(v) else float(v),
+            layers_at=state[pk][0], layer_count=state[pk][1], params=params,
+        )
+        for pk, row in zip(profile_ids.tolist(), values)
+        for (a, b), v in zip(intervals, row)
+    ]
+    with transaction.atomic():
+        if full:
+            HarmonizedValue.objects.filter(variable=variable, method=method).delete()
+        else:
+            HarmonizedValue.objects.filter(variable=variable, method=method, profile_id__in=profiles).delete()
+        deleted, _ = HarmonizedValue.objects.filter(
+            variable=variable, method=method, profile_id__in=to_delete
+        ).delete()
+        HarmonizedValue.objects.bulk_create(objs, batch_size=2000)
+    return {"profiles": len(profile_ids), "values": len(objs), "deleted": deleted}
+
+
+def harmonized_targets(
+    profiles: Sequence[int],
+    targets: Dict[str, Tuple[int, int]] = DEPTH_TARGETS,
+    method: str = "spline",
+    variable: str = VARIABLE,
+) -> Dict[str, np.ndarray]:
+    """``{target: values aligned with profiles}`` from the stored harmonised values."""
+    from .models import HarmonizedValue
+
+    index = {pk: i for i, pk in enumerate(profiles)}
+    out = {t: np.full(len(profiles), np.nan) for t in targets}
+    by_interval = {interval: t for t, interval in targets.items()}
+    rows = HarmonizedValue.objects.filter(
+        variable=variable, method=method, profile_id__in=list(index), value__isnull=False,
+    ).values_list("profile_id", "depth_top", "depth_bottom", "value")
+    for pk, a, b, value in rows:
+        target = by_interval.get((a, b))
+        if target is not None:
+            out[target][index[pk]] = value
+    return out
@@ -0,0 +1,148 @@
+"""Earth Engine session shared by the fetch commands and the web workers.
+
+Earth Engine is initialised once per process (re-initialised after a fork,
+e.g. gunicorn ``--preload``). Credentials are resolved headlessly:
+
+1. service account (``EE_SERVICE_ACCOUNT`` + ``EE_PRIVATE_KEY_FILE``),
+2. authorized-user token (``EE_TOKEN_FILE``, refreshed with its refresh token),
+3. the interactive OAuth flow on ``EE_CREDENTIALS_FILE``, only when
+   explicitly allowed (a human running a command in a terminal).
+
+A daemon thread refreshes the access token ``EE_REFRESH_MARGIN`` seconds
+before it expires. The refresh updates the credentials object in place, so
+requests already in flight keep using the still-valid token and never wait on
+a lock.
+"""
+from __future__ import annotations
+
+import datetime as dt
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+logger = logging.getLogger(__name__)
+
+SCOPES = ["https://www.googleapis.com/auth/earthengine.readonly"]
+
+
+class EarthEngineSession:
+    """Per-process Earth Engine initialisation and token refresh."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._pid: int | None = None
+        self._credentials = None
+        self._auth_request = None
+        self._stop = threading.Event()
+
+    @property
+    def ready(self) -> bool:
+        return self._pid == os.getpid()
+
+    def ensure(self, interactive: bool = False):
+        """Initialise Earth Engine if this process has not done it yet."""
+        if self.ready:
+            return self._credentials
+        with self._lock:
+            if self.ready:
+                return self._credentials
+
+            import ee
+            import requests
+            from google.auth.transport.requests import Request
+
+            # one HTTP session for all token refreshes of this process
+            self._auth_request = Request(session=requests.Session())
+            credentials = self._load_credentials(interactive)
+            ee.Initialize(credentials=credentials, project=settings.EE_PROJECT or None)
+
+            self._credentials = credentials
+            self._pid = os.getpid()
+            self._stop = threading.Event()
+            threading.Thread(target=self._refresh_loop, name="ee-token-refresh", daemon=True).start()
+            logger.info("Earth Engine initialised (pid %s)", self._pid)
+            return credentials
+
+    # ------------------------------------------------------------------
+    def _load_credentials(self, interactive: bool):
+        import ee
+        from google.oauth2.credentials import Credentials
+
+        if settings.EE_SERVICE_ACCOUNT and settings.EE_PRIVATE_KEY_FILE:
+            credentials = ee.ServiceAccountCredentials(
+                settings.EE_SERVICE_ACCOUNT, key_file=str(settings.EE_PRIVATE_KEY_FILE)
+            )
+            credentials.refresh(self._auth_request)
+            return credentials
+
+        token_file = str(settings.EE_TOKEN_FILE)
+        if os.path.exists(token_file):
+            credentials = Credentials.from_authorized_user_file(token_file, SCOPES)
+            if credentials.valid:
+                return credentials
+            if credentials.refresh_token:
+                credentials.refresh(self._auth_request)
+                self._save_token(credentials)
+                return credentials
+
+        if not interactive:
+            raise ImproperlyConfigured(
+                "No usable Earth Engine credentials: set EE_SERVICE_ACCOUNT and "
+                f"EE_PRIVATE_KEY_FILE, or provide a token at {token_file}."
+            )
+
+        from google_auth_oauthlib.flow import InstalledAppFlow
+
+        flow = InstalledAppFlow.from_client_secrets_file(str(settings.EE_CREDENTIALS_FILE), SCOPES)
+        credentials = flow.run_local_server(port=0)
+        self._save_token(credentials)
+        return credentials
+
+    def _save_token(self, credentials) -> None:
+        """Persist a user token atomically; a read-only volume is not fatal."""
+        token_file = str(settings.EE_TOKEN_FILE)
+        tmp = f"{token_file}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "w") as fh:
+                fh.write(credentials.to_json())
+            os.replace(tmp, token_file)
+        except OSError as exc:
+            logger.warning("Could not write Earth Engine token %s: %s", token_file, exc)
+
+    def _seconds_until_refresh(self) -> float:
+        expiry = getattr(self._credentials, "expiry", None)
+        if expiry is None:
+            return float(settings.EE_REFRESH_MARGIN)
+        # google-auth stores a naive UTC datetime
+        now = dt.datetime.now(dt.timezone.utc).replace(tzinfo=None)
+        remaining = (expiry - now).total_seconds()
+        return max(remaining - settings.EE_REFRESH_MARGIN, 0.0)
+
+    def _refresh_loop(self) -> None:
+        pid = os.getpid()
+        while not self._stop.wait(self._seconds_until_refresh()):
+            if os.getpid() != pid:
+                return
+            try:
+                self._credentials.refresh(self._auth_request)
+                if hasattr(self._credentials, "refresh_token"):
+                    self._save_token(self._credentials)
+                logger.debug("Earth Engine token refreshed, expires %s", self._credentials.expiry)
+            except Exception as exc:  # noqa: BLE001 - retry on the next tick
+                logger.warning("Earth Engine token refresh failed: %s", exc)
+                self._stop.wait(30)
+
+    def close(self) -> None:
+        self._stop.set()
+        self._pid = None
+
+
+session = EarthEngineSession()
+
+
+def ensure_initialized(interactive: bool = False):
+    """Module-level shortcut for :meth:`EarthEngineSession.ensure`."""
+    return session.ensure(interactive=interactive)
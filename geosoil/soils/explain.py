@@ -0,0 +1,172 @@
+"""SHAP explanations of the SOC predictions, precomputed per model version.
+
+``explain_soc`` (run at the end of ``predict_soc``) explains the chained
+SOC10/SOC30 predictor with a ``KernelExplainer``, so SOC30 is attributed to the
+model inputs rather than to ``SOC10_pred``. The background is a sample of the
+profiles' features drawn once per model version and stored in
+:class:`~soils.models.SocExplanationSet`; every batch summarizes that same
+sample with ``shap.kmeans``, so values of a version stay comparable. Missing
+inputs are filled with the per-feature medians of the sample.
+
+Per-profile values are stored as float32 bytes in
+:class:`~soils.models.SocExplanation`, the SOC10 row then the SOC30 row, in
+the order of ``SocExplanationSet.features``.
+
+This module is imported by the spawned workers, the Django models are
+imported lazily.
+"""
+from __future__ import annotations
+
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from .prediction import OUTPUTS
+
+BACKGROUND_SAMPLE = 500
+BACKGROUND_SIZE = 32
+
+
+def background_sample(X: np.ndarray, size: int = BACKGROUND_SAMPLE, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """``(fill, sample)``: per-feature medians and a fixed row sample of ``X``."""
+    with np.errstate(all="ignore"):
+        fill = np.nanmedian(X, axis=0) if len(X) else np.zeros(X.shape[1])
+    fill = np.where(np.isnan(fill), 0.0, fill)
+    rows = np.random.default_rng(seed).permutation(len(X))[:size]
+    return fill, fill_missing(X[np.sort(rows)], fill)
+
+
+def fill_missing(X: np.ndarray, fill: np.ndarray) -> np.ndarray:
+    X = np.array(X, dtype=np.float64)
+    mask = np.isnan(X)
+    X[mask] = np.broadcast_to(fill, X.shape)[mask]
+    return X
+
+
+def summarize(sample: np.ndarray, k: int = BACKGROUND_SIZE):
+    """Weighted k-means summary of the background sample (deterministic)."""
+    import shap
+
+    return shap.kmeans(sample, min(k, len(sample)))
+
+
+def encode_values(values: np.ndarray) -> bytes:
+    """``(2, n_features)`` SHAP values as little-endian float32 bytes."""
+    return np.ascontiguousarray(values, dtype="<f4").tobytes()
+
+
+def decode_values(blob, n_features: int) -> np.ndarray:
+    return np.frombuffer(bytes(blob), dtype="<f4").reshape(len(OUTPUTS), n_features)
+
+
+# ---------------------------------------------------------------------------
+# batch computation (process pool)
+
+def init_worker(threads: int = 1) -> None:
+    """Process-pool initializer: Django and torch in a spawned worker."""
+    import django
+    import torch
+
+    django.setup()
+    torch.set_num_threads(threads)
+
+
+def explain_chunk(args) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """``(pids, values (n, 2, n_features) float32, expected (2,))`` of one chunk."""
+    import shap
+
+    from .prediction import get_predictor
+
+    version, pids, X, summary, nsamples = args
+    predictor = get_predictor(version)
+
+    explainer = shap.KernelExplainer(lambda Z: predictor.predict(Z, coalesce=False), summary)
+    values = explainer.shap_values(X, nsamples=nsamples, silent=True)
+    # list of (n, M) per output in older shap, (n, M, outputs) since 0.45
+    values = np.stack(values, axis=1) if isinstance(values, list) else np.moveaxis(values, -1, 1)
+    return pids, values.astype(np.float32), np.asarray(explainer.expected_value, dtype=np.float64)
+
+
+# ---------------------------------------------------------------------------
+# serving
+
+def latest_explained_version() -> Optional[str]:
+    """The served model version when it is explained, else the last explained one."""
+    from .models import SocExplanationSet
+    from .registry import serving_version
+
+    version = serving_version()
+    if version and SocExplanationSet.objects.filter(model_version=version).exists():
+        return version
+    return (
+        SocExplanationSet.objects.order_by("-created_at").values_list("model_version", flat=True).first()
+    )
+
+
+def update_importance(explanation_set) -> Dict[str, Dict[str, float]]:
+    """Mean |SHAP| per feature over every profile explained by the version."""
+    from .models import SocExplanation
+
+    n = len(explanation_set.features)
+    total = np.zeros((len(OUTPUTS), n))
+    count = 0
+    blobs = SocExplanation.objects.filter(model_version=explanation_set.model_version).values_list("values", flat=True)
+    for blob in blobs.iterator(chunk_size=2000):
+        total += np.abs(decode_values(blob, n))
+        count += 1
+    mean = total / max(count, 1)
+    explanation_set.importance = {
+        depth: dict(zip(explanation_set.features, row.tolist())) for depth, row in zip(OUTPUTS, mean)
+    }
+    explanation_set.importance["profiles"] = count
+    explanation_set.save(update_fields=["importance", "updated_at"])
+    return explanation_set.importance
+
+
+def profile_explanation(profile_id: int, model_version: Optional[str] = None) -> Optional[dict]:
+    """Base value, prediction and per-feature contributions of one profile."""
+    from .models import SocExplanation, SocExplanationSet, SocPrediction
+
+    model_version = model_version or latest_explained_version()
+    explanation_set = SocExplanationSet.objects.filter(model_version=model_version).first()
+    row = SocExplanation.objects.filter(profile_id=profile_id, model_version=model_version).first()
+    if explanation_set is None or row is None:
+        return None
+    prediction = SocPrediction.objects.filter(profile_id=profile_id, model_version=model_version).first()
+
+    values = decode_values(row.values, len(explanation_set.features))
+    bases = (explanation_set.expected10, explanation_set.expected30)
+    result = {
+        "profile": profile_id,
+        "model_version": model_version,
+        "features": explanation_set.features,
+        "explained_at": row.explained_at,
+    }
+    for depth, base, contributions in zip(OUTPUTS, bases, values.tolist()):
+        result[depth] = {
+            "base": base,
+            "prediction": getattr(prediction, depth, None),
+            "contributions": dict(zip(explanation_set.features, contributions)),
+        }
+    return result
+
+
+def global_importance(model_version: Optional[str] = None) -> Optional[dict]:
+    from .models import SocExplanationSet
+
+    model_version = model_version or latest_explained_version()
+    explanation_set = SocExplanationSet.objects.filter(model_version=model_version).first()
+    if explanation_set is None:
+        return None
+    importance = dict(explanation_set.importance)
+    return {
+        "model_version": model_version,
+        "features": explanation_set.features,
+        "profiles": importance.pop("profiles", 0),
+        "base": {"soc10": explanation_set.expected10, "soc30": explanation_set.expected30},
+        "importance": {
+            depth: sorted(values.items(), key=lambda kv: -kv[1]) for depth, values in importance.items()
+        },
+        "updated_at": explanation_set.updated_at,
+    }
+
@@ -0,0 +1,260 @@
+"""Read/write helpers for the remote-sensing feature table."""
+from __future__ import annotations
+
+import datetime as dt
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import RemoteSensingFeature, SamplingAttempt
+
+FEATURE_KEY_FIELDS = ["profile", "sensor", "window_start", "window_end", "band"]
+
+# bands stored per sensor by soils.sampling (S3: every OLCI band of the collection)
+S2_BANDS = [
+    "B1","B2","B3","B4","B5","B6","B7","B8","B8A","B9","B11","B12","AOT","WVP",
+]
+S1_BANDS = ["VV", "VH"]
+S3_BANDS = [f"Oa{i:02d}_radiance" for i in range(1, 22)] + ["quality_flags"]
+L8_BANDS = [f"SR_B{i}" for i in range(1, 8)]
+SENSOR_BANDS = {"S2": S2_BANDS, "S1": S1_BANDS, "S3": S3_BANDS, "L8": L8_BANDS}
+
+# delay before an empty window is requested again, doubled on each failure
+RETRY_BASE = dt.timedelta(days=1)
+RETRY_MAX = dt.timedelta(days=64)
+
+# Months starting each period; seasons are the meteorological DJF/MAM/JJA/SON.
+PERIODS = {
+    "monthly": tuple(range(1, 13)),
+    "seasonal": (3, 6, 9, 12),
+}
+
+
+def _as_float(value: Any) -> float | None:
+    """Cast an Earth Engine value to float (``None`` if it is not numeric)."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_date(value: dt.date | str) -> dt.date:
+    return value if isinstance(value, dt.date) else dt.date.fromisoformat(value)
+
+
+def period_windows(
+    start: dt.date | str, end: dt.date | str, period: str
+) -> List[Tuple[dt.date, dt.date]]:
+    """Complete ``[window_start, window_end[`` periods that fit inside ``[start, end[``.
+
+    Partial periods at either end are skipped so a window, once stored, never
+    changes on later runs.
+    """
+    start, end = _to_date(start), _to_date(end)
+    months = PERIODS[period]
+    step = 12 // len(months)
+
+    # first period boundary on or after start
+    year, month = start.year, start.month
+    while month not in months or dt.date(year, month, 1) < start:
+        month += 1
+        if month > 12:
+            year, month = year + 1, 1
+
+    windows = []
+    while True:
+        w_start = dt.date(year, month, 1)
+        month += step
+        if month > 12:
+            year, month = year + 1, month - 12
+        w_end = dt.date(year, month, 1)
+        if w_end > end:
+            return windows
+        windows.append((w_start, w_end))
+
+
+def waiting_windows(
+    profiles,
+    sensors: Sequence[str],
+    windows: Sequence[Tuple[dt.date, dt.date]],
+) -> set:
+    """``{(profile_pk, sensor, window_start, window_end)}`` still backing off after an empty attempt."""
+    return set(
+        SamplingAttempt.objects.filter(
+            profile__in=profiles,
+            sensor__in=sensors,
+            window_start__in={_to_date(a) for a, _ in windows},
+            retry_at__gt=timezone.now(),
+        ).values_list("profile_id", "sensor", "window_start", "window_end")
+    )
+
+
+def missing_windows(
+    profiles,
+    sensors: Sequence[str],
+    windows: Sequence[Tuple[dt.date, dt.date]],
+    retry_waiting: bool = False,
+) -> Dict[int, Dict[str, List[Tuple[dt.date, dt.date]]]]:
+    """``{profile_pk: {sensor: [windows without any stored band]}}``.
+
+    Existing windows are read with a single query. Windows whose last attempt
+    came back empty are left out until their ``retry_at`` (unless
+    ``retry_waiting``).
+    """
+    windows = [(_to_date(a), _to_date(b)) for a, b in windows]
+    existing = set(
+        RemoteSensingFeature.objects.filter(
+            profile__in=profiles,
+            sensor__in=sensors,
+            window_start__in={a for a, _ in windows},
+        )
+        .values_list("profile_id", "sensor", "window_start", "window_end")
+        .distinct()
+    )
+    if not retry_waiting:
+        existing |= waiting_windows(profiles, sensors, windows)
+    return {
+        pid: {
+            sensor: [w for w in windows if (pid, sensor, *w) not in existing]
+            for sensor in sensors
+        }
+        for pid in profiles.values_list("pk", flat=True)
+    }
+
+
+def build_features(
+    profile_id: int,
+    sensor: str,
+    window_start: dt.date | str | None,
+    window_end: dt.date | str | None,
+    values: Dict[str, Any],
+) -> List[RemoteSensingFeature]:
+    """Turn a ``{band: value}`` dict into unsaved feature rows."""
+    return [
+        RemoteSensingFeature(
+            profile_id=profile_id,
+            sensor=sensor,
+            window_start=window_start,
+            window_end=window_end,
+            band=band,
+            value=_as_float(value),
+        )
+        for band, value in values.items()
+    ]
+
+
+def record_attempts(
+    requested: Dict[int, Dict[str, List[Tuple[dt.date, dt.date]]]],
+    rows: Sequence[RemoteSensingFeature],
+    errors: Dict[int, str] = None,
+) -> int:
+    """Back off the ``requested`` windows that got no row; clear the others.
+
+    ``requested`` is the ``{profile_pk: {sensor: [windows]}}`` that was
+    sampled, ``errors`` the exception message per profile. Returns the number
+    of empty windows.
+    """
+    errors = errors or {}
+    asked = {
+        (pid, sensor, _to_date(a), _to_date(b))
+        for pid, by_sensor in requested.items()
+        for sensor, windows in by_sensor.items()
+        for a, b in windows
+    }
+    if not asked:
+        return 0
+    got = {(r.profile_id, r.sensor, r.window_start, r.window_end) for r in rows}
+    previous = {
+        (a.profile_id, a.sensor, a.window_start, a.window_end): a
+        for a in SamplingAttempt.objects.filter(
+            profile_id__in={k[0] for k in asked},
+            sensor__in={k[1] for k in asked},
+            window_start__in={k[2] for k in asked},
+        )
+    }
+    done = [previous[k].pk for k in asked & got if k in previous]
+    now = timezone.now()
+    attempts = []
+    for key in asked - got:
+        failures = previous[key].failures + 1 if key in previous else 1
+        attempts.append(SamplingAttempt(
+            profile_id=key[0], sensor=key[1], window_start=key[2], window_end=key[3],
+            failures=failures,
+            error=errors.get(key[0], ""),
+            retry_at=now + min(RETRY_BASE * 2 ** min(failures - 1, 16), RETRY_MAX),
+        ))
+    with transaction.atomic():
+        SamplingAttempt.objects.filter(pk__in=done).delete()
+        SamplingAttempt.objects.bulk_create(
+            attempts,
+            batch_size=1000,
+            update_conflicts=True,
+            update_fields=["failures", "error", "attempted_at", "retry_at"],
+            unique_fields=["profile", "sensor", "window_start", "window_end"],
+        )
+    return len(attempts)
+
+
+def save_features(features: Sequence[RemoteSensingFeature], batch_size: int = 1000) -> None:
+    """Upsert feature rows; only the touched bands are written."""
+    if not features:
+        return
+    with transaction.atomic():
+        RemoteSensingFeature.objects.bulk_create(
+            features,
+            batch_size=batch_size,
+            update_conflicts=True,
+            update_fields=["value", "derived", "updated_at"],
+            unique_fields=FEATURE_KEY_FIELDS,
+        )
+
+
+def feature_matrix(
+    columns: Sequence[Tuple[str, str]],
+    profiles: Iterable[int] | None = None,
+    window_start: dt.date | str | None = None,
+    window_end: dt.date | str | None = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Return ``(profile_ids, X)`` for the requested ``(sensor, band)`` columns.
+
+    A single query is issued. ``X`` is a float32 array of shape
+    ``(n_profiles, len(columns))`` with NaN for missing values. Without an
+    explicit window the most recent window of each band wins.
+    """
+    col_index = {tuple(col): i for i, col in enumerate(columns)}
+    sensors = {sensor for sensor, _ in columns}
+    bands = {band for _, band in columns}
+
+    qs = RemoteSensingFeature.objects.filter(sensor__in=sensors, band__in=bands)
+    if profiles is not None:
+        qs = qs.filter(profile__in=profiles)
+    if window_start is not None:
+        qs = qs.filter(window_start=window_start)
+    if window_end is not None:
+        qs = qs.filter(window_end=window_end)
+    rows = list(
+        qs.order_by(F("window_end").asc(nulls_first=True)).values_list(
+            "profile_id", "sensor", "band", "value"
+        )
+    )
+
+    rows = [r for r in rows if (r[1], r[2]) in col_index]
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty((0, len(columns)), dtype=np.float32)
+
+    pids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+    cols = np.fromiter((col_index[(r[1], r[2])] for r in rows), dtype=np.int64, count=len(rows))
+    vals = np.array([np.nan if r[3] is None else r[3] for r in rows], dtype=np.float32)
+
+    profile_ids, row_idx = np.unique(pids, return_inverse=True)
+    # Rows are ordered by window_end: keep the last occurrence of each cell.
+    cell = row_idx * len(columns) + cols
+    _, last = np.unique(cell[::-1], return_index=True)
+    keep = len(cell) - 1 - last
+
+    X = np.full((len(profile_ids), len(columns)), np.nan, dtype=np.float32)
+    X[row_idx[keep], cols[keep]] = vals[keep]
+    return profile_ids, X
@@ -0,0 +1,173 @@
+"""Spectral indices derived server-side from the stored band values.
+
+Each index is a vectorised NumPy formula registered with :func:`register`.
+:func:`compute_indices` evaluates the registry for every
+(profile, sensor, window) at once and stores the results back into
+:class:`~soils.models.RemoteSensingFeature` as ``derived`` rows, so they are
+served by the same API/export paths as the raw bands.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Sequence
+
+import numpy as np
+
+from .features import save_features
+from .models import RemoteSensingFeature
+
+
+@dataclass(frozen=True)
+class SpectralIndex:
+    name: str
+    sensor: str
+    bands: Sequence[str]
+    formula: Callable[..., np.ndarray]
+
+
+INDICES: Dict[str, SpectralIndex] = {}
+
+
+def register(name: str, sensor: str, bands: Sequence[str]):
+    """Decorator adding ``formula(*band_arrays)`` to the registry."""
+    def decorator(formula):
+        INDICES[name] = SpectralIndex(name, sensor, tuple(bands), formula)
+        return formula
+    return decorator
+
+
+def _nd(a, b):
+    return (a - b) / (a + b)
+
+
+# Sentinel-2 ---------------------------------------------------------------
+
+@register("NDVI", "S2", ["B8", "B4"])
+@register("SNDVI", "S2", ["B8", "B4"])
+def s2_ndvi(b8, b4):
+    return _nd(b8, b4)
+
+
+@register("NDWI", "S2", ["B3", "B8"])
+@register("SNDWI", "S2", ["B3", "B8"])
+def s2_ndwi(b3, b8):
+    return _nd(b3, b8)
+
+
+@register("SGDVI", "S2", ["B8", "B3"])
+def s2_gdvi(b8, b3):
+    return _nd(b8, b3)
+
+
+@register("SMSAVI2", "S2", ["B8", "B4"])
+def s2_msavi2(b8, b4):
+    return (2 * b8 + 1 - np.sqrt((2 * b8 + 1) ** 2 - 8 * (b8 - b4))) / 2
+
+
+@register("SPSRINIR", "S2", ["B8", "B5"])
+def s2_psri_nir(b8, b5):
+    return b8 / b5
+
+
+@register("Scigreen", "S2", ["B4", "B3"])
+def s2_cigreen(b4, b3):
+    return _nd(b4, b3)
+
+
+# Landsat 8 ----------------------------------------------------------------
+
+@register("LNDVI", "L8", ["SR_B5", "SR_B4"])
+def l8_ndvi(b5, b4):
+    return _nd(b5, b4)
+
+
+@register("LNDWI", "L8", ["SR_B5", "SR_B6"])
+def l8_ndwi(b5, b6):
+    return _nd(b5, b6)
+
+
+@register("LBSI", "L8", ["SR_B6", "SR_B4", "SR_B5", "SR_B2"])
+def l8_bsi(b6, b4, b5, b2):
+    return _nd(b6 + b4, b5 + b2)
+
+
+@register("Lcigreen", "L8", ["SR_B3", "SR_B2"])
+def l8_cigreen(b3, b2):
+    return _nd(b3, b2)
+
+
+def _load(sensor: str, bands: Iterable[str], derived: bool, profiles=None):
+    qs = RemoteSensingFeature.objects.filter(sensor=sensor, band__in=set(bands), derived=derived)
+    if profiles is not None:
+        qs = qs.filter(profile__in=profiles)
+    return qs.values_list("profile_id", "window_start", "window_end", "band", "value", "updated_at")
+
+
+def compute_indices(
+    names: Sequence[str] | None = None,
+    profiles=None,
+    force: bool = False,
+    batch_size: int = 5000,
+) -> int:
+    """Compute (or refresh) indices for all matching profiles; returns rows written.
+
+    An index value is recomputed only if it is missing or older than one of
+    its input bands, unless ``force`` is set.
+    """
+    selected = [INDICES[n] for n in (names or INDICES)]
+    written = 0
+
+    for sensor in sorted({ix.sensor for ix in selected}):
+        indices = [ix for ix in selected if ix.sensor == sensor]
+        bands = sorted({b for ix in indices for b in ix.bands})
+        band_col = {b: i for i, b in enumerate(bands)}
+
+        keys: Dict[tuple, int] = {}
+        rows = list(_load(sensor, bands, False, profiles))
+        if not rows:
+            continue
+        key_idx = np.fromiter(
+            (keys.setdefault(r[:3], len(keys)) for r in rows), dtype=np.int64, count=len(rows)
+        )
+        cols = np.fromiter((band_col[r[3]] for r in rows), dtype=np.int64, count=len(rows))
+
+        values = np.full((len(keys), len(bands)), np.nan)
+        values[key_idx, cols] = [np.nan if r[4] is None else r[4] for r in rows]
+        # most recent band change per (profile, window)
+        inputs_at = np.full(len(keys), -np.inf)
+        np.maximum.at(inputs_at, key_idx, [r[5].timestamp() for r in rows])
+
+        # timestamp of each stored index, -inf when absent
+        stored = {ix.name: np.full(len(keys), -np.inf) for ix in indices}
+        if not force:
+            for pid, w_start, w_end, name, _, updated in _load(
+                sensor, [ix.name for ix in indices], True, profiles
+            ):
+                k = keys.get((pid, w_start, w_end))
+                if k is not None and name in stored:
+                    stored[name][k] = updated.timestamp()
+
+        key_list = list(keys)
+        buffer: List[RemoteSensingFeature] = []
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for ix in indices:
+                stale = np.flatnonzero(inputs_at > stored[ix.name])
+                if stale.size == 0:
+                    continue
+                args = [values[stale, band_col[b]] for b in ix.bands]
+                result = np.asarray(ix.formula(*args), dtype=float)
+                result[~np.isfinite(result)] = np.nan
+                for k, v in zip(stale, result.tolist()):
+                    pid, w_start, w_end = key_list[k]
+                    buffer.append(RemoteSensingFeature(
+                        profile_id=pid, sensor=sensor, window_start=w_start, window_end=w_end,
+                        band=ix.name, value=None if v != v else v, derived=True,
+                    ))
+                if len(buffer) >= batch_size:
+                    save_features(buffer, batch_size=batch_size)
+                    written += len(buffer)
+                    buffer.clear()
+        save_features(buffer, batch_size=batch_size)
+        written += len(buffer)
+
+    return written
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""Débit et latence de queue des endpoints de lecture sous charge concurrente.
+
+À lancer contre chaque déploiement (WSGI sur :8000, ASGI sur :8001) avec
+les mêmes chemins, puis comparer :
+
+```bash
+python manage.py benchmark_http --base http://localhost:8000 --concurrency 32 --requests 2000
+python manage.py benchmark_http --base http://localhost:8001 --concurrency 32 --requests 2000 --json
+```
+"""
+from __future__ import annotations
+
+import json
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle, islice
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+DEFAULT_PATHS = [
+    "/api/sources/stats/",
+    "/api/predictions/soc10/points",
+    "/api/profiles.geojson?source=IRD",
+    "/api/rasters/soc10/stats",
+    "/tiles/soc10/8/118/117.png",
+]
+
+
+def fetch(url: str, timeout: float):
+    t0 = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            response.read()
+            code = response.status
+    except urllib.error.HTTPError as exc:
+        code = exc.code
+    except OSError:
+        code = None
+    return url, code, time.perf_counter() - t0
+
+
+class Command(BaseCommand):
+    help = "Measure concurrent-request throughput and tail latency of the read endpoints."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base", default="http://localhost:8000")
+        parser.add_argument("--path", action="append", dest="paths", help="chemin (répétable)")
+        parser.add_argument("--concurrency", type=int, default=16, help="requêtes simultanées")
+        parser.add_argument("--requests", type=int, default=500, help="requêtes au total")
+        parser.add_argument("--timeout", type=float, default=60)
+        parser.add_argument("--json", action="store_true", help="sortie JSON")
+
+    def handle(self, *args, **opts):
+        urls = [opts["base"].rstrip("/") + p for p in opts["paths"] or DEFAULT_PATHS]
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=opts["concurrency"]) as pool:
+            results = list(pool.map(lambda u: fetch(u, opts["timeout"]), islice(cycle(urls), opts["requests"])))
+        wall = time.perf_counter() - t0
+
+        report = {"base": opts["base"], "concurrency": opts["concurrency"], "requests": len(results),
+                  "wall_s": wall, "rps": len(results) / wall, "endpoints": {}}
+        for url in urls:
+            rows = [(code, t) for u, code, t in results if u == url]
+            times = np.array([t for _, t in rows]) * 1000
+            report["endpoints"][url[len(opts["base"].rstrip("/")):]] = {
+                "n": len(rows),
+                "errors": sum(1 for code, _ in rows if code is None or code >= 500),
+                "p50_ms": float(np.percentile(times, 50)),
+                "p95_ms": float(np.percentile(times, 95)),
+                "p99_ms": float(np.percentile(times, 99)),
+            }
+
+        if opts["json"]:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"✔ {len(results)} requêtes en {wall:.1f}s : {report['rps']:.0f} req/s (concurrence {opts['concurrency']})"
+        ))
+        for path, r in report["endpoints"].items():
+            self.stdout.write(
+                f"  {path:<40} p50 {r['p50_ms']:7.1f} ms  p95 {r['p95_ms']:7.1f} ms  "
+                f"p99 {r['p99_ms']:7.1f} ms  erreurs {r['errors']}"
+            )
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""Mesure des requêtes par source et du coût d'un rechargement (avant/après un changement de schéma).
+
+```bash
+python manage.py benchmark_sources --json > avant.json
+python manage.py migrate && python manage.py benchmark_sources --json > apres.json
+python manage.py benchmark_sources --source WOSIS --reload --explain
+```
+
+``--reload`` exécute la purge ensembliste des profils de la source
+(``soils.purge``) dans une transaction annulée : rien n'est supprimé, mais
+les tables de la source sont verrouillées pendant la mesure.
+"""
+from __future__ import annotations
+
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from soils.features import feature_matrix
+from soils.indices import INDICES
+from soils.models import Layer, SoilProfile, Source
+from soils.purge import delete_where
+
+
+def timed(fn, repeat: int) -> float:
+    """Median wall time of ``fn`` in milliseconds."""
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(times)
+
+
+class Command(BaseCommand):
+    help = "Time the per-source query paths (and optionally a rolled-back reload) of each source."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--source", action="append", dest="sources", help="source (répétable, défaut : toutes)")
+        parser.add_argument("--repeat", type=int, default=5, help="mesures par requête (médiane)")
+        parser.add_argument("--reload", action="store_true", help="mesurer la purge de la source (annulée)")
+        parser.add_argument("--explain", action="store_true", help="afficher le plan de la requête des profils")
+        parser.add_argument("--json", action="store_true", help="sortie JSON")
+
+    def handle(self, *args, **opts):
+        sources = Source.objects.order_by("name")
+        if opts["sources"]:
+            sources = sources.filter(name__in=opts["sources"])
+        if not sources:
+            raise CommandError("Aucune source")
+        columns = [(ix.sensor, ix.name) for ix in INDICES.values()]
+
+        results = {}
+        for source in sources:
+            profiles = SoilProfile.objects.filter(source=source)
+            ids = list(profiles.order_by("pk").values_list("pk", flat=True))
+            result = {
+                "profiles": len(ids),
+                "ms": {
+                    "profiles": timed(lambda: list(profiles.order_by("pk").values_list("pk", "code", "location")),
+                                      opts["repeat"]),
+                    "layers": timed(lambda: list(Layer.objects.filter(profile__source=source)
+                                                 .order_by("profile_id", "depth_top").values_list("pk", "carbon_content")),
+                                    opts["repeat"]),
+                    "features": timed(lambda: feature_matrix(columns, profiles=ids), opts["repeat"]),
+                },
+            }
+            if opts["reload"]:
+                def reload():
+                    with transaction.atomic(), connection.cursor() as cursor:
+                        delete_where(cursor, SoilProfile, "source_id = %s", [source.pk])
+                        transaction.set_rollback(True)
+                result["ms"]["reload"] = timed(reload, 1)
+            if opts["explain"]:
+                result["plan"] = profiles.order_by("pk").values_list("pk").explain()
+            results[source.name] = result
+
+        if opts["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for name, result in results.items():
+            timings = ", ".join(f"{k} {v:.1f} ms" for k, v in result["ms"].items())
+            self.stdout.write(f"  {name:<10} {result['profiles']:>7} profils : {timings}")
+            if "plan" in result:
+                self.stdout.write(result["plan"])
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""Cartes SOC10/SOC30 pixel par pixel sur toute l'AOI (remplace grid_250m + gdal_translate).
+
+```bash
+python manage.py build_soc_rasters --res 30 --workers 8
+```
+
+Les tuiles déjà calculées pour la même version du modèle, la même grille
+(CRS, emprise, résolution) et les mêmes covariables sont réutilisées : relancer
+la commande reprend là où elle s'est arrêtée.
+"""
+from __future__ import annotations
+
+import multiprocessing
+import os
+import shutil
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from soils.prediction import get_predictor
+from soils.raster import (
+    Grid, assemble, covariate_sources, default_bounds, init_worker, predict_tile, tile_jobs, tiles_key,
+)
+
+
+class Command(BaseCommand):
+    help = "Predict SOC10/SOC30 per pixel from covariate rasters and write Cloud-Optimized GeoTIFFs."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--covariates", default=str(settings.SOC_COVARIATES_DIR))
+        parser.add_argument("--res", type=float, default=30, help="résolution en mètres")
+        parser.add_argument("--crs", default="EPSG:32628")
+        parser.add_argument("--bounds", type=float, nargs=4, metavar=("MINX", "MINY", "MAXX", "MAXY"),
+                            help="emprise dans --crs (défaut : emprise des covariables)")
+        parser.add_argument("--tile-size", type=int, default=512, help="pixels par côté de tuile")
+        parser.add_argument("--workers", type=int, default=os.cpu_count())
+        parser.add_argument("--threads", type=int, default=1, help="threads torch par processus")
+        parser.add_argument("--output-dir", default=str(settings.SOC_RASTER_DIR))
+        parser.add_argument("--work-dir", default=str(settings.SOC_RASTER_WORK_DIR))
+        parser.add_argument("--keep-tiles", action="store_true")
+
+    def handle(self, *args, **opts):
+        t0 = time.monotonic()
+        predictor = get_predictor()
+        sources, missing = covariate_sources(opts["covariates"], predictor.features)
+        if not sources:
+            raise CommandError(f"Aucune covariable trouvée dans {opts['covariates']}")
+        if missing:
+            self.stdout.write(self.style.WARNING(f"Covariables absentes (imputées) : {', '.join(missing)}"))
+
+        bounds = opts["bounds"] or default_bounds(sources, opts["crs"])
+        grid = Grid.from_bounds(bounds, opts["res"], opts["crs"])
+        # une version du modèle / une grille / des covariables = un répertoire de tuiles
+        key = tiles_key(grid, sources, opts["tile_size"], predictor.version)
+        work_dir = os.path.join(opts["work_dir"], f"{predictor.version}_{opts['res']:g}m_{opts['tile_size']}_{key}")
+        os.makedirs(work_dir, exist_ok=True)
+        try:
+            jobs = tile_jobs(grid, sources, work_dir, opts["tile_size"], predictor.version)
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        todo = [job for job in jobs if not os.path.exists(job.path)]
+        self.stdout.write(self.style.NOTICE(
+            f"→ grille {grid.width}x{grid.height} px, {len(jobs)} tuiles dont {len(todo)} à calculer"
+        ))
+
+        done = 0
+        with ProcessPoolExecutor(
+            max_workers=opts["workers"],
+            # spawn : pas de fork d'un processus qui a déjà chargé torch
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_worker,
+            initargs=(opts["threads"],),
+        ) as pool:
+            pending = set()
+            for job in todo:
+                pending.add(pool.submit(predict_tile, job))
+                # au plus 2 tuiles en attente par processus
+                if len(pending) >= 2 * opts["workers"]:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    done += self._report(finished, done, len(todo))
+            while pending:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                done += self._report(finished, done, len(todo))
+
+        outputs = assemble(jobs, grid, opts["output_dir"], tags={"model_version": predictor.version})
+        if not opts["keep_tiles"]:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        self.stdout.write(self.style.SUCCESS(
+            f"✔ {', '.join(outputs)} en {time.monotonic() - t0:.0f}s"
+        ))
+
+    def _report(self, finished, done: int, total: int) -> int:
+        for future in finished:
+            future.result()
+        done += len(finished)
+        self.stdout.write(f"  {done}/{total} tuiles")
+        return len(finished)
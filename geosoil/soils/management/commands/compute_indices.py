@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from soils.indices import INDICES, compute_indices
+from soils.models import SoilProfile
+
+
+class Command(BaseCommand):
+    help = "Compute spectral indices from the stored bands (only stale values unless --force)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--index",
+            action="append",
+            dest="indices",
+            help=f"Index to compute (repeatable). Available: {', '.join(INDICES)}",
+        )
+        parser.add_argument("--source", default="all", help="Source name or 'all'")
+        parser.add_argument("--force", action="store_true", help="Recompute every value")
+
+    def handle(self, *args, **opts):
+        unknown = set(opts["indices"] or []) - set(INDICES)
+        if unknown:
+            raise CommandError(f"Unknown index: {', '.join(sorted(unknown))}")
+
+        profiles = None
+        if opts["source"] != "all":
+            profiles = SoilProfile.objects.filter(source__name=opts["source"])
+
+        written = compute_indices(opts["indices"], profiles=profiles, force=opts["force"])
+        self.stdout.write(self.style.SUCCESS(f"✔ {written} index values written"))
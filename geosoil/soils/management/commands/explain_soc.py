@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""Explications SHAP des prédictions SOC en base, par lots (appelée par ``predict_soc``).
+
+Seuls les profils dont la prédiction de la version courante n'a pas encore
+d'explication, ou est plus récente qu'elle, sont recalculés (``--all`` pour
+tout recalculer). Le fond SHAP est tiré une seule fois par version du modèle.
+"""
+from __future__ import annotations
+
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Q, Subquery
+
+from soils.explain import (
+    BACKGROUND_SAMPLE,
+    BACKGROUND_SIZE,
+    background_sample,
+    encode_values,
+    explain_chunk,
+    fill_missing,
+    init_worker,
+    summarize,
+    update_importance,
+)
+from soils.features import feature_matrix
+from soils.models import SocExplanation, SocExplanationSet, SocPrediction
+from soils.prediction import get_predictor
+
+
+def stale_predictions(version: str):
+    """Prédictions de ``version`` sans explication, ou plus récentes que la leur."""
+    explanations = SocExplanation.objects.filter(profile=OuterRef("profile"), model_version=version)
+    return SocPrediction.objects.filter(model_version=version).annotate(
+        explained=Exists(explanations),
+        explained_at=Subquery(explanations.values("explained_at")[:1]),
+    ).filter(Q(explained=False) | Q(predicted_at__gt=F("explained_at")))
+
+
+class Command(BaseCommand):
+    help = "Precompute SHAP explanations of the stored SOC predictions (current model version)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true", help="ré-expliquer tous les profils")
+        parser.add_argument("--chunk", type=int, default=200, help="profils par tâche")
+        parser.add_argument("--workers", type=int, default=2, help="processus")
+        parser.add_argument("--threads", type=int, default=1, help="threads torch par processus")
+        parser.add_argument("--nsamples", default="auto", help="coalitions KernelSHAP par profil")
+        parser.add_argument("--background", type=int, default=BACKGROUND_SIZE, help="centres k-means du fond")
+        parser.add_argument("--sample", type=int, default=BACKGROUND_SAMPLE, help="profils tirés pour le fond")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **opts):
+        t0 = time.monotonic()
+        try:
+            predictor = get_predictor()
+        except FileNotFoundError as exc:
+            raise CommandError(f"SOC model not available: {exc}")
+        version = predictor.version
+        nsamples = opts["nsamples"] if opts["nsamples"] == "auto" else int(opts["nsamples"])
+
+        explanation_set = self.explanation_set(predictor, opts)
+        fill = np.asarray(explanation_set.fill)
+        summary = summarize(np.asarray(explanation_set.background), opts["background"])
+
+        predictions = SocPrediction.objects.filter(model_version=version)
+        if not opts["all"]:
+            predictions = stale_predictions(version)
+        ids = list(predictions.order_by("profile_id").values_list("profile_id", flat=True))
+        self.stdout.write(self.style.NOTICE(f"→ {len(ids)} profils à expliquer (modèle {version})"))
+
+        written = 0
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(opts["workers"], mp_context=ctx, initializer=init_worker,
+                                 initargs=(opts["threads"],)) as pool:
+            pending = set()
+            for i in range(0, len(ids), opts["chunk"]):
+                pids, X = feature_matrix(predictor.columns, profiles=ids[i:i + opts["chunk"]])
+                if not len(pids):
+                    continue
+                pending.add(pool.submit(explain_chunk, (version, pids, fill_missing(X, fill), summary, nsamples)))
+                if len(pending) >= 2 * opts["workers"]:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    written += sum(self._save(explanation_set, fut.result()) for fut in done)
+            for fut in pending:
+                written += self._save(explanation_set, fut.result())
+
+        importance = update_importance(explanation_set)
+        top = sorted(importance["soc10"].items(), key=lambda kv: -kv[1])[:3] if importance["profiles"] else []
+        self.stdout.write(self.style.SUCCESS(
+            f"✔ {written} explications écrites en {time.monotonic() - t0:.1f}s"
+            + (f" (SOC10 : {', '.join(f'{name} {v:.3f}' for name, v in top)})" if top else "")
+        ))
+
+    def explanation_set(self, predictor, opts) -> SocExplanationSet:
+        """Fond fixe de la version : créé au premier passage, réutilisé ensuite."""
+        existing = SocExplanationSet.objects.filter(model_version=predictor.version).first()
+        if existing is not None:
+            return existing
+        _, X = feature_matrix(predictor.columns)
+        if not len(X):
+            raise CommandError("Aucun profil avec features pour le fond SHAP")
+        fill, sample = background_sample(X, opts["sample"], opts["seed"])
+        return SocExplanationSet.objects.create(
+            model_version=predictor.version,
+            features=predictor.features,
+            fill=fill.tolist(),
+            background=sample.tolist(),
+        )
+
+    def _save(self, explanation_set: SocExplanationSet, result) -> int:
+        pids, values, expected = result
+        if explanation_set.expected10 is None:
+            explanation_set.expected10, explanation_set.expected30 = expected.tolist()
+            explanation_set.save(update_fields=["expected10", "expected30", "updated_at"])
+        objs = [
+            SocExplanation(profile_id=pid, model_version=explanation_set.model_version, values=encode_values(v))
+            for pid, v in zip(pids.tolist(), values)
+        ]
+        with transaction.atomic():
+            SocExplanation.objects.bulk_create(
+                objs,
+                batch_size=1000,
+                update_conflicts=True,
+                update_fields=["values", "explained_at"],
+                unique_fields=["profile", "model_version"],
+            )
+        return len(objs)
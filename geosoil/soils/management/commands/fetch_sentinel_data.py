@@ -27,68 +27,24 @@ python manage.py fetch_sentinel_data \
     --start 2024-01-01 --end 2024-12-31 --sensor all
 ```
 
-Le JSON est enregistré dans « sentinel_data » pour chaque profil.
+Les valeurs sont enregistrées dans la table « RemoteSensingFeature » (une ligne par bande).
 """
 
 import datetime as dt
+import sys
 from typing import Dict, Any
 
 import ee  # Google Earth Engine
-from django.conf import settings
 from django.core.management.base import BaseCommand
-from django.db import transaction
 
-from soils.models import SoilProfile  # adapte le chemin si nécessaire
+from soils.earth_engine import ensure_initialized
+from soils.features import build_features, save_features
+from soils.models import RemoteSensingFeature, SoilProfile  # adapte le chemin si nécessaire
 
-import os
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
 # ---------------------------------------------------------------------------
 # Earth Engine helpers
 # ---------------------------------------------------------------------------
 
-SCOPES = ["https://www.googleapis.com/auth/earthengine.readonly"]
-
-def authenticate_earth_engine():
-    
-    creds = None
-
-    # Vérifie si token.json existe (authentification précédente)
-    if os.path.exists("token.json"):
-        creds = Credentials.from_authorized_user_file("token.json", SCOPES)
-
-    # Sinon, lance le flow OAuth pour obtenir un token
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            flow = InstalledAppFlow.from_client_secrets_file(
-                "credentials.json", SCOPES
-            )
-            creds = flow.run_local_server(port=0)
-
-        # Sauvegarde le token pour les prochaines fois
-        with open("token.json", "w") as token:
-            token.write(creds.to_json())
-
-    # Initialisation Earth Engine avec les credentials OAuth
-    ee.Initialize(credentials=creds)
-    print(" Earth Engine authentifié avec succès !")
-
-
-def init_ee() -> None:
-    """Initialise l'auth Earth Engine (service account ou token local)."""
-    if hasattr(settings, "EE_SERVICE_ACCOUNT") and hasattr(settings, "EE_PRIVATE_KEY"):
-        credentials = ee.ServiceAccountCredentials(
-            settings.EE_SERVICE_ACCOUNT,
-            private_key=settings.EE_PRIVATE_KEY,
-        )
-        ee.Initialize(credentials, quiet=True)
-    else:
-        ee.Initialize()
-
-
 def median_sample(
     collection_id: str,
     point: ee.Geometry,
@@ -135,7 +91,7 @@ def median_sample(collection_id: str, point: ee.Geometry,
 # ---------------------------------------------------------------------------
 
 class Command(BaseCommand):
-    help = "Fetch Sentinel‑1/2/3 data for every SoilProfile and store in teledection_data JSONField."
+    help = "Fetch Sentinel‑1/2/3 data for every SoilProfile and store it in the RemoteSensingFeature table."
 
     def add_arguments(self, parser):
         parser.add_argument("--start", default="2024-01-01", help="YYYY‑MM‑DD")
@@ -150,8 +106,8 @@ class Command(BaseCommand):
 
     # ---------------------------------------------------------------------
     def handle(self, *args, **opts):
-        # init_ee()
-        authenticate_earth_engine()
+        # service account / token : voir soils/earth_engine.py
+        ensure_initialized(interactive=sys.stdin.isatty())
         start, end = opts["start"], opts["end"]
         sensor, scale, batch_size = opts["sensor"], opts["scale"], opts["batch"]
 
@@ -159,7 +115,8 @@ class Command(BaseCommand):
         total = qs.count()
         self.stdout.write(self.style.NOTICE(f"→ {total} profils à traiter"))
 
-        buffer: list[SoilProfile] = []
+        buffer: list[RemoteSensingFeature] = []
+        pending = 0
         for idx, profile in enumerate(qs.iterator(), 1):
             lon, lat = profile.location.x, profile.location.y
             ee_point = ee.Geometry.Point([lon, lat])
@@ -200,21 +157,19 @@ class Command(BaseCommand):
                 self.stderr.write(self.style.WARNING(f"Profil {profile.profile_id} – EE error: {exc}"))
                 continue
 
-            # merge & save
-            merged = profile.teledection_data or {}
-            merged.update(sentinel_dict)
-            profile.teledection_data = merged
-            buffer.append(profile)
+            # save
+            for sensor_name, values in sentinel_dict.items():
+                buffer.extend(build_features(profile.pk, sensor_name, start, end, values))
+            pending += 1
 
-            if len(buffer) >= batch_size:
-                with transaction.atomic():
-                    SoilProfile.objects.bulk_update(buffer, ["teledection_data"])
+            if pending >= batch_size:
+                save_features(buffer)
                 self.stdout.write(self.style.SUCCESS(f"✓ {idx}/{total} mis à jour"))
                 buffer.clear()
+                pending = 0
 
         if buffer:
-            with transaction.atomic():
-                SoilProfile.objects.bulk_update(buffer, ["teledection_data"])
+            save_features(buffer)
             self.stdout.write(self.style.SUCCESS("✓ Mise à jour finale"))
 
         self.stdout.write(self.style.SUCCESS("✔ Terminé"))
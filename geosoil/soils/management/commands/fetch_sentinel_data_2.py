@@ -4,52 +4,16 @@
 from __future__ import annotations
 
 import datetime as dt
+import sys
 from typing import Any, Dict, List
 
 import ee
-from django.conf import settings
 from django.core.management.base import BaseCommand
-from django.db import transaction
 from tqdm import tqdm
 
-from soils.models import SoilProfile
-
-# ---------------------------------------------------------------------------
-# EE init -------------------------------------------------------------------
-import os
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-
-
-SCOPES = ["https://www.googleapis.com/auth/earthengine.readonly"]
-
-def authenticate_earth_engine():
-    
-    creds = None
-
-    # Vérifie si token.json existe (authentification précédente)
-    if os.path.exists("token.json"):
-        creds = Credentials.from_authorized_user_file("token.json", SCOPES)
-
-    # Sinon, lance le flow OAuth pour obtenir un token
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            flow = InstalledAppFlow.from_client_secrets_file(
-                "credentials.json", SCOPES
-            )
-            creds = flow.run_local_server(port=0)
-
-        # Sauvegarde le token pour les prochaines fois
-        with open("token.json", "w") as token:
-            token.write(creds.to_json())
-
-    # Initialisation Earth Engine avec les credentials OAuth
-    ee.Initialize(credentials=creds)
-    print(" Earth Engine authentifié avec succès !")
-
+from soils.earth_engine import ensure_initialized
+from soils.features import build_features, save_features
+from soils.models import RemoteSensingFeature, SoilProfile
 
 # ---------------------------------------------------------------------------
 # Helpers -------------------------------------------------------------------
@@ -121,7 +85,7 @@ def median_sample(
 # Management command --------------------------------------------------------
 
 class Command(BaseCommand):
-    help = "Attach Sentinel median values to SoilProfile.teledection_data (JSON)."
+    help = "Attach Sentinel median values to the RemoteSensingFeature table."
 
     def add_arguments(self, parser):
         parser.add_argument("--start", default="2024-01-01")
@@ -131,7 +95,8 @@ class Command(BaseCommand):
         parser.add_argument("--batch", type=int, default=200)
 
     def handle(self, *args, **opts):
-        authenticate_earth_engine()
+        # flow OAuth interactif seulement si lancé depuis un terminal
+        ensure_initialized(interactive=sys.stdin.isatty())
         start, end = opts["start"], opts["end"]
         sensor_choice, scale, batch_size = opts["sensor"], opts["scale"], opts["batch"]
 
@@ -139,7 +104,8 @@ class Command(BaseCommand):
         total = qs.count()
         self.stdout.write(self.style.NOTICE(f"→ {total} profils à traiter"))
 
-        buffer: List[SoilProfile] = []
+        buffer: List[RemoteSensingFeature] = []
+        pending = 0
         for profile in tqdm(qs.iterator(), total=total, unit="profil", colour="green"):
             ee_point = ee.Geometry.Point([profile.location.x, profile.location.y])
             sentinel_dict: Dict[str, Any] = {}
@@ -161,18 +127,16 @@ class Command(BaseCommand):
                 self.stderr.write(self.style.WARNING(f"Profil {profile.profile_id}: {exc}"))
                 continue
 
-            merged = profile.teledection_data or {}
-            merged.update({k: v for k, v in sentinel_dict.items() if v})
-            profile.teledection_data = merged
-            buffer.append(profile)
+            for s, values in sentinel_dict.items():
+                if values:
+                    buffer.extend(build_features(profile.pk, s, start, end, values))
+            pending += 1
 
-            if len(buffer) >= batch_size:
-                with transaction.atomic():
-                    SoilProfile.objects.bulk_update(buffer, ["teledection_data"])
+            if pending >= batch_size:
+                save_features(buffer)
                 buffer.clear()
+                pending = 0
 
-        if buffer:
-            with transaction.atomic():
-                SoilProfile.objects.bulk_update(buffer, ["teledection_data"])
+        save_features(buffer)
 
         self.stdout.write(self.style.SUCCESS("✔ Terminé"))
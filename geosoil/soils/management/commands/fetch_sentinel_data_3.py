@@ -3,170 +3,101 @@
 from __future__ import annotations
 
 import datetime as dt
-from typing import Any, Dict, List
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import List
 
-import ee
-from django.conf import settings
 from django.core.management.base import BaseCommand
-from django.db import transaction
 from tqdm import tqdm
 
-from soils.models import SoilProfile
-
-# ---------------------------------------------------------------------------
-# EE init -------------------------------------------------------------------
-import os
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-
-
-SCOPES = ["https://www.googleapis.com/auth/earthengine.readonly"]
-
-def authenticate_earth_engine():
-    
-    creds = None
-
-    # Vérifie si token.json existe (authentification précédente)
-    if os.path.exists("token.json"):
-        creds = Credentials.from_authorized_user_file("token.json", SCOPES)
-
-    # Sinon, lance le flow OAuth pour obtenir un token
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            flow = InstalledAppFlow.from_client_secrets_file(
-                "credentials.json", SCOPES
-            )
-            creds = flow.run_local_server(port=0)
-
-        # Sauvegarde le token pour les prochaines fois
-        with open("token.json", "w") as token:
-            token.write(creds.to_json())
-
-    # Initialisation Earth Engine avec les credentials OAuth
-    ee.Initialize(credentials=creds)
-    print(" Earth Engine authentifié avec succès !")
-
-
-# ---------------------------------------------------------------------------
-# Helpers -------------------------------------------------------------------
-# ---------------------------------------------------------------------------
-# Helpers mis à jour ---------------------------------------------------------
-
-S2_BANDS = [
-    "B1","B2","B3","B4","B5","B6","B7","B8","B8A","B9","B11","B12","AOT","WVP",
-]
-
-def s2_prepare(img: ee.Image) -> ee.Image:
-    img = img.select(S2_BANDS)                       # bandes homogènes
-    ndvi = img.normalizedDifference(["B8", "B4"]).rename("NDVI")
-    ndwi = img.normalizedDifference(["B3", "B8"]).rename("NDWI")
-    return img.addBands([ndvi, ndwi])
-
-def median_sample(point: ee.Geometry,
-                  date_start: str,
-                  date_end: str,
-                  sensor: str,
-                  scale: int = 10) -> Dict[str, Any]:
-    """Renvoie le dictionnaire des valeurs médianes (reduceRegion)."""
-
-    if sensor == "S2":
-        coll = (ee.ImageCollection("COPERNICUS/S2_SR_HARMONIZED")
-                .filterBounds(point)
-                .filterDate(date_start, date_end)
-                .map(s2_prepare))
-    elif sensor == "S1":
-        pol = ee.Filter.listContains('transmitterReceiverPolarisation', 'VV') \
-              .And(ee.Filter.listContains('transmitterReceiverPolarisation', 'VH'))
-        coll = (ee.ImageCollection("COPERNICUS/S1_GRD")
-                .filter(pol)
-                .filterBounds(point)
-                .filterDate(date_start, date_end)
-                .select(["VV", "VH"]))
-    elif sensor == "S3":
-        coll = (ee.ImageCollection("COPERNICUS/S3/OLCI")
-                .filterBounds(point)
-                .filterDate(date_start, date_end))
-    else:
-        raise ValueError("Unknown sensor")
-
-    img = coll.median()
-
-    # reduceRegion est plus tolérant que sample() sur les valeurs manquantes
-    d = img.reduceRegion(
-            reducer = ee.Reducer.first(),   # prend la valeur du pixel
-            geometry = point,
-            scale = scale,
-            bestEffort = True
-        ).getInfo()
-
-    # d == {} si aucune acquisition
-    return d if d else {}
+from soils import stats
+from soils.earth_engine import ensure_initialized
+from soils.features import PERIODS, missing_windows, period_windows, record_attempts, save_features
+from soils.indices import compute_indices
+from soils.models import RemoteSensingFeature, SoilProfile
+from soils.sampling import sample_profile
 
 # ---------------------------------------------------------------------------
 # Management command --------------------------------------------------------
 
 class Command(BaseCommand):
-    help = "Attach Sentinel median values to SoilProfile.teledection_data (JSON)."
+    help = "Attach Sentinel median values to the RemoteSensingFeature table."
 
     def add_arguments(self, parser):
         parser.add_argument("--start", default="2024-01-01")
         parser.add_argument("--end", default=str(dt.date.today()))
-        parser.add_argument("--sensor", choices=["S1", "S2", "S3", "all"], default="all")
+        parser.add_argument("--sensor", choices=["S1", "S2", "S3", "L8", "all"], default="all")
         parser.add_argument("--scale", type=int, default=10)
         parser.add_argument("--batch", type=int, default=200)
         parser.add_argument("--source", choices=["IRD", "WOSIS", "AFSP", "all"], default='IRD')
+        parser.add_argument("--workers", type=int, default=4, help="threads d'échantillonnage EE")
+        parser.add_argument(
+            "--period",
+            choices=["none", *PERIODS],
+            default="none",
+            help="none = un composite sur [start, end[ ; sinon une série temporelle "
+                 "(seules les périodes complètes et absentes sont échantillonnées)",
+        )
+        parser.add_argument("--retry", action="store_true",
+                            help="redemander aussi les fenêtres revenues vides récemment (SamplingAttempt)")
         
 
     def handle(self, *args, **opts):
-        authenticate_earth_engine()
+        # flow OAuth interactif seulement si lancé depuis un terminal
+        ensure_initialized(interactive=sys.stdin.isatty())
         start, end = opts["start"], opts["end"]
         sensor_choice, scale, batch_size ,source = opts["sensor"], opts["scale"], opts["batch"] ,opts["source"]
+        sensors = ["S2", "S1", "S3"] if sensor_choice == "all" else [sensor_choice]
 
+        if opts["period"] == "none":
+            windows = [(dt.date.fromisoformat(start), dt.date.fromisoformat(end))]
+        else:
+            windows = period_windows(start, end, opts["period"])
+        if not windows:
+            self.stdout.write(self.style.WARNING("Aucune période complète entre start et end"))
+            return
 
-        qs = SoilProfile.objects.filter(teledection_data={}).order_by("id")
+        profiles = SoilProfile.objects.order_by("id")
         if source != 'all':
-            qs = qs.filter(source__name=source)
-
-        total = qs.count()
-        self.stdout.write(self.style.NOTICE(f"→ {total} profils à traiter ,source : {source}"))
+            profiles = profiles.filter(source__name=source)
 
-        buffer: List[SoilProfile] = []
-        for profile in tqdm(qs.iterator(), total=total, unit="profil", colour="green"):
-            ee_point = ee.Geometry.Point([profile.location.x, profile.location.y])
-            sentinel_dict: Dict[str, Any] = {}
+        # fenêtres déjà présentes : une seule requête, on n'ajoute que les manquantes
+        by_profile = missing_windows(profiles, sensors, windows, retry_waiting=opts["retry"])
+        todo = {pid: w for pid, w in by_profile.items() if any(w.values())}
+        total = len(todo)
+        self.stdout.write(self.style.NOTICE(
+            f"→ {total} profils à traiter ,source : {source}, {len(windows)} fenêtre(s)"
+        ))
 
+        def _sample(profile):
             try:
-                if sensor_choice in ("S2", "all"):
-                    sentinel_dict["S2"] = median_sample(
-                        ee_point, start, end, "S2", scale=scale
-                    )
-                if sensor_choice in ("S1", "all"):
-                    sentinel_dict["S1"] = median_sample(
-                        ee_point, start, end, "S1", scale=scale
-                    )
-                if sensor_choice in ("S3", "all"):
-                    sentinel_dict["S3"] = median_sample(
-                        ee_point, start, end, "S3", scale=300
-                    )
+                return sample_profile(profile, todo[profile.pk], scale), None
             except Exception as exc:  # noqa: BLE001
-                self.stderr.write(self.style.WARNING(f"Profil {profile.profile_id}: {exc}"))
-                continue
-
-            merged = profile.teledection_data or {}
-            merged.update({k: v for k, v in sentinel_dict.items() if v})
-            profile.teledection_data = merged
-            buffer.append(profile)
-
-            if len(buffer) >= batch_size:
-                with transaction.atomic():
-                    SoilProfile.objects.bulk_update(buffer, ["teledection_data"])
-                buffer.clear()
-
-        if buffer:
-            with transaction.atomic():
-                SoilProfile.objects.bulk_update(buffer, ["teledection_data"])
+                return [], exc
+
+        # les requêtes EE sont des I/O : plusieurs threads partagent la même session
+        pending = (p for p in profiles.iterator() if p.pk in todo)
+        with ThreadPoolExecutor(max_workers=opts["workers"]) as pool, \
+                tqdm(total=total, unit="profil", colour="green") as bar:
+            while True:
+                chunk = list(islice(pending, batch_size))
+                if not chunk:
+                    break
+                buffer: List[RemoteSensingFeature] = []
+                errors = {}
+                for profile, (rows, exc) in zip(chunk, pool.map(_sample, chunk)):
+                    if exc is not None:
+                        errors[profile.pk] = str(exc)
+                        self.stderr.write(self.style.WARNING(f"Profil {profile.profile_id}: {exc}"))
+                    buffer.extend(rows)
+                save_features(buffer)
+                record_attempts({p.pk: todo[p.pk] for p in chunk}, buffer, errors)
+                bar.update(len(chunk))
+
+        # indices spectraux : seules les fenêtres dont les bandes ont changé sont recalculées
+        written = compute_indices(profiles=profiles)
+        self.stdout.write(self.style.NOTICE(f"→ {written} valeurs d'indices mises à jour"))
+        stats.refresh(None if source == "all" else [source])
 
         self.stdout.write(self.style.SUCCESS("✔ Terminé"))
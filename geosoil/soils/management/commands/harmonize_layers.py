@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""Harmonisation en profondeur des couches (spline à aires égales ou recouvrement).
+
+Tous les profils sont calculés ensemble, à partir des tableaux de couches
+(``soils.depth``). Sans ``--full``, seuls les profils dont les couches ou les
+paramètres (intervalles, ``--lambda``, ``--extensive``) ont changé depuis le
+dernier calcul sont recalculés ; leurs anciennes valeurs sont remplacées.
+
+```bash
+python manage.py harmonize_layers                                # spline, 0-10 et 10-30 cm
+python manage.py harmonize_layers --method overlap --method spline
+python manage.py harmonize_layers --interval 0-30 --interval 30-100 --full
+```
+"""
+from __future__ import annotations
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from soils.depth import INTERVALS, LAMBDA, METHODS, VARIABLE, refresh_harmonized
+
+
+def interval(text: str):
+    try:
+        top, bottom = (int(v) for v in text.split("-"))
+    except ValueError:
+        raise CommandError(f"Intervalle invalide : {text} (attendu : haut-bas, en cm)")
+    if not 0 <= top < bottom:
+        raise CommandError(f"Intervalle invalide : {text}")
+    return top, bottom
+
+
+class Command(BaseCommand):
+    help = "Harmonise the layer values of every profile over standard depth intervals."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--method", action="append", dest="methods", choices=METHODS,
+                            help="méthode (répétable, défaut : spline)")
+        parser.add_argument("--interval", action="append", dest="intervals",
+                            help="intervalle en cm, ex. 0-10 (répétable, défaut : 0-10 et 10-30)")
+        parser.add_argument("--variable", default=VARIABLE, help="champ numérique de Layer")
+        parser.add_argument("--lambda", type=float, default=LAMBDA, dest="lam", help="lissage de la spline")
+        parser.add_argument("--extensive", action="store_true",
+                            help="valeurs en quantité par couche (stock) : somme sur l'intervalle, pas moyenne")
+        parser.add_argument("--full", action="store_true", help="recalculer tous les profils")
+
+    def handle(self, *args, **opts):
+        intervals = [interval(text) for text in opts["intervals"]] if opts["intervals"] else list(INTERVALS)
+        for method in opts["methods"] or ["spline"]:
+            t0 = time.monotonic()
+            self.stdout.write(self.style.NOTICE(f"→ {method} {opts['variable']} "
+                                                f"{', '.join(f'{a}-{b}' for a, b in intervals)} cm"))
+            result = refresh_harmonized(
+                method=method,
+                intervals=intervals,
+                variable=opts["variable"],
+                extensive=opts["extensive"],
+                lam=opts["lam"],
+                full=opts["full"],
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f"✔ {result['profiles']} profils, {result['values']} valeurs, "
+                f"{result['deleted']} supprimées en {time.monotonic() - t0:.1f}s"
+            ))
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""Import de zones (zones_villages.shp, grid_250m.shp...) pour les statistiques zonales.
+
+```bash
+python manage.py load_zones zones_villages.shp --kind village --name-field name
+```
+
+Plusieurs entités du même nom (fréquent dans zones_villages.shp) sont
+fusionnées en une zone multipolygone, ou renommées « nom (2) »… avec
+``--duplicates suffix`` : l'upsert PostgreSQL ne peut pas modifier deux fois
+la même ligne.
+"""
+from django.contrib.gis.gdal import DataSource
+from django.contrib.gis.geos import MultiPolygon
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from soils.models import Zone
+
+
+class Command(BaseCommand):
+    help = "Load polygons from a vector file into Zone (upsert on name + kind)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--kind", default="village")
+        parser.add_argument("--name-field", default=None, help="attribut du nom (défaut : identifiant OGR)")
+        parser.add_argument("--srid", type=int, default=32628, help="SRID si le fichier n'en a pas")
+        parser.add_argument("--duplicates", choices=["merge", "suffix"], default="merge",
+                            help="noms en double : fusionner les géométries ou suffixer le nom")
+
+    def handle(self, *args, **opts):
+        layer = DataSource(opts["path"])[0]
+        if opts["name_field"] and opts["name_field"] not in layer.fields:
+            raise CommandError(f"Champ {opts['name_field']} absent ({', '.join(layer.fields)})")
+
+        zones = {}
+        duplicates = 0
+        for feature in layer:
+            geom = feature.geom.geos
+            if not geom.srid:
+                geom.srid = opts["srid"]
+            geom.transform(4326)
+            if geom.geom_type == "Polygon":
+                geom = MultiPolygon(geom, srid=4326)
+            name = str(feature.get(opts["name_field"])) if opts["name_field"] else str(feature.fid)
+            if name in zones:
+                duplicates += 1
+                if opts["duplicates"] == "merge":
+                    zone = zones[name]
+                    merged = zone.geometry.union(geom)
+                    zone.geometry = MultiPolygon(merged, srid=4326) if merged.geom_type == "Polygon" else merged
+                    continue
+                base, i = name, 1
+                while name in zones:
+                    i += 1
+                    name = f"{base} ({i})"
+            zones[name] = Zone(name=name, kind=opts["kind"], geometry=geom)
+        zones = list(zones.values())
+
+        with transaction.atomic():
+            Zone.objects.bulk_create(
+                zones,
+                batch_size=1000,
+                update_conflicts=True,
+                update_fields=["geometry"],
+                unique_fields=["name", "kind"],
+            )
+        if duplicates:
+            action = "fusionnées" if opts["duplicates"] == "merge" else "renommées"
+            self.stdout.write(self.style.WARNING(f"{duplicates} entités de nom déjà vu {action}"))
+        self.stdout.write(self.style.SUCCESS(f"✔ {len(zones)} zones {opts['kind']} chargées"))
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""Prédiction SOC10/SOC30 en base pour tous les profils (remplace le CSV du notebook).
+
+Seuls les profils sans prédiction pour la version courante du modèle, ou dont
+une bande d'entrée a changé depuis la dernière prédiction, sont recalculés
+(``--all`` pour tout recalculer). Si une version est en shadow dans le
+registre, elle prédit les mêmes lots et l'écart entre les deux est affiché.
+Les explications SHAP des profils prédits
+sont ensuite calculées par ``explain_soc`` (``--no-explain`` pour l'éviter).
+"""
+from __future__ import annotations
+
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import numpy as np
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Q, Subquery
+
+from soils.features import feature_matrix
+from soils.models import RemoteSensingFeature, SocPrediction, SoilProfile
+from soils.prediction import get_predictor
+from soils.registry import agreement, shadow_version
+
+
+def stale_profiles(predictor, source: str = "all"):
+    """Profils dont la prédiction manque ou est plus ancienne que leurs entrées."""
+
+    sensors = {s for s, _ in predictor.columns}
+    bands = {b for _, b in predictor.columns}
+    inputs = RemoteSensingFeature.objects.filter(profile=OuterRef("pk"), sensor__in=sensors, band__in=bands)
+    preds = SocPrediction.objects.filter(profile=OuterRef("pk"), model_version=predictor.version)
+
+    qs = SoilProfile.objects.filter(Exists(inputs))
+    if source != "all":
+        qs = qs.filter(source__name=source)
+    return qs.annotate(
+        inputs_at=Subquery(inputs.order_by("-updated_at").values("updated_at")[:1]),
+        predicted_at=Subquery(preds.values("predicted_at")[:1]),
+    ).filter(Q(predicted_at__isnull=True) | Q(inputs_at__gt=F("predicted_at")))
+
+
+def _nan_to_none(v: float):
+    return None if math.isnan(v) else v
+
+
+class Command(BaseCommand):
+    help = "Predict SOC10/SOC30 for every (stale) SoilProfile and store them in SocPrediction."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true", help="re-predict every profile")
+        parser.add_argument("--source", default="all")
+        parser.add_argument("--chunk", type=int, default=5000, help="profils par lot")
+        parser.add_argument("--workers", type=int, default=2, help="threads d'inférence")
+        parser.add_argument("--threads", type=int, default=None, help="torch.set_num_threads")
+        parser.add_argument("--no-explain", action="store_true", help="ne pas calculer les explications SHAP")
+
+    def handle(self, *args, **opts):
+        import torch
+
+        t0 = time.monotonic()
+        predictor = get_predictor()
+        if opts["threads"]:
+            torch.set_num_threads(opts["threads"])
+
+        if opts["all"]:
+            profiles = SoilProfile.objects.all()
+            if opts["source"] != "all":
+                profiles = profiles.filter(source__name=opts["source"])
+        else:
+            profiles = stale_profiles(predictor, opts["source"])
+        ids = list(profiles.order_by("pk").values_list("pk", flat=True))
+        self.stdout.write(self.style.NOTICE(
+            f"→ {len(ids)} profils à prédire (modèle {predictor.version})"
+        ))
+
+        shadow = shadow_version()
+        shadow = get_predictor(shadow.version) if shadow and shadow.version != predictor.version else None
+        if shadow is not None:
+            self.stdout.write(f"  version shadow {shadow.version} sur les mêmes lots")
+
+        chunks = (ids[i:i + opts["chunk"]] for i in range(0, len(ids), opts["chunk"]))
+        written = 0
+        compared: List = []
+        # lecture / écriture en base dans ce thread, inférence dans le pool
+        with ThreadPoolExecutor(max_workers=opts["workers"]) as pool:
+            in_flight: List = []
+            for chunk in chunks:
+                pids, X = feature_matrix(predictor.columns, profiles=chunk)
+                live = pool.submit(predictor.predict, X, False)
+                in_flight.append((predictor.version, pids, live))
+                if shadow is not None:
+                    if shadow.columns != predictor.columns:
+                        _, X = feature_matrix(shadow.columns, profiles=pids.tolist())
+                    in_flight.append((shadow.version, pids, pool.submit(shadow.predict, X, False)))
+                    compared.append((live, in_flight[-1][2]))
+                if len(in_flight) >= 2 * opts["workers"]:
+                    written += self._save(*in_flight.pop(0))
+            for item in in_flight:
+                written += self._save(*item)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✔ {written} prédictions écrites en {time.monotonic() - t0:.1f}s"
+        ))
+        if compared:
+            stats = agreement(
+                np.concatenate([a.result() for a, _ in compared]),
+                np.concatenate([b.result() for _, b in compared]),
+            )
+            for depth, s in stats.items():
+                if s["n"]:
+                    self.stdout.write(
+                        f"  shadow {depth} : n={s['n']} MAE={s['mae']:.4f} biais={s['bias']:+.4f}"
+                        + (f" r={s['r']:.3f}" if s["r"] is not None else "")
+                    )
+        if written and not opts["no_explain"]:
+            call_command("explain_soc", workers=opts["workers"], threads=opts["threads"] or 1, stdout=self.stdout)
+
+    def _save(self, version: str, pids, future) -> int:
+        Y = future.result()
+        objs = [
+            SocPrediction(
+                profile_id=pid, model_version=version,
+                soc10=_nan_to_none(soc10), soc30=_nan_to_none(soc30),
+            )
+            for pid, (soc10, soc30) in zip(pids.tolist(), Y.tolist())
+        ]
+        with transaction.atomic():
+            SocPrediction.objects.bulk_create(
+                objs,
+                batch_size=1000,
+                update_conflicts=True,
+                update_fields=["soc10", "soc30", "predicted_at"],
+                unique_fields=["profile", "model_version"],
+            )
+        return len(objs)
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""Tables pivotées (une colonne typée par propriété) des propriétés profil/couche.
+
+```bash
+python manage.py property_pivots create carbone --property SOC_10 --property SOC_30 --property Site
+python manage.py property_pivots create horizons --level LY --property Argile --property pH
+python manage.py property_pivots refresh            # incrémental, toutes les tables
+python manage.py property_pivots refresh carbone --full
+python manage.py property_pivots rebuild carbone    # re-type les colonnes
+```
+"""
+from __future__ import annotations
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from soils import pivot
+from soils.models import Property, PropertySet
+
+
+class Command(BaseCommand):
+    help = "Create, refresh, rebuild or drop the wide property pivot tables."
+
+    def add_arguments(self, parser):
+        sub = parser.add_subparsers(dest="action", required=True)
+        sub.add_parser("list")
+        p = sub.add_parser("create")
+        p.add_argument("name")
+        p.add_argument("--level", choices=[Property.PF, Property.LY], default=Property.PF)
+        p.add_argument("--property", action="append", dest="properties",
+                       help="propriété (répétable, défaut : toutes celles du niveau)")
+        p.add_argument("--description", default="")
+        p = sub.add_parser("refresh")
+        p.add_argument("names", nargs="*")
+        p.add_argument("--full", action="store_true", help="reconstruire toutes les lignes")
+        p = sub.add_parser("rebuild")
+        p.add_argument("name")
+        p = sub.add_parser("drop")
+        p.add_argument("name")
+
+    def handle(self, *args, **opts):
+        action = opts["action"]
+        if action == "create":
+            properties = opts["properties"] or list(
+                Property.objects.filter(property_type=opts["level"], disable=False)
+                .order_by("name").values_list("name", flat=True).distinct()
+            )
+            if not properties:
+                raise CommandError("Aucune propriété à pivoter")
+            try:
+                ps = pivot.create(opts["name"], opts["level"], properties, opts["description"])
+            except IntegrityError:
+                raise CommandError(f"L'ensemble {opts['name']} existe déjà")
+            columns = ", ".join(f"{c['property']}:{c['type']}" for c in ps.columns)
+            self.stdout.write(self.style.SUCCESS(
+                f"✔ {pivot.table_name(ps)} : {len(ps.columns)} colonnes ({columns})"
+            ))
+        elif action == "refresh":
+            sets = PropertySet.objects.all()
+            if opts["names"]:
+                sets = sets.filter(name__in=opts["names"])
+            for ps in sets:
+                t0 = time.monotonic()
+                written = pivot.refresh(ps, full=opts["full"])
+                self.stdout.write(f"  {ps.name} : {written} lignes en {time.monotonic() - t0:.1f}s")
+        elif action in ("rebuild", "drop"):
+            try:
+                ps = PropertySet.objects.get(name=opts["name"])
+            except PropertySet.DoesNotExist:
+                raise CommandError(f"Ensemble inconnu : {opts['name']}")
+            if action == "drop":
+                pivot.drop(ps)
+                self.stdout.write(f"supprimé {opts['name']}")
+            else:
+                self.stdout.write(f"  {ps.name} : {pivot.rebuild(ps)} lignes")
+        else:
+            for ps in PropertySet.objects.order_by("name"):
+                refreshed = f"{ps.refreshed_at:%Y-%m-%d %H:%M}" if ps.refreshed_at else "jamais"
+                self.stdout.write(f"  {ps.name:<20} {ps.level} {len(ps.columns):>3} colonnes, rafraîchi : {refreshed}")
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""Suppression par lots des profils (ou des seules couches) d'une source.
+
+Même traitement que ``POST /api/sources/<id>/purge/``, au premier plan :
+
+```bash
+python manage.py purge_profiles --source WOSIS              # profils et tout ce qui en dépend
+python manage.py purge_profiles --source WOSIS --layers     # couches seulement, avant un rechargement
+python manage.py purge_profiles --resume                    # reprend les purges échouées ou interrompues
+```
+"""
+from __future__ import annotations
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from soils import purge
+from soils.models import PurgeJob, Source
+
+
+class Command(BaseCommand):
+    help = "Delete the profiles (or layers) of a source with chunked set-based SQL deletes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--source", help="nom de la source")
+        parser.add_argument("--all", action="store_true", help="toutes les sources (TRUNCATE)")
+        parser.add_argument("--layers", action="store_true", help="supprimer seulement les couches")
+        parser.add_argument("--chunk", type=int, default=2000, help="lignes par transaction")
+        parser.add_argument("--resume", action="store_true", help="relancer les purges non terminées")
+
+    def handle(self, *args, **opts):
+        if opts["resume"]:
+            # une purge encore active (heartbeat récent) n'est pas lancée une seconde fois
+            jobs = [
+                job for job in PurgeJob.objects.exclude(status=PurgeJob.DONE).order_by("created_at")
+                if job.status == PurgeJob.FAILED or (purge.is_stale(job) and purge.reclaim(job))
+            ]
+        else:
+            if bool(opts["source"]) == opts["all"]:
+                raise CommandError("Indiquer --source NOM ou --all")
+            source = None
+            if opts["source"]:
+                try:
+                    source = Source.objects.get(name=opts["source"])
+                except Source.DoesNotExist:
+                    raise CommandError(f"Source inconnue : {opts['source']}")
+            scope = PurgeJob.LAYERS if opts["layers"] else PurgeJob.PROFILES
+            job, created = purge.submit(source, scope, opts["chunk"])
+            if not created:
+                raise CommandError(f"Purge {job.pk} déjà en cours ({job.deleted}/{job.total})")
+            jobs = [job]
+
+        for job in jobs:
+            t0 = time.monotonic()
+            self.stdout.write(self.style.NOTICE(f"→ purge {job.pk} : {job.scope} de {job.source or 'toutes les sources'}"))
+            job = purge.run(job)
+            if job.status == PurgeJob.FAILED:
+                raise CommandError(f"Purge {job.pk} échouée : {job.error}")
+            self.stdout.write(self.style.SUCCESS(f"✔ {job.deleted} lignes supprimées en {time.monotonic() - t0:.1f}s"))
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""Rafraîchissement incrémental des données de télédétection.
+
+Seuls les profils qui en ont besoin sont échantillonnés, par ordre de priorité :
+
+1. nouveaux profils (aucune donnée),
+2. profils auxquels il manque un capteur,
+3. profils dont la donnée la plus récente date de plus de ``--max-age`` jours
+   (la dernière fenêtre est ré-échantillonnée, les nouvelles sont ajoutées).
+
+Une fenêtre revenue vide (pas d'acquisition S1/S3, erreur EE) est notée dans
+``SamplingAttempt`` et n'est redemandée qu'après un délai qui double à chaque
+échec : un profil sans données possibles ne repasse pas en tête à chaque
+exécution.
+
+Le traitement se fait par lots jusqu'à épuisement de ``--time-budget`` ;
+chaque exécution est tracée dans ``RefreshRun``. Usage cron :
+
+```bash
+python manage.py refresh_remote_sensing --time-budget 3000
+```
+
+ou en service longue durée : ``--loop --interval 3600``.
+"""
+from __future__ import annotations
+
+import datetime as dt
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from django.core.management.base import BaseCommand
+from django.db.models import Case, Exists, F, IntegerField, OuterRef, Q, Subquery, Value, When
+from django.utils import timezone
+
+from soils import stats
+from soils.earth_engine import ensure_initialized
+from soils.features import PERIODS, missing_windows, period_windows, record_attempts, save_features, waiting_windows
+from soils.indices import compute_indices
+from soils.models import RefreshRun, RemoteSensingFeature, SamplingAttempt, SoilProfile
+from soils.sampling import sample_profile
+
+NEW, INCOMPLETE, STALE, FRESH = range(4)
+# L8 compris : SR_B1..SR_B7 sont les entrées par défaut des modèles SOC (train_soc_models)
+SENSORS = ["S2", "S1", "S3", "L8"]
+
+
+def prioritized_profiles(sensors: List[str], stale_before: dt.datetime, source: str = "all"):
+    """Profils à rafraîchir annotés de ``priority`` (NEW < INCOMPLETE < STALE).
+
+    Un capteur dont une tentative est en attente (``SamplingAttempt.retry_at``)
+    ne compte pas comme manquant, et un profil en attente n'est pas périmé.
+    """
+
+    bands = RemoteSensingFeature.objects.filter(profile=OuterRef("pk"), derived=False)
+    attempts = SamplingAttempt.objects.filter(profile=OuterRef("pk"), retry_at__gt=timezone.now())
+    qs = SoilProfile.objects.annotate(
+        last_update=Subquery(bands.order_by("-updated_at").values("updated_at")[:1]),
+        waiting=Exists(attempts.filter(sensor__in=sensors)),
+        **{f"has_{s}": Exists(bands.filter(sensor=s)) for s in sensors},
+        **{f"waiting_{s}": Exists(attempts.filter(sensor=s)) for s in sensors},
+    )
+    if source != "all":
+        qs = qs.filter(source__name=source)
+
+    missing_sensor = Q()
+    for s in sensors:
+        missing_sensor |= Q(**{f"has_{s}": False, f"waiting_{s}": False})
+
+    return (
+        qs.annotate(priority=Case(
+            When(missing_sensor & Q(last_update__isnull=True), then=Value(NEW)),
+            When(missing_sensor, then=Value(INCOMPLETE)),
+            When(last_update__lt=stale_before, waiting=False, then=Value(STALE)),
+            default=Value(FRESH),
+            output_field=IntegerField(),
+        ))
+        .filter(priority__lt=FRESH)
+        .order_by("priority", F("last_update").asc(nulls_first=True), "id")
+    )
+
+
+class Command(BaseCommand):
+    help = "Incremental remote-sensing refresh of new, incomplete and stale profiles within a time budget."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sensor", action="append", choices=SENSORS, dest="sensors",
+                            help=f"capteur à rafraîchir (répétable, défaut : {', '.join(SENSORS)})")
+        parser.add_argument("--start", default="2024-01-01", help="début de la série temporelle")
+        parser.add_argument("--period", choices=list(PERIODS), default="monthly")
+        parser.add_argument("--max-age", type=int, default=30, help="jours avant qu'un profil soit périmé")
+        parser.add_argument("--source", default="all")
+        parser.add_argument("--scale", type=int, default=10)
+        parser.add_argument("--batch", type=int, default=200)
+        parser.add_argument("--workers", type=int, default=4)
+        parser.add_argument("--limit", type=int, default=None, help="nombre max de profils par exécution")
+        parser.add_argument("--time-budget", type=int, default=3000, help="secondes par exécution")
+        parser.add_argument("--loop", action="store_true", help="tourner en continu")
+        parser.add_argument("--interval", type=int, default=3600, help="secondes entre deux exécutions (--loop)")
+
+    def handle(self, *args, **opts):
+        opts["sensors"] = opts["sensors"] or list(SENSORS)
+        # jamais de flow interactif : cron / conteneur
+        ensure_initialized(interactive=False)
+        while True:
+            self.run_once(opts)
+            if not opts["loop"]:
+                break
+            time.sleep(opts["interval"])
+
+    def run_once(self, opts) -> RefreshRun:
+        t0 = time.monotonic()
+        deadline = t0 + opts["time_budget"]
+        sensors = opts["sensors"]
+        run = RefreshRun.objects.create(options={
+            k: opts[k] for k in ("sensors", "start", "period", "max_age", "source", "limit", "time_budget")
+        })
+
+        windows = period_windows(opts["start"], dt.date.today(), opts["period"])
+        if not windows:
+            self.stdout.write(self.style.WARNING("Aucune période complète depuis --start"))
+            return self._finish(run, t0)
+
+        stale_before = timezone.now() - dt.timedelta(days=opts["max_age"])
+        candidates = prioritized_profiles(sensors, stale_before, opts["source"]).values_list("pk", "priority")
+        if opts["limit"]:
+            candidates = candidates[:opts["limit"]]
+        candidates = list(candidates)
+        stale = {pk for pk, priority in candidates if priority == STALE}
+        run.profiles_selected = len(candidates)
+        self.stdout.write(self.style.NOTICE(f"→ {len(candidates)} profils à rafraîchir"))
+
+        with ThreadPoolExecutor(max_workers=opts["workers"]) as pool:
+            for i in range(0, len(candidates), opts["batch"]):
+                if time.monotonic() >= deadline:
+                    self.stdout.write(self.style.WARNING("Budget temps épuisé, arrêt"))
+                    break
+                ids = [pk for pk, _ in candidates[i:i + opts["batch"]]]
+                self._process_batch(run, pool, ids, sensors, windows, stale, opts["scale"])
+                run.wall_time = time.monotonic() - t0
+                run.save()
+
+        stats.refresh(None if opts["source"] == "all" else [opts["source"]])
+        return self._finish(run, t0)
+
+    def _process_batch(self, run, pool, ids, sensors, windows, stale, scale):
+        profiles = SoilProfile.objects.filter(pk__in=ids)
+        todo = missing_windows(profiles, sensors, windows)
+        waiting = waiting_windows(profiles, sensors, windows[-1:])
+        for pk, by_sensor in todo.items():
+            for s, missing in by_sensor.items():
+                if pk in stale and windows[-1] not in missing and (pk, s, *windows[-1]) not in waiting:
+                    missing.append(windows[-1])
+                run.cache_hits += len(windows) - len(missing)
+                run.requests_made += 1 if missing else 0
+
+        def _sample(profile):
+            try:
+                return sample_profile(profile, todo[profile.pk], scale), None
+            except Exception as exc:  # noqa: BLE001
+                return [], exc
+
+        buffer, errors = [], {}
+        batch = [p for p in profiles if any(todo[p.pk].values())]
+        for profile, (rows, exc) in zip(batch, pool.map(_sample, batch)):
+            if exc is not None:
+                run.errors += 1
+                errors[profile.pk] = str(exc)
+                self.stderr.write(self.style.WARNING(f"Profil {profile.profile_id}: {exc}"))
+            buffer.extend(rows)
+        save_features(buffer)
+        # fenêtres vides ou en erreur : redemandées plus tard (délai croissant)
+        record_attempts({p.pk: todo[p.pk] for p in batch}, buffer, errors)
+        compute_indices(profiles=profiles)
+
+        run.profiles_processed += len(batch)
+        run.features_written += len(buffer)
+
+    def _finish(self, run: RefreshRun, t0: float) -> RefreshRun:
+        run.finished_at = timezone.now()
+        run.wall_time = time.monotonic() - t0
+        run.save()
+        self.stdout.write(self.style.SUCCESS(
+            f"✔ {run.profiles_processed} profils, {run.requests_made} requêtes EE, "
+            f"{run.cache_hits} fenêtres en cache, {run.errors} erreurs, {run.wall_time:.0f}s"
+        ))
+        return run
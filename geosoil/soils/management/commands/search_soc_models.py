@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""Recherche d'hyperparamètres des MLP SOC (essais parallèles, élagage à la médiane).
+
+```bash
+python manage.py search_soc_models --study soc10-2026 --trials 60 --workers 6
+python manage.py search_soc_models --study soc10-2026 --top 10   # classement seul
+```
+
+Chaque essai tire une architecture, un dropout, un lr, un weight decay et un
+jeu de features (``--feature-set``), puis est enregistré dans
+``TrainingTrial`` ; relancer la même étude continue la numérotation.
+"""
+from __future__ import annotations
+
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import replace
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max
+
+from soils.models import TrainingTrial
+from soils.search import (
+    FEATURE_SETS,
+    TrialSpec,
+    candidate_sets,
+    median_curves,
+    prepare_folds,
+    run_trial,
+    sample_params,
+    trial_record,
+)
+from soils.training import GROUP_PROPERTY, TARGET_10, TrainCfg, _init_worker, load_training_data
+
+
+class Command(BaseCommand):
+    help = "Random hyperparameter search of the SOC MLPs with parallel trials and median pruning."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--study", required=True)
+        parser.add_argument("--trials", type=int, default=0, help="nombre d'essais à lancer")
+        parser.add_argument("--target", default=TARGET_10)
+        parser.add_argument("--group-property", default=GROUP_PROPERTY)
+        parser.add_argument("--feature-set", action="append", dest="feature_sets", choices=sorted(FEATURE_SETS),
+                            help="jeu de features candidat (répétable, défaut : tous)")
+        parser.add_argument("--attribute", action="append", dest="attributes", default=[],
+                            help="propriété du profil ajoutée comme jeu 'other' (répétable)")
+        parser.add_argument("--epochs", type=int, default=600)
+        parser.add_argument("--patience", type=int, default=50)
+        parser.add_argument("--splits", type=int, default=3)
+        parser.add_argument("--startup", type=int, default=5, help="essais complets (par jeu) avant d'élaguer")
+        parser.add_argument("--warmup", type=int, default=30, help="époques avant d'élaguer un pli")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="essais en parallèle")
+        parser.add_argument("--threads", type=int, default=1, help="threads torch par processus")
+        parser.add_argument("--top", type=int, default=10, help="lignes du classement affiché")
+
+    def handle(self, *args, **opts):
+        study = opts["study"]
+        if opts["trials"] > 0:
+            self.search(study, opts)
+        self.leaderboard(study, opts["top"])
+
+    def search(self, study, opts):
+        t0 = time.monotonic()
+        # 'other' = union des jeux sélectionnés + attributs ; les attributs ne
+        # passent que par attributes= (pas des bandes du feature store)
+        feature_sets, features = candidate_sets(list(opts["feature_sets"] or FEATURE_SETS), opts["attributes"])
+        data = load_training_data(features, (opts["target"],), opts["group_property"], opts["attributes"])
+        if not len(data.profile_ids):
+            raise CommandError("Aucun profil avec cible et features")
+
+        base = TrainCfg(epochs=opts["epochs"], batch_size=128, patience=opts["patience"],
+                        n_splits=opts["splits"], seed=opts["seed"])
+        # un jeu de plis par jeu de features : ses colonnes, ses profils (comme train_soc_models)
+        cache_dir = os.path.join(settings.SOC_TRAINING_CACHE_DIR, "search")
+        data_dirs = {
+            name: prepare_folds(data, opts["target"], base, cache_dir, feature_sets[name])
+            for name in feature_sets
+        }
+        self.stdout.write(self.style.NOTICE(
+            f"→ {len(data.profile_ids)} profils, {len(data.features)} features, données {data.digest} ({cache_dir})"
+        ))
+
+        # les courbes des essais déjà complets de l'étude (même jeu = mêmes plis) servent de référence
+        done = TrainingTrial.objects.filter(study=study, state="complete", data_hash=data.digest)
+        curves = {name: [] for name in feature_sets}
+        for feature_set, trial_curves in done.values_list("feature_set", "curves"):
+            if feature_set in curves:
+                curves[feature_set].append(trial_curves)
+        first = (TrainingTrial.objects.filter(study=study).aggregate(n=Max("number"))["n"] or -1) + 1
+        rng = np.random.default_rng(opts["seed"] + first)
+        names = list(feature_sets)
+
+        def spec(number):
+            feature_set = names[rng.integers(len(names))]
+            cfg = replace(base, **sample_params(rng))
+            median = (median_curves(curves[feature_set], base.n_splits, base.epochs)
+                      if len(curves[feature_set]) >= opts["startup"] else None)
+            return feature_set, TrialSpec(number, data_dirs[feature_set], cfg, median, opts["warmup"])
+
+        counts = {"complete": 0, "pruned": 0, "failed": 0}
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(opts["workers"], mp_context=ctx, initializer=_init_worker,
+                                 initargs=(opts["threads"],)) as pool:
+            pending, numbers = {}, iter(range(first, first + opts["trials"]))
+
+            def submit():
+                number = next(numbers, None)
+                if number is None:
+                    return
+                feature_set, s = spec(number)
+                pending[pool.submit(run_trial, s)] = (feature_set, s)
+
+            for _ in range(opts["workers"]):
+                submit()
+            while pending:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    feature_set, s = pending.pop(fut)
+                    result = fut.result()
+                    trial_record(
+                        study, opts["target"], data.digest, feature_set,
+                        feature_sets[feature_set], s.cfg, result,
+                    ).save()
+                    counts[result["state"]] += 1
+                    if result["state"] == "complete":
+                        curves[feature_set].append(result["curves"])
+                    value = result.get("value")
+                    self.stdout.write(
+                        f"  #{s.number} {result['state']:<8} {feature_set:<16} "
+                        f"loss={'-' if value is None else f'{value:.4f}'} "
+                        f"R2={'-' if result.get('r2') is None else format(result['r2'], '.3f')} "
+                        f"({result['epochs']} époques, {result['duration']:.0f}s)"
+                    )
+                    submit()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✔ {sum(counts.values())} essais ({counts['complete']} complets, {counts['pruned']} élagués, "
+            f"{counts['failed']} en échec) en {time.monotonic() - t0:.0f}s"
+        ))
+
+    def leaderboard(self, study, top):
+        trials = TrainingTrial.objects.filter(study=study, state="complete")[:top]
+        if not trials:
+            self.stdout.write(f"Aucun essai complet pour l'étude {study}")
+            return
+        self.stdout.write(self.style.NOTICE(f"Classement {study}"))
+        for t in trials:
+            p = t.params
+            self.stdout.write(
+                f"  #{t.number:<4} loss={t.value:.4f} R2={t.r2:.3f} RMSE={t.rmse:.3f} {t.feature_set:<16} "
+                f"hidden={p.get('hidden')} dropout={p.get('dropout', 0):.2f} "
+                f"lr={p.get('lr', 0):.1e} wd={p.get('weight_decay', 0):.1e}"
+            )
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""Registre des versions du modèle SOC.
+
+```bash
+python manage.py soc_models list
+python manage.py soc_models register /models/bundles/2026-10-01_ab12cd34ef56 --promote
+python manage.py soc_models shadow 3f9e1c          # prédit à côté de la version live
+python manage.py soc_models compare 3f9e1c ab12cd
+python manage.py soc_models promote 3f9e1c
+python manage.py soc_models rollback
+```
+
+Les workers gunicorn chargent la nouvelle version live en arrière-plan, sans
+redémarrage (``SOC_MODEL_CHECK_SECONDS``).
+"""
+from __future__ import annotations
+
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from soils import registry
+from soils.models import SocModelVersion
+
+
+class Command(BaseCommand):
+    help = "List, register, promote, roll back, shadow and compare SOC model versions."
+
+    def add_arguments(self, parser):
+        sub = parser.add_subparsers(dest="action", required=True)
+        sub.add_parser("list")
+        p = sub.add_parser("register", help="copier un bundle dans le registre")
+        p.add_argument("directory", nargs="?", default=str(settings.SOC_MODELS_DIR))
+        p.add_argument("--notes", default="")
+        p.add_argument("--promote", action="store_true")
+        p = sub.add_parser("promote")
+        p.add_argument("version")
+        sub.add_parser("rollback")
+        p = sub.add_parser("shadow", help="version évaluée en parallèle ('none' pour arrêter)")
+        p.add_argument("version")
+        p = sub.add_parser("compare", help="deux versions sur le même lot de profils")
+        p.add_argument("a")
+        p.add_argument("b")
+
+    def handle(self, *args, **opts):
+        action = opts["action"]
+        try:
+            if action == "register":
+                mv = registry.register(opts["directory"], opts["notes"])
+                self.stdout.write(f"enregistré {mv.version} → {mv.directory}")
+                if opts["promote"]:
+                    self.promoted(registry.promote(mv.version))
+            elif action == "promote":
+                self.promoted(registry.promote(opts["version"]))
+            elif action == "rollback":
+                self.promoted(registry.rollback())
+            elif action == "shadow":
+                mv = registry.set_shadow(None if opts["version"] == "none" else opts["version"])
+                self.stdout.write(f"shadow : {mv.version if mv else 'aucune'}")
+            elif action == "compare":
+                self.stdout.write(json.dumps(registry.compare_versions(opts["a"], opts["b"]), indent=2))
+        except (SocModelVersion.DoesNotExist, ValueError, FileNotFoundError) as exc:
+            raise CommandError(str(exc))
+        if action == "list":
+            self.list()
+
+    def promoted(self, mv: SocModelVersion) -> None:
+        self.stdout.write(self.style.SUCCESS(
+            f"✔ {mv.version} live (les workers basculent sous {settings.SOC_MODEL_CHECK_SECONDS:.0f}s)"
+        ))
+
+    def list(self) -> None:
+        for mv in SocModelVersion.objects.all():
+            oof = mv.metrics.get("soc10", {}).get("oof", {})
+            self.stdout.write(
+                f"  {mv.version}  {mv.role:<9} {mv.created_at:%Y-%m-%d %H:%M}  "
+                f"R2 SOC10={oof.get('R2', float('nan')):.3f}  {mv.notes}"
+            )
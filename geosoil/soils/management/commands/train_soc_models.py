@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""Entraînement des MLP SOC10/SOC30 depuis la base (remplace notebooks/train_mlp.ipynb).
+
+```bash
+python manage.py train_soc_models --workers 3 --install
+```
+
+Le bundle (deux ``.pkl`` + ``metrics.json``) est écrit dans
+``SOC_MODELS_DIR/bundles/<date>_<hash des données>`` ; ``--install``
+l'enregistre dans le registre des modèles et le promeut (voir ``soc_models``).
+"""
+from __future__ import annotations
+
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from soils import registry
+from soils.depth import DEPTH_TARGETS, METHODS
+from soils.training import (
+    GROUP_PROPERTY,
+    LANDSAT_BANDS,
+    TARGET_10,
+    TARGET_30,
+    TrainCfg,
+    default_bundle_name,
+    load_training_data,
+    save_bundle,
+    train_soc_models,
+)
+
+
+class Command(BaseCommand):
+    help = "Train the SOC10/SOC30 MLPs (GroupKFold in parallel processes) and write a model bundle."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--feature", action="append", dest="features",
+                            help="feature du modèle (répétable, défaut : SR_B1..SR_B7)")
+        parser.add_argument("--target10", default=TARGET_10)
+        parser.add_argument("--target30", default=TARGET_30)
+        parser.add_argument("--group-property", default=GROUP_PROPERTY)
+        parser.add_argument("--depth-method", choices=METHODS, default=None,
+                            help="cibles depuis les couches harmonisées (harmonize_layers) au lieu des propriétés")
+        parser.add_argument("--splits", type=int, default=3)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--workers", type=int, default=3, help="processus (un pli chacun)")
+        parser.add_argument("--threads", type=int, default=1, help="threads torch par processus")
+        parser.add_argument("--output", default=None, help="répertoire du bundle")
+        parser.add_argument("--install", action="store_true", help="enregistrer et promouvoir le bundle")
+
+    def handle(self, *args, **opts):
+        t0 = time.monotonic()
+        targets = (opts["target10"], opts["target30"])
+        if opts["depth_method"] and not set(targets) <= set(DEPTH_TARGETS):
+            raise CommandError(f"--depth-method : cibles possibles {', '.join(DEPTH_TARGETS)}")
+        data = load_training_data(
+            opts["features"] or LANDSAT_BANDS,
+            targets,
+            opts["group_property"],
+            depth_method=opts["depth_method"],
+        )
+        if not len(data.profile_ids):
+            raise CommandError("Aucun profil avec cible et features")
+        self.stdout.write(self.style.NOTICE(
+            f"→ {len(data.profile_ids)} profils, {len(data.features)} features, données {data.digest}"
+        ))
+
+        # hyperparamètres du notebook
+        common = {"n_splits": opts["splits"], "seed": opts["seed"]}
+        cfg10 = TrainCfg(epochs=600, batch_size=128, lr=2e-3, weight_decay=5e-4, patience=50, **common)
+        cfg30 = TrainCfg(epochs=700, batch_size=128, lr=2e-3, weight_decay=8e-4, patience=60, **common)
+        result = train_soc_models(
+            data, cfg10, cfg30, opts["workers"], opts["threads"], (opts["target10"], opts["target30"])
+        )
+
+        output = opts["output"] or os.path.join(settings.SOC_MODELS_DIR, "bundles", default_bundle_name(data))
+        save_bundle(result, output)
+        metrics = result["metrics"]
+        self.stdout.write(
+            f"  OOF SOC10 R2={metrics['soc10']['oof']['R2']:.3f} RMSE={metrics['soc10']['oof']['RMSE']:.3f} | "
+            f"SOC30 R2={metrics['soc30']['oof']['R2']:.3f} RMSE={metrics['soc30']['oof']['RMSE']:.3f}"
+        )
+
+        installed = ""
+        if opts["install"]:
+            installed = f" promu ({registry.promote(registry.register(output, f'données {data.digest}').version).version})"
+        self.stdout.write(self.style.SUCCESS(
+            f"✔ bundle {output}{installed} en {time.monotonic() - t0:.0f}s"
+        ))
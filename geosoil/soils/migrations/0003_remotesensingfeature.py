@@ -0,0 +1,56 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def copy_teledection_json(apps, schema_editor):
+    """Explode the legacy ``teledection_data`` JSON into feature rows."""
+    SoilProfile = apps.get_model('soils', 'SoilProfile')
+    RemoteSensingFeature = apps.get_model('soils', 'RemoteSensingFeature')
+
+    buffer = []
+    qs = SoilProfile.objects.exclude(teledection_data={}).exclude(teledection_data=None)
+    for profile_id, data in qs.values_list('id', 'teledection_data').iterator(chunk_size=2000):
+        for sensor, bands in (data or {}).items():
+            if sensor not in ('S1', 'S2', 'S3') or not isinstance(bands, dict):
+                continue
+            for band, value in bands.items():
+                try:
+                    value = float(value)
+                except (TypeError, ValueError):
+                    value = None
+                buffer.append(RemoteSensingFeature(
+                    profile_id=profile_id, sensor=sensor, band=band, value=value,
+                ))
+        if len(buffer) >= 5000:
+            RemoteSensingFeature.objects.bulk_create(buffer, ignore_conflicts=True)
+            buffer.clear()
+    RemoteSensingFeature.objects.bulk_create(buffer, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('soils', '0002_rename_sentinel_data_soilprofile_teledection_data'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RemoteSensingFeature',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sensor', models.CharField(choices=[('S1', 'Sentinel-1'), ('S2', 'Sentinel-2'), ('S3', 'Sentinel-3')], max_length=2)),
+                ('window_start', models.DateField(blank=True, help_text='Start of the compositing window (null for migrated JSON)', null=True)),
+                ('window_end', models.DateField(blank=True, help_text='End of the compositing window (null for migrated JSON)', null=True)),
+                ('band', models.CharField(max_length=30)),
+                ('value', models.FloatField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='features', to='soils.soilprofile')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['sensor', 'band'], name='feature_sensor_band_idx')],
+                'constraints': [models.UniqueConstraint(fields=('profile', 'sensor', 'window_start', 'window_end', 'band'), name='unique_feature_per_window', nulls_distinct=False)],
+            },
+        ),
+        migrations.RunPython(copy_teledection_json, migrations.RunPython.noop),
+    ]
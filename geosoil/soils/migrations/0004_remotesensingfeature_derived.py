@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('soils', '0003_remotesensingfeature'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='remotesensingfeature',
+            name='derived',
+            field=models.BooleanField(default=False, help_text='Spectral index computed from the stored bands (see soils.indices)'),
+        ),
+        migrations.AlterField(
+            model_name='remotesensingfeature',
+            name='sensor',
+            field=models.CharField(choices=[('S1', 'Sentinel-1'), ('S2', 'Sentinel-2'), ('S3', 'Sentinel-3'), ('L8', 'Landsat-8')], max_length=2),
+        ),
+    ]
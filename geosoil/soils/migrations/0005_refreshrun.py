@@ -0,0 +1,30 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('soils', '0004_remotesensingfeature_derived'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RefreshRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('options', models.JSONField(blank=True, default=dict)),
+                ('profiles_selected', models.PositiveIntegerField(default=0)),
+                ('profiles_processed', models.PositiveIntegerField(default=0)),
+                ('requests_made', models.PositiveIntegerField(default=0, help_text='Earth Engine round trips (one per profile and sensor)')),
+                ('cache_hits', models.PositiveIntegerField(default=0, help_text='Sensor windows already stored and fresh, not re-sampled')),
+                ('features_written', models.PositiveIntegerField(default=0)),
+                ('errors', models.PositiveIntegerField(default=0)),
+                ('wall_time', models.FloatField(default=0, help_text='Seconds')),
+            ],
+            options={
+                'ordering': ['-started_at'],
+            },
+        ),
+    ]
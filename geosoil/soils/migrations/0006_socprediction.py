@@ -0,0 +1,26 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('soils', '0005_refreshrun'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SocPrediction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_version', models.CharField(db_index=True, max_length=64)),
+                ('soc10', models.FloatField(blank=True, help_text='Predicted SOC 0–10 cm', null=True)),
+                ('soc30', models.FloatField(blank=True, help_text='Predicted SOC 10–30 cm', null=True)),
+                ('predicted_at', models.DateTimeField(auto_now=True)),
+                ('profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='soc_predictions', to='soils.soilprofile')),
+            ],
+            options={
+                'unique_together': {('profile', 'model_version')},
+            },
+        ),
+    ]
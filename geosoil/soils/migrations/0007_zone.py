@@ -0,0 +1,25 @@
+import django.contrib.gis.db.models.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('soils', '0006_socprediction'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Zone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('kind', models.CharField(db_index=True, default='village', max_length=50)),
+                ('geometry', django.contrib.gis.db.models.fields.MultiPolygonField(srid=4326)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'unique_together': {('name', 'kind')},
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+import django.db.models.expressions
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('soils', '0007_zone'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrainingTrial',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('study', models.CharField(db_index=True, max_length=100)),
+                ('number', models.PositiveIntegerField()),
+                ('target', models.CharField(max_length=50)),
+                ('data_hash', models.CharField(max_length=12)),
+                ('feature_set', models.CharField(max_length=100)),
+                ('features', models.JSONField(default=list)),
+                ('params', models.JSONField(default=dict)),
+                ('state', models.CharField(choices=[('complete', 'complete'), ('pruned', 'pruned'), ('failed', 'failed')], db_index=True, max_length=10)),
+                ('value', models.FloatField(blank=True, help_text='Mean best validation loss over the folds (transformed target)', null=True)),
+                ('r2', models.FloatField(blank=True, help_text='Out-of-fold R2', null=True)),
+                ('rmse', models.FloatField(blank=True, help_text='Out-of-fold RMSE', null=True)),
+                ('epochs', models.PositiveIntegerField(default=0)),
+                ('curves', models.JSONField(default=list, help_text='Validation loss per epoch, per fold')),
+                ('duration', models.FloatField(default=0, help_text='Seconds')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['study', django.db.models.expressions.OrderBy(django.db.models.expressions.F('value'), nulls_last=True)],
+                'unique_together': {('study', 'number')},
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('soils', '0008_trainingtrial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SocExplanationSet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_version', models.CharField(max_length=64, unique=True)),
+                ('features', models.JSONField(default=list)),
+                ('fill', models.JSONField(default=list, help_text='Per-feature values used for missing inputs')),
+                ('background', models.JSONField(default=list, help_text='Background sample rows (summarized by k-means)')),
+                ('expected10', models.FloatField(blank=True, help_text='SHAP base value of SOC10', null=True)),
+                ('expected30', models.FloatField(blank=True, help_text='SHAP base value of SOC30', null=True)),
+                ('importance', models.JSONField(default=dict, help_text='Mean |SHAP| per feature, per depth')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SocExplanation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_version', models.CharField(db_index=True, max_length=64)),
+                ('values', models.BinaryField()),
+                ('explained_at', models.DateTimeField(auto_now=True)),
+                ('profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='soc_explanations', to='soils.soilprofile')),
+            ],
+            options={
+                'unique_together': {('profile', 'model_version')},
+            },
+        ),
+    ]
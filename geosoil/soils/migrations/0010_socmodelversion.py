@@ -0,0 +1,29 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('soils', '0009_socexplanation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SocModelVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.CharField(max_length=64, unique=True)),
+                ('directory', models.CharField(max_length=500)),
+                ('role', models.CharField(choices=[('candidate', 'candidate'), ('live', 'live'), ('shadow', 'shadow'), ('retired', 'retired')], db_index=True, default='candidate', max_length=10)),
+                ('features', models.JSONField(default=list)),
+                ('metrics', models.JSONField(blank=True, default=dict)),
+                ('notes', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('promoted_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('role__in', ['live', 'shadow'])), fields=('role',), name='soc_model_single_live_shadow')],
+            },
+        ),
+    ]
@@ -0,0 +1,90 @@
+from datetime import date
+
+from django.db import migrations, models
+
+# NUMBER_RE of soils.models, in PostgreSQL syntax (\s of an ASCII pattern)
+NUMBER_SQL = r"'^[ \t\n\r\f\v]*[-+]?([0-9]+[.,]?[0-9]*|[.,][0-9]+)([eE][-+]?0*[0-9]{1,3})?[ \t\n\r\f\v]*$'"
+# NUMBER_MAX_LENGTH and NUMBER_RANGE of soils.models: the value is parsed as
+# numeric first, so that one out of the double precision range stays NULL
+# instead of aborting the whole UPDATE
+NUMBER_MAX_LENGTH = 100
+NUMBER_MIN, NUMBER_MAX = "1e-307", "1e308"
+
+
+def backfill_numbers(table):
+    number = "replace(value, ',', '.')::numeric"
+    return migrations.RunSQL(
+        f"UPDATE {table} SET value_num = CASE WHEN {number} = 0 "
+        f"OR abs({number}) BETWEEN {NUMBER_MIN} AND {NUMBER_MAX} THEN {number}::double precision END "
+        f"WHERE length(value) <= {NUMBER_MAX_LENGTH} AND value ~ {NUMBER_SQL}",
+        migrations.RunSQL.noop,
+    )
+
+
+def backfill_dates(apps, schema_editor):
+    # few rows match; parsed in Python so that invalid dates stay NULL
+    for model_name in ("ProfileProperty", "LayerProperty"):
+        model = apps.get_model("soils", model_name)
+        rows = model.objects.filter(value__regex=r"^\s*[0-9]{4}-[0-9]{2}-[0-9]{2}\s*$").only("pk", "value")
+        batch = []
+        for row in rows.iterator(chunk_size=2000):
+            try:
+                row.value_date = date.fromisoformat(row.value.strip())
+            except ValueError:
+                continue
+            batch.append(row)
+        model.objects.bulk_update(batch, ["value_date"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('soils', '0010_socmodelversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profileproperty',
+            name='value_num',
+            field=models.FloatField(blank=True, help_text='value parsed as a number', null=True),
+        ),
+        migrations.AddField(
+            model_name='profileproperty',
+            name='value_date',
+            field=models.DateField(blank=True, help_text='value parsed as a date', null=True),
+        ),
+        migrations.AddField(
+            model_name='layerproperty',
+            name='value_num',
+            field=models.FloatField(blank=True, help_text='value parsed as a number', null=True),
+        ),
+        migrations.AddField(
+            model_name='layerproperty',
+            name='value_date',
+            field=models.DateField(blank=True, help_text='value parsed as a date', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='profileproperty',
+            index=models.Index(fields=['updated_at'], name='profileproperty_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='layerproperty',
+            index=models.Index(fields=['updated_at'], name='layerproperty_updated_idx'),
+        ),
+        backfill_numbers('soils_profileproperty'),
+        backfill_numbers('soils_layerproperty'),
+        migrations.RunPython(backfill_dates, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='PropertySet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.SlugField(unique=True)),
+                ('level', models.CharField(choices=[('PF', 'profil'), ('LY', 'couche')], default='PF', help_text='PF: one row per profile, LY: one row per layer', max_length=2)),
+                ('properties', models.JSONField(default=list, help_text='Property names, in column order')),
+                ('columns', models.JSONField(default=list, help_text='[{property, column, type}] of the pivot table')),
+                ('description', models.TextField(blank=True)),
+                ('refreshed_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
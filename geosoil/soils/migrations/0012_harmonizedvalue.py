@@ -0,0 +1,31 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('soils', '0011_typed_property_values'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HarmonizedValue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('variable', models.CharField(default='carbon_content', max_length=50)),
+                ('method', models.CharField(choices=[('spline', 'equal-area spline'), ('overlap', 'weighted overlap')], default='spline', max_length=10)),
+                ('depth_top', models.PositiveSmallIntegerField(help_text='cm')),
+                ('depth_bottom', models.PositiveSmallIntegerField(help_text='cm')),
+                ('value', models.FloatField(blank=True, help_text='NaN (null) when the layers do not cover the interval', null=True)),
+                ('layers_at', models.DateTimeField(help_text='Latest Layer.updated_at used')),
+                ('layer_count', models.PositiveIntegerField(default=0)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+                ('profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='harmonized_values', to='soils.soilprofile')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['variable', 'method', 'depth_top', 'depth_bottom'], name='harmonized_interval_idx')],
+                'unique_together': {('profile', 'variable', 'method', 'depth_top', 'depth_bottom')},
+            },
+        ),
+    ]
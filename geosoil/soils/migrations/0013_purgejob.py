@@ -0,0 +1,31 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('soils', '0012_harmonizedvalue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PurgeJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(choices=[('profiles', 'profiles and everything attached'), ('layers', 'layers only')], default='profiles', max_length=10)),
+                ('status', models.CharField(choices=[('pending', 'pending'), ('running', 'running'), ('done', 'done'), ('failed', 'failed')], default='pending', max_length=10)),
+                ('chunk_size', models.PositiveIntegerField(default=2000, help_text='Profiles (or layers) per transaction')),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('deleted', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('source', models.ForeignKey(blank=True, help_text='Empty: every source', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='purge_jobs', to='soils.source')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('soils', '0013_purgejob'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='soilprofile',
+            index=models.Index(fields=['source', 'id'], name='soilprofile_source_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='layer',
+            index=models.Index(fields=['profile', 'depth_top'], name='layer_profile_depth_idx'),
+        ),
+    ]
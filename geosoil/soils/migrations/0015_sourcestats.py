@@ -0,0 +1,27 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('soils', '0014_source_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SourceStats',
+            fields=[
+                ('source', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='soils.source')),
+                ('profile_count', models.PositiveIntegerField(default=0)),
+                ('layer_count', models.PositiveIntegerField(default=0)),
+                ('bbox', models.JSONField(blank=True, help_text='[xmin, ymin, xmax, ymax] of the profiles (EPSG:4326)', null=True)),
+                ('coverage', models.JSONField(blank=True, default=dict, help_text='{sensor: {profiles, updated_at}}: profiles with remote-sensing features')),
+                ('imported_at', models.DateTimeField(blank=True, help_text='Last import of profiles or layers', null=True)),
+                ('refreshed_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'source stats',
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('soils', '0015_sourcestats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='soilprofile',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('code'), name='text_pattern_ops'), name='soilprofile_code_prefix_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='soilprofile',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('profile_id'), name='text_pattern_ops'), name='soilprofile_pid_prefix_idx'),
+        ),
+    ]
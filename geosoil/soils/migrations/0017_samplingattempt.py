@@ -0,0 +1,29 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('soils', '0016_profile_prefix_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SamplingAttempt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sensor', models.CharField(choices=[('S1', 'Sentinel-1'), ('S2', 'Sentinel-2'), ('S3', 'Sentinel-3'), ('L8', 'Landsat-8')], max_length=2)),
+                ('window_start', models.DateField(blank=True, null=True)),
+                ('window_end', models.DateField(blank=True, null=True)),
+                ('failures', models.PositiveIntegerField(default=1)),
+                ('error', models.TextField(blank=True, help_text='Last exception, empty when EE returned no data')),
+                ('attempted_at', models.DateTimeField(auto_now=True)),
+                ('retry_at', models.DateTimeField()),
+                ('profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sampling_attempts', to='soils.soilprofile')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('profile', 'sensor', 'window_start', 'window_end'), name='unique_attempt_per_window', nulls_distinct=False)],
+            },
+        ),
+    ]
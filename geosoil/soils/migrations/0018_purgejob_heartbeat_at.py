@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('soils', '0017_samplingattempt'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='purgejob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, help_text='Last chunk committed; a running job without heartbeat is taken over', null=True),
+        ),
+    ]
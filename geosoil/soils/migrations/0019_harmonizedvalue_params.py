@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('soils', '0018_purgejob_heartbeat_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='harmonizedvalue',
+            name='params',
+            field=models.CharField(blank=True, help_text='Intervals, lambda and extensive flag of the run (soils.depth.run_params)', max_length=255),
+        ),
+    ]
@@ -0,0 +1,29 @@
+from django.db import migrations
+
+# NUMBER_SQL of migration 0011 (exponent of at most 3 digits)
+NUMBER_SQL = r"'^[ \t\n\r\f\v]*[-+]?([0-9]+[.,]?[0-9]*|[.,][0-9]+)([eE][-+]?0*[0-9]{1,3})?[ \t\n\r\f\v]*$'"
+# mantissa with a non-zero digit: stored as 0 when float() underflowed
+NONZERO_SQL = r"'^[ \t\n\r\f\v]*[-+]?[0.,]*[1-9]'"
+
+
+def clear_numbers(table):
+    # typed_value() used to store inf (1e400) and 0 (1e-400): NULL, as the backfill now does
+    return migrations.RunSQL(
+        f"UPDATE {table} SET value_num = NULL WHERE value_num IS NOT NULL AND ("
+        f"NOT (value_num = 0 OR abs(value_num) BETWEEN 1e-307 AND 1e308) "
+        f"OR length(value) > 100 OR value !~ {NUMBER_SQL} "
+        f"OR (value_num = 0 AND value ~ {NONZERO_SQL}))",
+        migrations.RunSQL.noop,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('soils', '0019_harmonizedvalue_params'),
+    ]
+
+    operations = [
+        clear_numbers('soils_profileproperty'),
+        clear_numbers('soils_layerproperty'),
+    ]
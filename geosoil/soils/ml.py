@@ -0,0 +1,84 @@
+"""SOC model building blocks shared by training and inference.
+
+These are the classes of ``notebooks/train_mlp.ipynb``. The notebook pickled
+them from ``__main__``, so :func:`load_artifact` exposes them there while
+unpickling the ``final_model_soc*.pkl`` bundles.
+"""
+from __future__ import annotations
+
+import numpy as np
+import torch
+import torch.nn as nn
+from sklearn.preprocessing import PowerTransformer
+
+
+class MLP(nn.Module):
+    """Réseau de neurones feedforward simple."""
+    def __init__(self, in_dim, hidden=[128, 128], dropout=0.2):
+        super().__init__()
+        layers = []
+        d = in_dim
+        for h in hidden:
+            layers += [nn.Linear(d, h), nn.GELU(), nn.BatchNorm1d(h), nn.Dropout(dropout)]
+            d = h
+        layers += [nn.Linear(d, 1)]
+        self.net = nn.Sequential(*layers)
+
+    def forward(self, x):
+        return self.net(x)
+
+
+class Log1pTransformer:
+    # Transforme la cible avec log1p
+    def fit(self, y): return self
+    def transform(self, y): return np.log1p(y)
+    def inverse_transform(self, y): return np.expm1(y)
+
+
+class YeoJohnsonTransformer:
+    # Transforme la cible avec Yeo-Johnson
+    def __init__(self): self.pt = PowerTransformer(method="yeo-johnson", standardize=True)
+    def fit(self, y): self.pt.fit(y.reshape(-1,1)); return self
+    def transform(self, y): return self.pt.transform(y.reshape(-1,1)).ravel()
+    def inverse_transform(self, y): return self.pt.inverse_transform(y.reshape(-1,1)).ravel()
+
+
+NOTEBOOK_CLASSES = (MLP, Log1pTransformer, YeoJohnsonTransformer)
+
+
+def load_artifact(path) -> dict:
+    """Load a notebook artifact as an ensemble dict on CPU.
+
+    Both layouts are accepted: the final model (``model``/``imputer``/``scaler``)
+    and the OOF ensemble (``models``/``imputers``/``scalers``).
+    """
+    import __main__
+
+    import joblib
+
+    for cls in NOTEBOOK_CLASSES:
+        if not hasattr(__main__, cls.__name__):
+            setattr(__main__, cls.__name__, cls)
+    artifact = joblib.load(path)
+
+    if "models" not in artifact:
+        artifact = {
+            **artifact,
+            "models": [artifact["model"]],
+            "imputers": [artifact["imputer"]],
+            "scalers": [artifact["scaler"]],
+        }
+    for model in artifact["models"]:
+        model.to("cpu").eval()
+    return artifact
+
+
+def predict_ensemble(artifact: dict, X: np.ndarray) -> np.ndarray:
+    """Vectorised ``predict_nn_ensemble``: one forward pass per fold model."""
+    X = np.asarray(X, dtype=np.float64)
+    preds_t = []
+    with torch.no_grad():
+        for imp, sc, model in zip(artifact["imputers"], artifact["scalers"], artifact["models"]):
+            Xp = sc.transform(imp.transform(X))
+            preds_t.append(model(torch.as_tensor(Xp, dtype=torch.float32)).numpy().ravel())
+    return artifact["transformer"].inverse_transform(np.mean(preds_t, axis=0))
@@ -1,7 +1,55 @@
 # Standard Django model imports
+import re
+from datetime import date
+from decimal import Decimal
+
 from django.db import models
+from django.contrib.postgres.indexes import OpClass
+from django.db.models import F, Q
+from django.db.models.functions import Upper
 from django.contrib.gis.db import models as gis_models
 
+# same patterns and limits as the backfill of migration 0011 (decimal comma accepted)
+NUMBER_RE = re.compile(r"^\s*[-+]?([0-9]+[.,]?[0-9]*|[.,][0-9]+)([eE][-+]?0*[0-9]{1,3})?\s*$", re.ASCII)
+NUMBER_MAX_LENGTH = 100
+# magnitudes stored in value_num: outside, double precision overflows (or underflows)
+NUMBER_RANGE = (Decimal("1e-307"), Decimal("1e308"))
+DATE_RE = re.compile(r"^\s*[0-9]{4}-[0-9]{2}-[0-9]{2}\s*$")
+
+
+def typed_value(value):
+    """``(number, date)`` parsed from an EAV string value, ``None`` when it is not one."""
+    if value is None:
+        return None, None
+    if len(value) <= NUMBER_MAX_LENGTH and NUMBER_RE.match(value):
+        number = Decimal(value.strip().replace(",", "."))
+        if number == 0 or NUMBER_RANGE[0] <= abs(number) <= NUMBER_RANGE[1]:
+            return float(number), None
+        return None, None
+    if DATE_RE.match(value):
+        try:
+            return None, date.fromisoformat(value.strip())
+        except ValueError:
+            return None, None
+    return None, None
+
+
+class TypedValueMixin:
+    """Keeps ``value_num`` / ``value_date`` in sync with the string ``value``.
+
+    ``bulk_create`` skips ``save()``: call :meth:`set_typed` on the objects first.
+    """
+
+    def set_typed(self):
+        self.value_num, self.value_date = typed_value(self.value)
+        return self
+
+    def save(self, *args, **kwargs):
+        self.set_typed()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "value" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "value_num", "value_date"}
+        super().save(*args, **kwargs)
 
 
 class Source(models.Model):
@@ -17,8 +65,11 @@ class Source(models.Model):
 
     @property
     def profile_count(self) -> int:
-        """Returns the number of soil profiles linked to this source."""
-        return self.soil_profiles.count()
+        """Number of soil profiles of this source, from :class:`SourceStats` when computed."""
+        try:
+            return self.stats.profile_count
+        except SourceStats.DoesNotExist:
+            return self.soil_profiles.count()
 
     def __str__(self) -> str:  # pragma: no cover - trivial
         return self.name
@@ -55,10 +106,36 @@ class SoilProfile(models.Model):
   
     class Meta:
         unique_together = ('location', 'source')
+        indexes = [
+            # per-source scans in id order (filter_sources, importers, purge chunks)
+            models.Index(fields=["source", "id"], name="soilprofile_source_idx"),
+            # admin prefix search (istartswith is UPPER(col) LIKE 'X%')
+            models.Index(OpClass(Upper("code"), name="text_pattern_ops"), name="soilprofile_code_prefix_idx"),
+            models.Index(OpClass(Upper("profile_id"), name="text_pattern_ops"), name="soilprofile_pid_prefix_idx"),
+        ]
 
     def __str__(self) -> str:  # pragma: no cover - trivial
         return self.profile_id
 
+    def teledection_json(self) -> dict:
+        """Rebuild the legacy ``{"S1": {...}, "S2": {...}}`` dict from the feature table.
+
+        Uses the prefetched ``features`` when available. For each sensor the
+        most recent window wins. Falls back to the stored JSON for profiles that
+        have no feature rows yet.
+        """
+        features = list(self.features.all())
+        latest: dict = {}
+        for feature in features:
+            end = feature.window_end or date.min
+            latest[feature.sensor] = max(end, latest.get(feature.sensor, date.min))
+
+        data: dict = {}
+        for feature in features:
+            if (feature.window_end or date.min) == latest[feature.sensor]:
+                data.setdefault(feature.sensor, {})[feature.band] = feature.value
+        return data or (self.teledection_data or {})
+
 
 class Layer(models.Model):
     """Represents an individual soil layer within a profile."""
@@ -92,6 +169,12 @@ class Layer(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # layers of a batch of profiles, in depth order
+            models.Index(fields=["profile", "depth_top"], name="layer_profile_depth_idx"),
+        ]
+
     def __str__(self) -> str:  
         return f"{self.name} ({self.profile.profile_id})"
 
@@ -129,7 +212,7 @@ class Property(models.Model):
         return f"{self.name}: {self.value}"
     
 
-class ProfileProperty(models.Model):
+class ProfileProperty(TypedValueMixin, models.Model):
     """Flexible attribute linked to a soil profile."""
 
     profile = models.ForeignKey(
@@ -147,6 +230,8 @@ class ProfileProperty(models.Model):
     
     name = models.CharField(max_length=100)
     value = models.CharField(max_length=255)
+    value_num = models.FloatField(blank=True, null=True, help_text="value parsed as a number")
+    value_date = models.DateField(blank=True, null=True, help_text="value parsed as a date")
     unit = models.CharField(max_length=50, blank=True)  
     description = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -155,12 +240,16 @@ class ProfileProperty(models.Model):
 
     class Meta:
         unique_together = ('profile', 'property')
+        indexes = [
+            # incremental refresh of the property pivots
+            models.Index(fields=["updated_at"], name="profileproperty_updated_idx"),
+        ]
 
     def __str__(self) -> str:  
         return f"{self.name}: {self.value}"
 
 
-class LayerProperty(models.Model):
+class LayerProperty(TypedValueMixin, models.Model):
     """Flexible attribute linked to a soil layer."""
 
     layer = models.ForeignKey(
@@ -170,13 +259,432 @@ class LayerProperty(models.Model):
     )
     name = models.CharField(max_length=100)
     value = models.CharField(max_length=255)
+    value_num = models.FloatField(blank=True, null=True, help_text="value parsed as a number")
+    value_date = models.DateField(blank=True, null=True, help_text="value parsed as a date")
     unit = models.CharField(max_length=50, blank=True)
     description = models.TextField(blank=True)
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["updated_at"], name="layerproperty_updated_idx"),
+        ]
+
     def __str__(self) -> str: 
         return f"{self.name}: {self.value}"
 
 
+class RemoteSensingFeature(models.Model):
+    """One remote-sensing band value for a profile, sensor and date window.
+
+    Narrow (profile × sensor × window × band → float) replacement for the
+    nested ``SoilProfile.teledection_data`` JSON.
+    """
+    S1 = 'S1'
+    S2 = 'S2'
+    S3 = 'S3'
+    L8 = 'L8'
+
+    SENSORS = (
+        (S1, 'Sentinel-1'),
+        (S2, 'Sentinel-2'),
+        (S3, 'Sentinel-3'),
+        (L8, 'Landsat-8'),
+    )
+
+    profile = models.ForeignKey(
+        SoilProfile,
+        on_delete=models.CASCADE,
+        related_name="features",
+    )
+    sensor = models.CharField(max_length=2, choices=SENSORS)
+    window_start = models.DateField(
+        blank=True,
+        null=True,
+        help_text="Start of the compositing window (null for migrated JSON)",
+    )
+    window_end = models.DateField(
+        blank=True,
+        null=True,
+        help_text="End of the compositing window (null for migrated JSON)",
+    )
+    band = models.CharField(max_length=30)
+    value = models.FloatField(blank=True, null=True)
+    derived = models.BooleanField(
+        default=False,
+        help_text="Spectral index computed from the stored bands (see soils.indices)",
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["profile", "sensor", "window_start", "window_end", "band"],
+                name="unique_feature_per_window",
+                nulls_distinct=False,
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["sensor", "band"], name="feature_sensor_band_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.profile_id} {self.sensor}/{self.band}: {self.value}"
+
+
+class SamplingAttempt(models.Model):
+    """Sensor window of a profile that came back without any band.
+
+    Recorded by the samplers when Earth Engine has no acquisition for the
+    window (S1/S3 gaps, clouds) or the request fails. The window is not
+    requested again before ``retry_at``, whose delay doubles with each
+    failure (see :func:`soils.features.record_attempts`); the row is deleted
+    once the window gets data.
+    """
+    profile = models.ForeignKey(
+        SoilProfile,
+        on_delete=models.CASCADE,
+        related_name="sampling_attempts",
+    )
+    sensor = models.CharField(max_length=2, choices=RemoteSensingFeature.SENSORS)
+    window_start = models.DateField(blank=True, null=True)
+    window_end = models.DateField(blank=True, null=True)
+    failures = models.PositiveIntegerField(default=1)
+    error = models.TextField(blank=True, help_text="Last exception, empty when EE returned no data")
+    attempted_at = models.DateTimeField(auto_now=True)
+    retry_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["profile", "sensor", "window_start", "window_end"],
+                name="unique_attempt_per_window",
+                nulls_distinct=False,
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.profile_id} {self.sensor} {self.window_start}: {self.failures} échec(s)"
+
+
+class RefreshRun(models.Model):
+    """Metrics of one ``refresh_remote_sensing`` run."""
+
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    options = models.JSONField(default=dict, blank=True)
+
+    profiles_selected = models.PositiveIntegerField(default=0)
+    profiles_processed = models.PositiveIntegerField(default=0)
+    requests_made = models.PositiveIntegerField(
+        default=0,
+        help_text="Earth Engine round trips (one per profile and sensor)",
+    )
+    cache_hits = models.PositiveIntegerField(
+        default=0,
+        help_text="Sensor windows already stored and fresh, not re-sampled",
+    )
+    features_written = models.PositiveIntegerField(default=0)
+    errors = models.PositiveIntegerField(default=0)
+    wall_time = models.FloatField(default=0, help_text="Seconds")
+
+    class Meta:
+        ordering = ["-started_at"]
+
+    def __str__(self) -> str:
+        return f"Refresh {self.started_at:%Y-%m-%d %H:%M} ({self.profiles_processed} profils)"
+
+
+class SocPrediction(models.Model):
+    """SOC predicted for a profile by one model version."""
+
+    profile = models.ForeignKey(
+        SoilProfile,
+        on_delete=models.CASCADE,
+        related_name="soc_predictions",
+    )
+    model_version = models.CharField(max_length=64, db_index=True)
+    soc10 = models.FloatField(blank=True, null=True, help_text="Predicted SOC 0–10 cm")
+    soc30 = models.FloatField(blank=True, null=True, help_text="Predicted SOC 10–30 cm")
+    predicted_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('profile', 'model_version')
+
+    def __str__(self) -> str:
+        return f"{self.profile_id} [{self.model_version}] {self.soc10} / {self.soc30}"
+
+
+class Zone(models.Model):
+    """Polygon over which SOC is summarised (village zone, grid cell...)."""
+
+    name = models.CharField(max_length=255)
+    kind = models.CharField(max_length=50, default="village", db_index=True)
+    geometry = gis_models.MultiPolygonField(srid=4326)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('name', 'kind')
+
+    def __str__(self) -> str:
+        return f"{self.kind}: {self.name}"
+
+
+class TrainingTrial(models.Model):
+    """One hyperparameter-search trial (``search_soc_models`` leaderboard)."""
+
+    COMPLETE = "complete"
+    PRUNED = "pruned"
+    FAILED = "failed"
+    STATES = (
+        (COMPLETE, "complete"),
+        (PRUNED, "pruned"),
+        (FAILED, "failed"),
+    )
+
+    study = models.CharField(max_length=100, db_index=True)
+    number = models.PositiveIntegerField()
+    target = models.CharField(max_length=50)
+    data_hash = models.CharField(max_length=12)
+    feature_set = models.CharField(max_length=100)
+    features = models.JSONField(default=list)
+    params = models.JSONField(default=dict)
+    state = models.CharField(max_length=10, choices=STATES, db_index=True)
+    value = models.FloatField(
+        blank=True,
+        null=True,
+        help_text="Mean best validation loss over the folds (transformed target)",
+    )
+    r2 = models.FloatField(blank=True, null=True, help_text="Out-of-fold R2")
+    rmse = models.FloatField(blank=True, null=True, help_text="Out-of-fold RMSE")
+    epochs = models.PositiveIntegerField(default=0)
+    curves = models.JSONField(default=list, help_text="Validation loss per epoch, per fold")
+    duration = models.FloatField(default=0, help_text="Seconds")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('study', 'number')
+        ordering = ["study", F("value").asc(nulls_last=True)]
+
+    def __str__(self) -> str:
+        return f"{self.study} #{self.number} [{self.state}] {self.value}"
+
+
+class SocExplanationSet(models.Model):
+    """SHAP setup of one model version: features, fixed background, global importance."""
+
+    model_version = models.CharField(max_length=64, unique=True)
+    features = models.JSONField(default=list)
+    fill = models.JSONField(default=list, help_text="Per-feature values used for missing inputs")
+    background = models.JSONField(default=list, help_text="Background sample rows (summarized by k-means)")
+    expected10 = models.FloatField(blank=True, null=True, help_text="SHAP base value of SOC10")
+    expected30 = models.FloatField(blank=True, null=True, help_text="SHAP base value of SOC30")
+    importance = models.JSONField(default=dict, help_text="Mean |SHAP| per feature, per depth")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return f"SHAP [{self.model_version}] {len(self.features)} features"
+
+
+class SocExplanation(models.Model):
+    """SHAP values of one profile's SOC prediction (float32, SOC10 row then SOC30 row)."""
+
+    profile = models.ForeignKey(
+        SoilProfile,
+        on_delete=models.CASCADE,
+        related_name="soc_explanations",
+    )
+    model_version = models.CharField(max_length=64, db_index=True)
+    values = models.BinaryField()
+    explained_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('profile', 'model_version')
+
+    def __str__(self) -> str:
+        return f"{self.profile_id} [{self.model_version}]"
+
+
+class SocModelVersion(models.Model):
+    """Registered SOC model artifacts (``manage.py soc_models``), by content hash."""
+
+    CANDIDATE = "candidate"
+    LIVE = "live"
+    SHADOW = "shadow"
+    RETIRED = "retired"
+    ROLES = (
+        (CANDIDATE, "candidate"),
+        (LIVE, "live"),
+        (SHADOW, "shadow"),
+        (RETIRED, "retired"),
+    )
+
+    version = models.CharField(max_length=64, unique=True)
+    directory = models.CharField(max_length=500)
+    role = models.CharField(max_length=10, choices=ROLES, default=CANDIDATE, db_index=True)
+    features = models.JSONField(default=list)
+    metrics = models.JSONField(default=dict, blank=True)
+    notes = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    promoted_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        constraints = [
+            # at most one live and one shadow version
+            models.UniqueConstraint(
+                fields=["role"],
+                condition=Q(role__in=["live", "shadow"]),
+                name="soc_model_single_live_shadow",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.version} [{self.role}]"
+
+
+class PropertySet(models.Model):
+    """Named set of properties pivoted into one wide table (``soils.pivot``)."""
+
+    name = models.SlugField(max_length=50, unique=True)
+    level = models.CharField(
+        max_length=2,
+        choices=Property.type,
+        default=Property.PF,
+        help_text="PF: one row per profile, LY: one row per layer",
+    )
+    properties = models.JSONField(default=list, help_text="Property names, in column order")
+    columns = models.JSONField(default=list, help_text="[{property, column, type}] of the pivot table")
+    description = models.TextField(blank=True)
+    refreshed_at = models.DateTimeField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        return f"{self.name} ({len(self.properties)} properties)"
+
+
+class HarmonizedValue(models.Model):
+    """Layer value of a profile harmonised over a standard depth interval (``soils.depth``)."""
+
+    SPLINE = "spline"
+    OVERLAP = "overlap"
+    METHODS = (
+        (SPLINE, "equal-area spline"),
+        (OVERLAP, "weighted overlap"),
+    )
+
+    profile = models.ForeignKey(
+        SoilProfile,
+        on_delete=models.CASCADE,
+        related_name="harmonized_values",
+    )
+    variable = models.CharField(max_length=50, default="carbon_content")
+    method = models.CharField(max_length=10, choices=METHODS, default=SPLINE)
+    depth_top = models.PositiveSmallIntegerField(help_text="cm")
+    depth_bottom = models.PositiveSmallIntegerField(help_text="cm")
+    value = models.FloatField(blank=True, null=True, help_text="NaN (null) when the layers do not cover the interval")
+    layers_at = models.DateTimeField(help_text="Latest Layer.updated_at used")
+    layer_count = models.PositiveIntegerField(default=0)
+    params = models.CharField(
+        max_length=255,
+        blank=True,
+        help_text="Intervals, lambda and extensive flag of the run (soils.depth.run_params)",
+    )
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('profile', 'variable', 'method', 'depth_top', 'depth_bottom')
+        indexes = [
+            models.Index(fields=["variable", "method", "depth_top", "depth_bottom"], name="harmonized_interval_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.profile_id} {self.variable} {self.depth_top}-{self.depth_bottom} cm ({self.method}): {self.value}"
+
+
+class PurgeJob(models.Model):
+    """Background deletion of the profiles (or only the layers) of a source (``soils.purge``)."""
+
+    PROFILES = "profiles"
+    LAYERS = "layers"
+    SCOPES = (
+        (PROFILES, "profiles and everything attached"),
+        (LAYERS, "layers only"),
+    )
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUSES = (
+        (PENDING, "pending"),
+        (RUNNING, "running"),
+        (DONE, "done"),
+        (FAILED, "failed"),
+    )
+
+    source = models.ForeignKey(
+        Source,
+        on_delete=models.CASCADE,
+        blank=True,
+        null=True,
+        related_name="purge_jobs",
+        help_text="Empty: every source",
+    )
+    scope = models.CharField(max_length=10, choices=SCOPES, default=PROFILES)
+    status = models.CharField(max_length=10, choices=STATUSES, default=PENDING)
+    chunk_size = models.PositiveIntegerField(default=2000, help_text="Profiles (or layers) per transaction")
+    total = models.PositiveIntegerField(default=0)
+    deleted = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    heartbeat_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        help_text="Last chunk committed; a running job without heartbeat is taken over",
+    )
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    @property
+    def progress(self) -> float:
+        if self.status == self.DONE:
+            return 1.0
+        return min(self.deleted / self.total, 1.0) if self.total else 0.0
+
+    def __str__(self) -> str:
+        return f"Purge {self.scope} {self.source or 'all'} ({self.status})"
+
+
+class SourceStats(models.Model):
+    """Per-source statistics kept up to date by the importers and fetch commands (``soils.stats``)."""
+
+    source = models.OneToOneField(
+        Source,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="stats",
+    )
+    profile_count = models.PositiveIntegerField(default=0)
+    layer_count = models.PositiveIntegerField(default=0)
+    bbox = models.JSONField(blank=True, null=True, help_text="[xmin, ymin, xmax, ymax] of the profiles (EPSG:4326)")
+    coverage = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="{sensor: {profiles, updated_at}}: profiles with remote-sensing features",
+    )
+    imported_at = models.DateTimeField(blank=True, null=True, help_text="Last import of profiles or layers")
+    refreshed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "source stats"
+
+    def __str__(self) -> str:
+        return f"{self.source_id}: {self.profile_count} profils"
@@ -0,0 +1,211 @@
+"""Wide, typed pivots of the profile and layer properties (EAV tables).
+
+A :class:`~soils.models.PropertySet` names the properties to pivot. Its table
+``soils_pivot_<name>`` has one row per profile (or per layer) and one column
+per property. The column type is ``double precision`` when every value of the
+property parses as a number (``value_num``), ``date`` likewise
+(``value_date``), and ``text`` otherwise. The rows come from one conditional
+aggregation (``GROUP BY`` owner with ``FILTER (WHERE name = ...)``), not from
+one self-join per property.
+
+:func:`refresh` is incremental: only the owners with a property row written
+since the previous refresh are aggregated again and upserted. Deleting a
+property row does not touch ``updated_at``, so ``full=True`` rebuilds the
+table, and :func:`rebuild` also infers the column types again.
+"""
+from __future__ import annotations
+
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db import connection, transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import Layer, LayerProperty, ProfileProperty, Property, PropertySet, SoilProfile
+
+LEVELS = {
+    Property.PF: {"model": ProfileProperty, "owner": "profile_id", "owner_model": SoilProfile},
+    Property.LY: {"model": LayerProperty, "owner": "layer_id", "owner_model": Layer},
+}
+SQL_TYPES = {"num": "double precision", "date": "date", "text": "text"}
+VALUE_FIELDS = {"num": "value_num", "date": "value_date", "text": "value"}
+RESERVED = {"profile_id", "layer_id", "refreshed_at"}
+
+
+def table_name(ps: PropertySet) -> str:
+    return f"soils_pivot_{ps.name.replace('-', '_')}"
+
+
+def column_name(name: str, taken: set) -> str:
+    """SQL-safe, unique column name for a property name."""
+    base = re.sub(r"[^a-z0-9]+", "_", name.lower()).strip("_")[:50] or "property"
+    if base[0].isdigit() or base in RESERVED:
+        base = f"p_{base}"
+    column, i = base, 1
+    while column in taken:
+        i += 1
+        column = f"{base}_{i}"
+    taken.add(column)
+    return column
+
+
+def infer_columns(level: str, properties: Iterable[str]) -> List[Dict[str, str]]:
+    """Column of each property, typed from its stored values."""
+    properties = list(dict.fromkeys(properties))
+    stats = {
+        row["name"]: row
+        for row in LEVELS[level]["model"].objects.filter(name__in=properties)
+        .exclude(value="")
+        .values("name")
+        .annotate(n=Count("pk"), num=Count("value_num"), dt=Count("value_date"))
+    }
+    taken: set = set()
+    columns = []
+    for name in properties:
+        s = stats.get(name)
+        kind = "text"
+        if s and s["num"] == s["n"]:
+            kind = "num"
+        elif s and s["dt"] == s["n"]:
+            kind = "date"
+        columns.append({"property": name, "column": column_name(name, taken), "type": kind})
+    return columns
+
+
+def _create_table(ps: PropertySet) -> None:
+    qn = connection.ops.quote_name
+    level = LEVELS[ps.level]
+    owner_model = level["owner_model"]
+    pk_type = owner_model._meta.pk.rel_db_type(connection)
+    columns = [
+        f"{qn(level['owner'])} {pk_type} PRIMARY KEY REFERENCES {qn(owner_model._meta.db_table)} (id) "
+        "ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED",
+    ]
+    if ps.level == Property.LY:
+        columns.append(f"profile_id {SoilProfile._meta.pk.rel_db_type(connection)} NOT NULL")
+    columns += [f"{qn(c['column'])} {SQL_TYPES[c['type']]}" for c in ps.columns]
+    columns.append("refreshed_at timestamp with time zone NOT NULL")
+
+    table = qn(table_name(ps))
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {table}")
+        cursor.execute(f"CREATE TABLE {table} ({', '.join(columns)})")
+        if ps.level == Property.LY:
+            cursor.execute(f"CREATE INDEX ON {table} (profile_id)")
+
+
+@transaction.atomic
+def create(name: str, level: str, properties: Iterable[str], description: str = "") -> PropertySet:
+    """New property set, its pivot table and a first full refresh."""
+    properties = list(dict.fromkeys(properties))
+    ps = PropertySet.objects.create(
+        name=name, level=level, properties=properties, description=description,
+        columns=infer_columns(level, properties),
+    )
+    _create_table(ps)
+    refresh(ps, full=True)
+    return ps
+
+
+@transaction.atomic
+def rebuild(ps: PropertySet) -> int:
+    """Infer the column types again, recreate the table and refresh it fully."""
+    ps.columns = infer_columns(ps.level, ps.properties)
+    ps.save(update_fields=["columns"])
+    _create_table(ps)
+    return refresh(ps, full=True)
+
+
+@transaction.atomic
+def drop(ps: PropertySet) -> None:
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {connection.ops.quote_name(table_name(ps))}")
+    ps.delete()
+
+
+def is_stale(ps: PropertySet) -> bool:
+    if ps.refreshed_at is None:
+        return True
+    model = LEVELS[ps.level]["model"]
+    return model.objects.filter(name__in=ps.properties, updated_at__gte=ps.refreshed_at).exists()
+
+
+@transaction.atomic
+def refresh(ps: PropertySet, full: bool = False) -> int:
+    """Upsert the pivot rows of the owners changed since the last refresh.
+
+    Returns the number of rows written.
+    """
+    qn = connection.ops.quote_name
+    level = LEVELS[ps.level]
+    model = level["model"]
+    source = qn(model._meta.db_table)
+    owner = qn(level["owner"])
+    table = qn(table_name(ps))
+    started = timezone.now()
+    full = full or ps.refreshed_at is None
+
+    aggregates = [
+        f"max(p.{VALUE_FIELDS[c['type']]}) FILTER (WHERE p.name = %s)" for c in ps.columns
+    ]
+    names = [qn(c["column"]) for c in ps.columns]
+    params: list = [c["property"] for c in ps.columns]
+    owner_columns = [owner]
+    select_owner = [f"p.{owner}"]
+    join = ""
+    if ps.level == Property.LY:
+        owner_columns.append("profile_id")
+        select_owner.append("l.profile_id")
+        join = f"JOIN {qn(Layer._meta.db_table)} l ON l.id = p.{owner}"
+
+    params += [started, list(ps.properties)]
+    where = "p.name = ANY(%s)"
+    if not full:
+        where += f" AND p.{owner} IN (SELECT {owner} FROM {source} WHERE updated_at >= %s AND name = ANY(%s))"
+        params += [ps.refreshed_at, list(ps.properties)]
+
+    updates = ", ".join(f"{n} = EXCLUDED.{n}" for n in names + ["refreshed_at"])
+    sql = (
+        f"INSERT INTO {table} ({', '.join(owner_columns + names)}, refreshed_at) "
+        f"SELECT {', '.join(select_owner + aggregates)}, %s FROM {source} p {join} "
+        f"WHERE {where} GROUP BY {', '.join(select_owner)} "
+        f"ON CONFLICT ({owner}) DO UPDATE SET {updates}"
+    )
+    with connection.cursor() as cursor:
+        if full:
+            cursor.execute(f"TRUNCATE {table}")
+        cursor.execute(sql, params)
+        written = cursor.rowcount
+    ps.refreshed_at = started
+    ps.save(update_fields=["refreshed_at"])
+    return written
+
+
+def read(
+    ps: PropertySet,
+    profiles: Optional[Iterable[int]] = None,
+    refresh_if_stale: bool = True,
+) -> Tuple[List[str], List[tuple]]:
+    """``(header, rows)`` of the pivot, one column per property (``None`` when missing).
+
+    The header is the owner id (``profile_id``, or ``layer_id`` and
+    ``profile_id``) followed by the property names.
+    """
+    if refresh_if_stale and is_stale(ps):
+        refresh(ps)
+    qn = connection.ops.quote_name
+    owner = LEVELS[ps.level]["owner"]
+    owner_columns = [owner] + (["profile_id"] if ps.level == Property.LY else [])
+    sql = f"SELECT {', '.join(qn(c) for c in owner_columns + [c['column'] for c in ps.columns])} " \
+          f"FROM {qn(table_name(ps))}"
+    params: list = []
+    if profiles is not None:
+        sql += " WHERE profile_id = ANY(%s)"
+        params.append([int(pk) for pk in profiles])
+    sql += f" ORDER BY {qn(owner)}"
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    return owner_columns + [c["property"] for c in ps.columns], rows
+
@@ -0,0 +1,118 @@
+"""Compact binary encoding of the SOC point predictions for the map.
+
+Layout (little-endian)::
+
+    uint32  header length H
+    H bytes UTF-8 JSON header, padded with spaces to a multiple of 4
+    int32[n]   profile ids
+    float32[n] longitudes
+    float32[n] latitudes
+    float32[n] values (NaN when not predicted)
+
+The header carries ``count``, ``depth``, ``model_version``, the column order
+and the quantile ``breaks`` of the map legend, so the browser reads each
+column as a typed array view without parsing anything else.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import struct
+from typing import Optional
+
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.core.cache import caches
+from django.db.models import Count, Max
+
+from .models import SocPrediction
+from .prediction import OUTPUTS
+from .registry import serving_version
+
+COLUMNS = [("id", "int32"), ("lon", "float32"), ("lat", "float32"), ("value", "float32")]
+CONTENT_TYPE = "application/octet-stream"
+
+
+def quantile_breaks(values: np.ndarray, k: int = 6) -> list:
+    """``k - 1`` breaks at ``floor(i / k * (n - 1))`` of the sorted values (former map rule)."""
+    values = np.sort(values[np.isfinite(values)])
+    if not values.size:
+        return list(range(k - 1))
+    idx = np.floor(np.arange(1, k) / k * (values.size - 1)).astype(int)
+    return values[idx].astype(float).tolist()
+
+
+def _rows(depth: str, model_version: str):
+    if depth not in OUTPUTS:
+        raise KeyError(depth)
+    return SocPrediction.objects.filter(model_version=model_version).values_list(
+        "profile_id", "profile__location", depth
+    )
+
+
+def encode_points(depth: str, model_version: str) -> bytes:
+    return pack_points(depth, model_version, list(_rows(depth, model_version)))
+
+
+def pack_points(depth: str, model_version: str, rows) -> bytes:
+    n = len(rows)
+    ids = np.empty(n, dtype="<i4")
+    lon = np.empty(n, dtype="<f4")
+    lat = np.empty(n, dtype="<f4")
+    value = np.empty(n, dtype="<f4")
+    for i, (pk, location, v) in enumerate(rows):
+        ids[i], lon[i], lat[i] = pk, location.x, location.y
+        value[i] = np.nan if v is None else v
+
+    header = json.dumps({
+        "count": n,
+        "depth": depth,
+        "model_version": model_version,
+        "columns": COLUMNS,
+        "breaks": quantile_breaks(value.astype(np.float64)),
+    }).encode()
+    header += b" " * (-len(header) % 4)
+    return b"".join([struct.pack("<I", len(header)), header, ids.tobytes(), lon.tobytes(), lat.tobytes(), value.tobytes()])
+
+
+def cache_key(depth: str, model_version: str, stamp: dict) -> str:
+    """Key of the encoded points: hashed, as ``predicted_at`` (and a requested version) may hold spaces."""
+    at = stamp["at"].isoformat() if stamp["at"] is not None else None
+    return "soc-points:" + hashlib.sha256(json.dumps([depth, model_version, at, stamp["n"]]).encode()).hexdigest()
+
+
+def cached_points(depth: str, model_version: Optional[str]) -> Optional[bytes]:
+    """Encoded points, re-encoded only when predictions of that version change."""
+    model_version = model_version or serving_version()
+    if model_version is None:
+        return None
+    # the count also changes the key when predictions are purged
+    stamp = SocPrediction.objects.filter(model_version=model_version).aggregate(at=Max("predicted_at"), n=Count("pk"))
+    key = cache_key(depth, model_version, stamp)
+    cache = caches["tiles"]
+    body = cache.get(key)
+    if body is None:
+        body = encode_points(depth, model_version)
+        cache.set(key, body)
+    return body
+
+
+async def acached_points(depth: str, model_version: Optional[str]) -> Optional[bytes]:
+    """:func:`cached_points` for the async views (async ORM and cache, packing in a thread)."""
+    if depth not in OUTPUTS:
+        raise KeyError(depth)
+    if model_version is None:
+        model_version = await sync_to_async(serving_version)()
+        if model_version is None:
+            return None
+    stamp = await SocPrediction.objects.filter(model_version=model_version).aaggregate(
+        at=Max("predicted_at"), n=Count("pk")
+    )
+    key = cache_key(depth, model_version, stamp)
+    cache = caches["tiles"]
+    body = await cache.aget(key)
+    if body is None:
+        rows = [row async for row in _rows(depth, model_version).aiterator(chunk_size=5000)]
+        body = await sync_to_async(pack_points, thread_sensitive=False)(depth, model_version, rows)
+        await cache.aset(key, body)
+    return body
@@ -0,0 +1,240 @@
+"""Server-side SOC prediction (SOC10 then SOC30) with the notebook MLPs.
+
+The artifacts are loaded once per worker process by :func:`get_predictor`.
+Concurrent callers in the same worker are coalesced by :class:`MicroBatcher`
+so their rows go through the models in one tensor forward pass.
+
+The live version comes from the model registry (:mod:`soils.registry`). Each
+worker looks it up at most every ``SOC_MODEL_CHECK_SECONDS``. When it changes,
+the new version is loaded in a background thread and the current one keeps
+serving until the swap. Without a registered version the artifacts in
+``SOC_MODELS_DIR`` are used as before.
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from django.conf import settings
+
+SOC10_FILE = "final_model_soc10.pkl"
+SOC30_FILE = "final_model_soc30.pkl"
+# extra input of the SOC30 model (chained on the SOC10 prediction)
+SOC10_FEATURE = "SOC10_pred"
+# predicted layers, in the column order of the predictor output
+OUTPUTS = ("soc10", "soc30")
+
+logger = logging.getLogger(__name__)
+
+
+def hash_artifacts(directory) -> str:
+    """Content hash of the SOC10/SOC30 artifacts: the model version."""
+    digest = hashlib.sha256()
+    for name in (SOC10_FILE, SOC30_FILE):
+        with open(os.path.join(str(directory), name), "rb") as fh:
+            for chunk in iter(lambda: fh.read(1 << 20), b""):
+                digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+
+def feature_column(name: str) -> Tuple[str, str]:
+    """Map a model feature name to its ``(sensor, band)`` in the feature store.
+
+    ``ValueError`` for a name no sensor provides (e.g. a profile attribute):
+    it would otherwise be read as an empty column and fed to the model as NaN.
+    """
+    from .features import SENSOR_BANDS
+    from .indices import INDICES
+
+    if name in INDICES:
+        return INDICES[name].sensor, name
+    for sensor, bands in SENSOR_BANDS.items():
+        if name in bands:
+            return sensor, name
+    raise ValueError(f"feature {name!r} is not a band of any sensor nor a spectral index")
+
+
+class MicroBatcher:
+    """Run ``fn`` on the rows of every caller waiting for it, in one call.
+
+    No timer is involved: while a batch is running, new callers queue up and
+    the next one to get the lock runs all of them together.
+    """
+
+    def __init__(self, fn):
+        self._fn = fn
+        self._run_lock = threading.Lock()
+        self._queue_lock = threading.Lock()
+        self._queue: List[Tuple[np.ndarray, Future]] = []
+
+    def __call__(self, X: np.ndarray) -> np.ndarray:
+        future: Future = Future()
+        with self._queue_lock:
+            self._queue.append((X, future))
+        with self._run_lock:
+            if not future.done():
+                with self._queue_lock:
+                    pending, self._queue = self._queue, []
+                self._run(pending)
+        return future.result()
+
+    def _run(self, pending) -> None:
+        try:
+            Y = self._fn(np.concatenate([x for x, _ in pending]))
+        except Exception as exc:  # noqa: BLE001 - forwarded to every caller
+            for _, f in pending:
+                f.set_exception(exc)
+            return
+        offset = 0
+        for x, f in pending:
+            f.set_result(Y[offset:offset + len(x)])
+            offset += len(x)
+
+
+class SocPredictor:
+    """SOC10/SOC30 models of one artifact directory."""
+
+    def __init__(self, directory) -> None:
+        import torch
+
+        from .ml import load_artifact
+
+        torch.set_num_threads(settings.SOC_TORCH_THREADS)
+        self.directory = str(directory)
+        self.soc10 = load_artifact(os.path.join(self.directory, SOC10_FILE))
+        self.soc30 = load_artifact(os.path.join(self.directory, SOC30_FILE))
+        self.features: List[str] = list(self.soc10["features"])
+        # feature-store columns of the features; an unknown feature fails the load
+        self.columns: List[Tuple[str, str]] = [feature_column(name) for name in self.features]
+        # SOC30 inputs are SOC10 inputs plus the SOC10 prediction (not read as NaN)
+        unknown = set(self.soc30["features"]) - set(self.features) - {SOC10_FEATURE}
+        if unknown:
+            raise ValueError(f"SOC30 features missing from the SOC10 features: {', '.join(sorted(unknown))}")
+        self.version = hash_artifacts(self.directory)
+        self._batched = MicroBatcher(self._predict)
+
+    def _predict(self, X: np.ndarray) -> np.ndarray:
+        from .ml import predict_ensemble
+
+        soc10 = predict_ensemble(self.soc10, X)
+        by_name = dict(zip(self.features, X.T))
+        by_name[SOC10_FEATURE] = soc10
+        X30 = np.column_stack([by_name[name] for name in self.soc30["features"]])
+        soc30 = predict_ensemble(self.soc30, X30)
+        return np.column_stack([soc10, soc30])
+
+    def predict(self, X: np.ndarray, coalesce: bool = True) -> np.ndarray:
+        """``(n, 2)`` array of SOC10/SOC30 for ``X`` ordered as :attr:`features`.
+
+        ``coalesce=False`` bypasses the micro-batcher (batch jobs that already
+        send large chunks from several threads).
+        """
+        X = np.asarray(X, dtype=np.float64).reshape(-1, len(self.features))
+        if len(X) == 0:
+            return np.empty((0, 2))
+        return self._batched(X) if coalesce else self._predict(X)
+
+    def predict_records(self, records: Sequence[Dict[str, float]]) -> np.ndarray:
+        """Same as :meth:`predict` for ``[{feature: value}, ...]`` (missing -> NaN)."""
+        X = np.array(
+            [[_as_float(r.get(name)) for name in self.features] for r in records],
+            dtype=np.float64,
+        )
+        return self.predict(X)
+
+
+def _as_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+_live: Optional[SocPredictor] = None
+_loaded: "OrderedDict[str, SocPredictor]" = OrderedDict()
+_checked_at = 0.0
+_swapping: Optional[str] = None
+_predictor_lock = threading.Lock()
+
+
+def _registered(version: Optional[str] = None) -> Optional[Tuple[str, str]]:
+    """``(version, directory)`` of ``version``, or of the live version."""
+    from django.db import DatabaseError
+
+    from .models import SocModelVersion
+
+    qs = SocModelVersion.objects.all()
+    qs = qs.filter(version=version) if version else qs.filter(role=SocModelVersion.LIVE)
+    try:
+        return qs.values_list("version", "directory").first()
+    except DatabaseError:  # registry not migrated yet
+        return None
+
+
+def _load(directory) -> SocPredictor:
+    predictor = SocPredictor(directory)
+    with _predictor_lock:
+        _loaded[predictor.version] = predictor
+        _loaded.move_to_end(predictor.version)
+        while len(_loaded) > settings.SOC_MODEL_CACHE_SIZE:
+            _loaded.popitem(last=False)
+    return predictor
+
+
+def _swap(version: str, directory: str) -> None:
+    global _live, _swapping
+    try:
+        predictor = _loaded.get(version) or _load(directory)
+        _live = predictor
+        logger.info("SOC model %s is live", version)
+    except Exception:  # noqa: BLE001 - keep serving the current version
+        logger.exception("loading SOC model %s failed", version)
+    finally:
+        _swapping = None
+
+
+def get_predictor(version: Optional[str] = None) -> SocPredictor:
+    """Per-process predictor of the live version, or of ``version``.
+
+    An explicit ``version`` (A/B or shadow evaluation, batch jobs pinned to
+    one version) is loaded on demand; ``KeyError`` when it is not registered.
+    """
+    global _live, _checked_at, _swapping
+    if version is not None:
+        predictor = _loaded.get(version) or (_live if _live is not None and _live.version == version else None)
+        if predictor is None:
+            registered = _registered(version)
+            if registered is not None:
+                return _load(registered[1])
+            # unregistered artifacts of SOC_MODELS_DIR
+            predictor = get_predictor()
+            if predictor.version != version:
+                raise KeyError(version)
+        return predictor
+
+    if _live is None:
+        with _predictor_lock:
+            if _live is None:
+                registered = _registered()
+                _checked_at = time.monotonic()
+                directory = registered[1] if registered else settings.SOC_MODELS_DIR
+                _live = SocPredictor(directory)
+                _loaded[_live.version] = _live
+        return _live
+
+    if time.monotonic() - _checked_at > settings.SOC_MODEL_CHECK_SECONDS:
+        with _predictor_lock:
+            if time.monotonic() - _checked_at > settings.SOC_MODEL_CHECK_SECONDS:
+                _checked_at = time.monotonic()
+                registered = _registered()
+                if registered and registered[0] != _live.version and _swapping is None:
+                    _swapping = registered[0]
+                    threading.Thread(target=_swap, args=registered, daemon=True).start()
+    return _live
@@ -0,0 +1,157 @@
+"""Set-based, chunked deletion of the profiles or layers of a source.
+
+``QuerySet.delete()`` loads every object to emulate ``on_delete=CASCADE``
+in Python. Here a chunk of ids is removed with one ``DELETE`` per table,
+children first, the cascade graph being read from the model relations. Each
+chunk is its own short transaction, so the tables stay usable while a large
+source is purged, and an interrupted :class:`~soils.models.PurgeJob` can
+simply be run again. Purging every source truncates the tables instead.
+
+Jobs run in a daemon thread of the web process (:func:`start`) or in
+``manage.py purge_profiles``. A job beats (``heartbeat_at``) after every
+chunk; one silent for ``PURGE_STALE_SECONDS`` lost its thread, typically to a
+recycled gunicorn worker, and the next :func:`submit` takes it over.
+"""
+from __future__ import annotations
+
+import datetime as dt
+import logging
+import threading
+from typing import List, Optional, Tuple
+
+from django.conf import settings
+from django.db import close_old_connections, connection, models, transaction
+from django.utils import timezone
+
+from . import stats
+from .models import Layer, PurgeJob, SoilProfile, Source
+
+log = logging.getLogger(__name__)
+
+
+def _relations(model):
+    """Reverse foreign keys of ``model`` (``ManyToOneRel``/``OneToOneRel``)."""
+    return [rel for rel in model._meta.related_objects if not rel.many_to_many]
+
+
+def cascade_tables(model) -> Optional[List[str]]:
+    """Tables emptied with ``model``'s, or ``None`` when a relation is not CASCADE."""
+    tables = [model._meta.db_table]
+    for rel in _relations(model):
+        if rel.on_delete is not models.CASCADE:
+            return None
+        children = cascade_tables(rel.related_model)
+        if children is None:
+            return None
+        tables += children
+    return tables
+
+
+def delete_where(cursor, model, where: str, params: list) -> int:
+    """``DELETE`` the rows of ``model`` matching ``where`` and, first, their dependents."""
+    qn = connection.ops.quote_name
+    table = qn(model._meta.db_table)
+    selected = f"SELECT {qn(model._meta.pk.column)} FROM {table} WHERE {where}"
+    for rel in _relations(model):
+        child, column = rel.related_model, qn(rel.field.column)
+        if rel.on_delete is models.CASCADE:
+            delete_where(cursor, child, f"{column} IN ({selected})", params)
+        elif rel.on_delete is models.SET_NULL:
+            cursor.execute(
+                f"UPDATE {qn(child._meta.db_table)} SET {column} = NULL WHERE {column} IN ({selected})", params
+            )
+        elif rel.on_delete is not models.DO_NOTHING:
+            raise ValueError(f"{child.__name__}.{rel.field.name}: on_delete not supported by the purge")
+    cursor.execute(f"DELETE FROM {table} WHERE {where}", params)
+    return cursor.rowcount
+
+
+def _target(job: PurgeJob):
+    if job.scope == PurgeJob.LAYERS:
+        qs = Layer.objects.all()
+        return Layer, qs.filter(profile__source=job.source_id) if job.source_id else qs
+    qs = SoilProfile.objects.all()
+    return SoilProfile, qs.filter(source=job.source_id) if job.source_id else qs
+
+
+def run(job: PurgeJob) -> PurgeJob:
+    """Delete the job's rows chunk by chunk, saving the progress after each one."""
+    model, queryset = _target(job)
+    job.status = PurgeJob.RUNNING
+    job.started_at = job.started_at or timezone.now()
+    job.error = ""
+    job.heartbeat_at = timezone.now()
+    job.total = job.deleted + queryset.count()
+    job.save(update_fields=["status", "started_at", "error", "heartbeat_at", "total"])
+
+    try:
+        tables = cascade_tables(model) if not job.source_id else None
+        if tables is not None:
+            with connection.cursor() as cursor:
+                cursor.execute(f"TRUNCATE {', '.join(connection.ops.quote_name(t) for t in tables)} CASCADE")
+            job.deleted = job.total
+        else:
+            where = f"{connection.ops.quote_name(model._meta.pk.column)} = ANY(%s)"
+            while True:
+                ids = list(queryset.order_by("pk").values_list("pk", flat=True)[:job.chunk_size])
+                if not ids:
+                    break
+                with transaction.atomic(), connection.cursor() as cursor:
+                    job.deleted += delete_where(cursor, model, where, [ids])
+                job.heartbeat_at = timezone.now()
+                job.save(update_fields=["deleted", "heartbeat_at"])
+        job.status = PurgeJob.DONE
+    except Exception as exc:
+        log.exception("purge job %s failed", job.pk)
+        job.status = PurgeJob.FAILED
+        job.error = str(exc)
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "error", "deleted", "finished_at"])
+    stats.refresh([job.source_id] if job.source_id else None)
+    return job
+
+
+def is_stale(job: PurgeJob) -> bool:
+    """Unfinished job whose thread stopped beating (or never started)."""
+    if job.status not in (PurgeJob.PENDING, PurgeJob.RUNNING):
+        return False
+    last = job.heartbeat_at or job.created_at
+    return timezone.now() - last > dt.timedelta(seconds=settings.PURGE_STALE_SECONDS)
+
+
+def reclaim(job: PurgeJob) -> bool:
+    """Take over a stale job; ``False`` when another process got it first."""
+    now = timezone.now()
+    taken = PurgeJob.objects.filter(pk=job.pk, status=job.status, heartbeat_at=job.heartbeat_at).update(
+        status=PurgeJob.PENDING, heartbeat_at=now
+    )
+    if taken:
+        job.status, job.heartbeat_at = PurgeJob.PENDING, now
+    return bool(taken)
+
+
+def submit(source: Optional[Source], scope: str = PurgeJob.PROFILES, chunk_size: int = 2000) -> Tuple[PurgeJob, bool]:
+    """``(job, created)``; an unfinished job of the same source and scope is returned as is.
+
+    ``created`` is also true when that job was stale and has been reclaimed:
+    the caller starts it again, from where it stopped.
+    """
+    existing = PurgeJob.objects.filter(
+        source=source, scope=scope, status__in=(PurgeJob.PENDING, PurgeJob.RUNNING)
+    ).first()
+    if existing is not None:
+        return existing, is_stale(existing) and reclaim(existing)
+    return PurgeJob.objects.create(source=source, scope=scope, chunk_size=chunk_size), True
+
+
+def _run_in_thread(pk: int) -> None:
+    close_old_connections()
+    try:
+        run(PurgeJob.objects.get(pk=pk))
+    finally:
+        connection.close()
+
+
+def start(job: PurgeJob) -> None:
+    """Run ``job`` in a daemon thread; the request returns at once."""
+    threading.Thread(target=_run_in_thread, args=(job.pk,), name=f"purge-{job.pk}", daemon=True).start()
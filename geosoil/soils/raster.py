@@ -0,0 +1,269 @@
+"""Wall-to-wall SOC maps predicted per pixel from covariate rasters.
+
+The output grid (CRS, resolution, bounds) is cut into aligned square tiles.
+Each tile is predicted in a worker process by :func:`predict_tile`: the
+covariates are resampled on the fly onto the tile, run through the SOC models
+and written to a small two-band GeoTIFF (SOC10, SOC30) in the work directory.
+A run that is interrupted resumes at the first missing tile. :func:`assemble`
+then mosaics the tiles into one Cloud-Optimized GeoTIFF per depth, tiled,
+compressed and with overviews.
+
+Covariates are single-band rasters named after the model features
+(``B4.tif``, ``SR_B5.tif``...). A registered spectral index that has no raster
+of its own is computed from its bands.
+
+This module is imported by spawned worker processes before Django is set up,
+so the models and the registry are imported lazily.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from dataclasses import dataclass
+from math import ceil
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import rasterio
+import rasterio.shutil
+from affine import Affine
+from rasterio.enums import Resampling
+from rasterio.transform import from_origin
+from rasterio.vrt import WarpedVRT
+from rasterio.warp import transform_bounds
+from rasterio.windows import Window
+from rasterio.windows import transform as window_transform
+
+from .prediction import OUTPUTS
+
+# blocks of the intermediate mosaic; tiles must be a multiple of it
+BLOCK_SIZE = 256
+# rows per forward pass, bounds the activations of the MLP
+PREDICT_ROWS = 65536
+COG_OPTIONS = {
+    "BLOCKSIZE": 512,
+    "COMPRESS": "DEFLATE",
+    "PREDICTOR": "YES",
+    "OVERVIEWS": "AUTO",
+    "OVERVIEW_RESAMPLING": "AVERAGE",
+    "BIGTIFF": "IF_SAFER",
+    "NUM_THREADS": "ALL_CPUS",
+}
+
+
+@dataclass(frozen=True)
+class Grid:
+    """Output pixel grid."""
+
+    crs: str
+    transform: Affine
+    width: int
+    height: int
+
+    @classmethod
+    def from_bounds(cls, bounds: Sequence[float], res: float, crs: str) -> "Grid":
+        minx, miny, maxx, maxy = bounds
+        return cls(
+            crs,
+            from_origin(minx, maxy, res, res),
+            int(ceil((maxx - minx) / res)),
+            int(ceil((maxy - miny) / res)),
+        )
+
+    @property
+    def res(self) -> float:
+        return self.transform.a
+
+    def windows(self, size: int) -> List[Window]:
+        return [
+            Window(col, row, min(size, self.width - col), min(size, self.height - row))
+            for row in range(0, self.height, size)
+            for col in range(0, self.width, size)
+        ]
+
+    def profile(self, **options) -> dict:
+        return {
+            "driver": "GTiff",
+            "crs": self.crs,
+            "transform": self.transform,
+            "width": self.width,
+            "height": self.height,
+            "count": 1,
+            "dtype": "float32",
+            "nodata": np.nan,
+            **options,
+        }
+
+
+@dataclass(frozen=True)
+class TileJob:
+    grid: Grid
+    window: Window
+    sources: Dict[str, str]
+    path: str
+    # model version every tile is predicted with (a promotion mid-run must not mix versions)
+    version: Optional[str] = None
+
+
+def covariate_sources(directory, features: Sequence[str]) -> Tuple[Dict[str, str], List[str]]:
+    """Rasters to read: ``({name: path}, missing features)``.
+
+    Indices without a raster are resolved to their bands and computed in
+    :func:`read_covariates`.
+    """
+    from .indices import INDICES
+
+    def raster(name):
+        path = os.path.join(str(directory), f"{name}.tif")
+        return path if os.path.exists(path) else None
+
+    sources, missing = {}, []
+    for name in features:
+        if raster(name):
+            sources[name] = raster(name)
+        elif name in INDICES and all(raster(b) for b in INDICES[name].bands):
+            sources.update({b: raster(b) for b in INDICES[name].bands})
+        else:
+            missing.append(name)
+    return sources, missing
+
+
+def default_bounds(sources: Dict[str, str], crs: str) -> Tuple[float, float, float, float]:
+    """Extent of the first covariate, in ``crs``."""
+    with rasterio.open(next(iter(sources.values()))) as src:
+        return transform_bounds(src.crs, crs, *src.bounds)
+
+
+def _read(path: str, grid: Grid, window: Window) -> np.ndarray:
+    with rasterio.open(path) as src, WarpedVRT(
+        src,
+        crs=grid.crs,
+        transform=grid.transform,
+        width=grid.width,
+        height=grid.height,
+        resampling=Resampling.bilinear,
+        src_nodata=src.nodata,
+        nodata=np.nan,
+        dtype="float32",
+    ) as vrt:
+        # outside the source extent and source nodata both read as NaN
+        return vrt.read(1, window=window)
+
+
+def read_covariates(features: Sequence[str], sources: Dict[str, str], grid: Grid, window: Window) -> np.ndarray:
+    """``(pixels, features)`` float32 matrix of one window, NaN where missing."""
+    from .indices import INDICES
+
+    shape = (int(window.height), int(window.width))
+    cache: Dict[str, np.ndarray] = {}
+
+    def band(name):
+        if name not in cache:
+            cache[name] = _read(sources[name], grid, window) if name in sources else np.full(shape, np.nan, np.float32)
+        return cache[name]
+
+    columns = []
+    for name in features:
+        if name not in sources and name in INDICES:
+            index = INDICES[name]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                columns.append(index.formula(*(band(b) for b in index.bands)).astype(np.float32))
+        else:
+            columns.append(band(name))
+    X = np.stack([c.ravel() for c in columns], axis=1)
+    X[~np.isfinite(X)] = np.nan
+    return X
+
+
+def init_worker(threads: int = 1) -> None:
+    """Process-pool initializer: Django and torch in a spawned worker."""
+    import django
+    import torch
+
+    django.setup()
+    torch.set_num_threads(threads)
+
+
+def predict_tile(job: TileJob) -> str:
+    """Predict one tile and write it atomically to ``job.path``."""
+    from .prediction import get_predictor
+
+    predictor = get_predictor(job.version)
+    X = read_covariates(predictor.features, job.sources, job.grid, job.window)
+    # pixels outside every covariate stay nodata
+    valid = np.flatnonzero(~np.isnan(X).all(axis=1))
+    Y = np.full((len(X), len(OUTPUTS)), np.nan, np.float32)
+    for i in range(0, len(valid), PREDICT_ROWS):
+        rows = valid[i:i + PREDICT_ROWS]
+        Y[rows] = predictor.predict(X[rows], coalesce=False)
+
+    h, w = int(job.window.height), int(job.window.width)
+    profile = job.grid.profile(
+        width=w, height=h, count=len(OUTPUTS),
+        transform=window_transform(job.window, job.grid.transform),
+        compress="deflate",
+    )
+    tmp = f"{job.path}.{os.getpid()}.tmp"
+    with rasterio.open(tmp, "w", **profile) as dst:
+        dst.write(Y.T.reshape(len(OUTPUTS), h, w))
+    os.replace(tmp, job.path)
+    return job.path
+
+
+def tiles_key(grid: Grid, sources: Dict[str, str], tile_size: int, version: Optional[str]) -> str:
+    """Hash of everything a tile depends on; names the tile directory of a run.
+
+    Covariates are identified by path, size and mtime, so a re-exported
+    raster invalidates the tiles computed from the previous one.
+    """
+    digest = hashlib.sha256(json.dumps({
+        "crs": str(grid.crs),
+        "transform": list(grid.transform)[:6],
+        "shape": [grid.width, grid.height],
+        "tile_size": tile_size,
+        "version": version,
+        "sources": {
+            name: [path, os.stat(path).st_size, os.stat(path).st_mtime_ns]
+            for name, path in sorted(sources.items())
+        },
+    }, sort_keys=True).encode())
+    return digest.hexdigest()[:12]
+
+
+def tile_jobs(grid: Grid, sources: Dict[str, str], work_dir, tile_size: int,
+              version: Optional[str] = None) -> List[TileJob]:
+    if tile_size % BLOCK_SIZE:
+        raise ValueError(f"tile size must be a multiple of {BLOCK_SIZE}")
+    return [
+        TileJob(grid, w, sources, os.path.join(str(work_dir), f"r{int(w.row_off):06d}_c{int(w.col_off):06d}.tif"), version)
+        for w in grid.windows(tile_size)
+    ]
+
+
+def assemble(jobs: Sequence[TileJob], grid: Grid, output_dir, tags: Dict[str, str] = None) -> List[str]:
+    """Mosaic the tiles into ``<output_dir>/soc10.tif`` and ``soc30.tif`` (COG).
+
+    Tiles are copied one at a time into a tiled intermediate GeoTIFF, which
+    GDAL's COG driver then rewrites with overviews; memory stays at one tile.
+    """
+    outputs = []
+    for band, name in enumerate(OUTPUTS, start=1):
+        mosaic = os.path.join(os.path.dirname(jobs[0].path), f"{name}_mosaic.tif")
+        profile = grid.profile(
+            tiled=True, blockxsize=BLOCK_SIZE, blockysize=BLOCK_SIZE,
+            compress="deflate", BIGTIFF="IF_SAFER",
+        )
+        with rasterio.open(mosaic, "w", **profile) as dst:
+            for job in jobs:
+                with rasterio.open(job.path) as src:
+                    dst.write(src.read(band), 1, window=job.window)
+            dst.update_tags(depth=name, **(tags or {}))
+
+        out = os.path.join(str(output_dir), f"{name}.tif")
+        tmp = f"{out}.tmp"
+        rasterio.shutil.copy(mosaic, tmp, driver="COG", **COG_OPTIONS)
+        os.replace(tmp, out)
+        os.remove(mosaic)
+        outputs.append(out)
+    return outputs
@@ -0,0 +1,206 @@
+"""Registry of the SOC model versions.
+
+A version is the content hash of its two artifacts
+(:func:`~soils.prediction.hash_artifacts`). Registering copies them to
+``SOC_MODELS_DIR/registry/<version>/``, which is never modified afterwards.
+Promoting flips the ``live`` role in one transaction. Web workers pick the
+change up within ``SOC_MODEL_CHECK_SECONDS`` (see
+:func:`~soils.prediction.get_predictor`), and rolling back is promoting the
+previous version again.
+
+The ``shadow`` version gets predictions next to the live one on the same
+batches (``predict_soc``), so both can be compared before a promotion.
+"""
+from __future__ import annotations
+
+import json
+import os
+import shutil
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import SocModelVersion
+from .prediction import SOC10_FILE, SOC30_FILE, SocPredictor, get_predictor, hash_artifacts
+
+
+def registry_dir():
+    return os.path.join(str(settings.SOC_MODELS_DIR), "registry")
+
+
+def register(directory, notes: str = "") -> SocModelVersion:
+    """Copy a bundle into the registry (idempotent) and record it as a candidate."""
+    version = hash_artifacts(directory)
+    existing = SocModelVersion.objects.filter(version=version).first()
+    if existing is not None:
+        return existing
+
+    target = os.path.join(registry_dir(), version)
+    if not os.path.isdir(target):
+        tmp = os.path.join(registry_dir(), f".{version}.tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        for name in (SOC10_FILE, SOC30_FILE, "metrics.json"):
+            if os.path.exists(os.path.join(str(directory), name)):
+                shutil.copyfile(os.path.join(str(directory), name), os.path.join(tmp, name))
+        os.replace(tmp, target)
+
+    # loading validates the artifacts before anything can promote them
+    predictor = SocPredictor(target)
+    metrics = {}
+    if os.path.exists(os.path.join(target, "metrics.json")):
+        with open(os.path.join(target, "metrics.json")) as fh:
+            metrics = json.load(fh)
+    return SocModelVersion.objects.create(
+        version=predictor.version,
+        directory=target,
+        features=predictor.features,
+        metrics=metrics,
+        notes=notes,
+    )
+
+
+def live_version() -> Optional[SocModelVersion]:
+    return SocModelVersion.objects.filter(role=SocModelVersion.LIVE).first()
+
+
+def shadow_version() -> Optional[SocModelVersion]:
+    return SocModelVersion.objects.filter(role=SocModelVersion.SHADOW).first()
+
+
+def serving_version() -> Optional[str]:
+    """Version served when a request does not name one (points, zonal stats).
+
+    The live version, else the one :func:`get_predictor` falls back to. The
+    most recent predictions are only used when nothing is registered: the
+    shadow rows of a batch are written after the live ones.
+    """
+    from .models import SocPrediction
+
+    live = live_version()
+    if live is not None:
+        return live.version
+    if SocModelVersion.objects.exists():
+        return get_predictor().version
+    return (
+        SocPrediction.objects.order_by("-predicted_at")
+        .values_list("model_version", flat=True)
+        .first()
+    )
+
+
+def _get(version: str) -> SocModelVersion:
+    """Registered version by full hash or unambiguous prefix."""
+    matches = list(SocModelVersion.objects.filter(version__startswith=version)[:2])
+    if len(matches) != 1:
+        raise SocModelVersion.DoesNotExist(f"{'ambiguous' if matches else 'unknown'} model version {version}")
+    return matches[0]
+
+
+@transaction.atomic
+def promote(version: str) -> SocModelVersion:
+    """Make ``version`` live; the current live version is retired."""
+    target = _get(version)
+    rows = SocModelVersion.objects.select_for_update().filter(role=SocModelVersion.LIVE).exclude(pk=target.pk)
+    rows.update(role=SocModelVersion.RETIRED)
+    target.role = SocModelVersion.LIVE
+    target.promoted_at = timezone.now()
+    target.save(update_fields=["role", "promoted_at"])
+    return target
+
+
+def rollback() -> SocModelVersion:
+    """Promote again the version that was live before the current one."""
+    current = live_version()
+    previous = (
+        SocModelVersion.objects.filter(role=SocModelVersion.RETIRED, promoted_at__isnull=False)
+        .exclude(pk=getattr(current, "pk", None))
+        .order_by("-promoted_at")
+        .first()
+    )
+    if previous is None:
+        raise SocModelVersion.DoesNotExist("no previously live model version")
+    return promote(previous.version)
+
+
+@transaction.atomic
+def set_shadow(version: Optional[str]) -> Optional[SocModelVersion]:
+    """Evaluate ``version`` in shadow of the live one (``None`` stops it)."""
+    SocModelVersion.objects.select_for_update().filter(role=SocModelVersion.SHADOW).update(
+        role=SocModelVersion.CANDIDATE
+    )
+    if version is None:
+        return None
+    target = _get(version)
+    if target.role == SocModelVersion.LIVE:
+        raise ValueError(f"{target.version} is the live version")
+    target.role = SocModelVersion.SHADOW
+    target.save(update_fields=["role"])
+    return target
+
+
+def agreement(a: np.ndarray, b: np.ndarray) -> Dict[str, float]:
+    """Per depth mean absolute difference and correlation of two ``(n, 2)`` predictions."""
+    result = {}
+    for j, depth in enumerate(("soc10", "soc30")):
+        ok = np.isfinite(a[:, j]) & np.isfinite(b[:, j])
+        diff = a[ok, j] - b[ok, j]
+        result[depth] = {
+            "n": int(ok.sum()),
+            "mae": float(np.abs(diff).mean()) if ok.any() else None,
+            "bias": float(diff.mean()) if ok.any() else None,
+            "r": float(np.corrcoef(a[ok, j], b[ok, j])[0, 1]) if ok.sum() > 1 else None,
+        }
+    return result
+
+
+def compare_versions(a: str, b: str, profiles: Optional[Sequence[int]] = None) -> dict:
+    """Run two versions on the same feature-store batch.
+
+    Returns their agreement and, for profiles with observed ``SOC_10`` /
+    ``SOC_30``, each version's R2 and RMSE.
+    """
+    from .features import feature_matrix
+    from .models import ProfileProperty
+
+    pa, pb = get_predictor(_get(a).version), get_predictor(_get(b).version)
+    if pa.columns != pb.columns:
+        # different inputs: predict each version on its own columns, same profiles
+        pids, Xa = feature_matrix(pa.columns, profiles=profiles)
+        _, Xb = feature_matrix(pb.columns, profiles=pids.tolist())
+    else:
+        pids, Xa = feature_matrix(pa.columns, profiles=profiles)
+        Xb = Xa
+    Ya, Yb = pa.predict(Xa, coalesce=False), pb.predict(Xb, coalesce=False)
+
+    observed = np.full((len(pids), 2), np.nan)
+    index = {pk: i for i, pk in enumerate(pids.tolist())}
+    rows = ProfileProperty.objects.filter(profile_id__in=index, name__in=("SOC_10", "SOC_30"))
+    for pk, name, value in rows.exclude(value_num=None).values_list("profile_id", "name", "value_num"):
+        observed[index[pk], 0 if name == "SOC_10" else 1] = value
+
+    def skill(Y):
+        out = {}
+        for j, depth in enumerate(("soc10", "soc30")):
+            ok = np.isfinite(Y[:, j]) & np.isfinite(observed[:, j])
+            if ok.sum() < 2:
+                out[depth] = None
+                continue
+            err = Y[ok, j] - observed[ok, j]
+            ss = ((observed[ok, j] - observed[ok, j].mean()) ** 2).sum()
+            out[depth] = {
+                "n": int(ok.sum()),
+                "rmse": float(np.sqrt((err ** 2).mean())),
+                "r2": float(1 - (err ** 2).sum() / ss) if ss else None,
+            }
+        return out
+
+    return {
+        "profiles": len(pids),
+        "versions": [pa.version, pb.version],
+        "agreement": agreement(Ya, Yb),
+        "observed": {pa.version: skill(Ya), pb.version: skill(Yb)},
+    }
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""Échantillonnage Earth Engine des profils (composites médians par fenêtre).
+
+Partagé par ``fetch_sentinel_data_3`` et ``refresh_remote_sensing``.
+"""
+from __future__ import annotations
+
+import datetime as dt
+from typing import Any, Dict, List, Tuple
+
+import ee
+
+from .features import L8_BANDS, S1_BANDS, S2_BANDS, build_features
+from .models import RemoteSensingFeature, SoilProfile
+
+# échelle d'échantillonnage par défaut (m) quand elle diffère de --scale
+SENSOR_SCALE = {"S3": 300, "L8": 30}
+
+def s2_prepare(img: ee.Image) -> ee.Image:
+    # bandes homogènes ; NDVI/NDWI & co. sont calculés côté serveur (soils.indices)
+    return img.select(S2_BANDS)
+
+def sensor_collection(point: ee.Geometry, sensor: str) -> ee.ImageCollection:
+    """Collection du capteur filtrée sur le point (sans filtre de date)."""
+
+    if sensor == "S2":
+        coll = (ee.ImageCollection("COPERNICUS/S2_SR_HARMONIZED")
+                .filterBounds(point)
+                .map(s2_prepare))
+    elif sensor == "S1":
+        pol = ee.Filter.listContains('transmitterReceiverPolarisation', 'VV') \
+              .And(ee.Filter.listContains('transmitterReceiverPolarisation', 'VH'))
+        coll = (ee.ImageCollection("COPERNICUS/S1_GRD")
+                .filter(pol)
+                .filterBounds(point)
+                .select(S1_BANDS))
+    elif sensor == "S3":
+        coll = (ee.ImageCollection("COPERNICUS/S3/OLCI")
+                .filterBounds(point))
+    elif sensor == "L8":
+        coll = (ee.ImageCollection("LANDSAT/LC08/C02/T1_L2")
+                .filterBounds(point)
+                .select(L8_BANDS))
+    else:
+        raise ValueError("Unknown sensor")
+    return coll
+
+
+def _reduce_point(img: ee.Image, point: ee.Geometry, scale: int) -> ee.Dictionary:
+    # reduceRegion est plus tolérant que sample() sur les valeurs manquantes
+    return img.reduceRegion(
+            reducer = ee.Reducer.first(),   # prend la valeur du pixel
+            geometry = point,
+            scale = scale,
+            bestEffort = True
+        )
+
+
+def median_sample(point: ee.Geometry,
+                  date_start: str,
+                  date_end: str,
+                  sensor: str,
+                  scale: int = 10) -> Dict[str, Any]:
+    """Renvoie le dictionnaire des valeurs médianes (reduceRegion)."""
+
+    img = sensor_collection(point, sensor).filterDate(date_start, date_end).median()
+    d = _reduce_point(img, point, scale).getInfo()
+
+    # d == {} si aucune acquisition
+    return d if d else {}
+
+
+def median_series(point: ee.Geometry,
+                  windows: List[Tuple[dt.date, dt.date]],
+                  sensor: str,
+                  scale: int = 10) -> List[Dict[str, Any]]:
+    """Composites médians pour chaque fenêtre, en un seul aller-retour EE."""
+
+    coll = sensor_collection(point, sensor)
+
+    def _window(w):
+        w = ee.List(w)
+        return _reduce_point(coll.filterDate(w.get(0), w.get(1)).median(), point, scale)
+
+    ee_windows = ee.List([[str(a), str(b)] for a, b in windows])
+    return [d or {} for d in ee_windows.map(_window).getInfo()]
+
+def sample_profile(profile: SoilProfile,
+                   windows: Dict[str, List[Tuple[dt.date, dt.date]]],
+                   scale: int = 10) -> List[RemoteSensingFeature]:
+    """Échantillonne les fenêtres demandées ``{capteur: [fenêtres]}`` d'un profil."""
+
+    ee_point = ee.Geometry.Point([profile.location.x, profile.location.y])
+    rows: List[RemoteSensingFeature] = []
+    for s, todo_windows in windows.items():
+        if not todo_windows:
+            continue
+        series = median_series(ee_point, todo_windows, s, scale=SENSOR_SCALE.get(s, scale))
+        for (w_start, w_end), values in zip(todo_windows, series):
+            if values:
+                rows.extend(build_features(profile.pk, s, w_start, w_end, values))
+    return rows
@@ -0,0 +1,249 @@
+"""Hyperparameter search for the SOC models.
+
+Trials are sampled at random from :data:`SPACE` and :data:`FEATURE_SETS` and
+run in a spawned process pool on CPU, one trial per process. The fold datasets
+are preprocessed once per data hash and feature set, and written as ``.npy``
+files that the workers memory-map, instead of receiving a copy per trial.
+A feature set's folds only keep its columns and the profiles with at least
+one of them, the rows ``train_soc_models`` would train on with the same
+features: a "landsat" trial does not train or validate on imputed rows of
+Sentinel-only profiles, and leaderboard scores compare with the trained
+models.
+
+Pruning is the median rule on the per-epoch validation losses of
+:class:`~soils.training.LossTracker`: once ``startup`` trials of the same
+feature set (same folds) have finished, a trial whose best loss at epoch *e*
+of a fold is above the median of those trials at the same point is stopped.
+Every trial is stored in :class:`~soils.models.TrainingTrial`, the
+leaderboard.
+
+This module is imported by the spawned workers, the Django models are
+imported lazily.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import os
+import time
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Sequence
+
+import joblib
+import numpy as np
+from sklearn.impute import SimpleImputer
+from sklearn.metrics import mean_squared_error, r2_score
+from sklearn.model_selection import GroupKFold
+from sklearn.preprocessing import StandardScaler
+
+from .training import (
+    LANDSAT_BANDS,
+    LossTracker,
+    TrainCfg,
+    TrainingData,
+    TrialPruned,
+    fit_target_transformer,
+    site_sample_weights,
+    train_one_fold,
+)
+
+SENTINEL_BANDS = ["B1", "B2", "B3", "B4", "B5", "B6", "B7", "B8", "B8A", "B9", "B11", "B12"]
+S2_INDICES = ["SNDVI", "SGDVI", "SMSAVI2", "SPSRINIR", "SNDWI", "Scigreen"]
+L8_INDICES = ["LNDVI", "LNDWI", "LBSI", "Lcigreen"]
+FEATURE_SETS = {
+    "landsat": LANDSAT_BANDS,
+    "landsat+indices": LANDSAT_BANDS + L8_INDICES,
+    "sentinel": SENTINEL_BANDS,
+    "sentinel+indices": SENTINEL_BANDS + S2_INDICES,
+    "all": LANDSAT_BANDS + SENTINEL_BANDS + S2_INDICES + L8_INDICES,
+}
+# (kind, values) per TrainCfg field
+SPACE = {
+    "hidden": ("choice", [[128, 128], [256, 128], [256, 128, 64], [512, 256, 128]]),
+    "dropout": ("uniform", (0.1, 0.4)),
+    "lr": ("loguniform", (3e-4, 5e-3)),
+    "weight_decay": ("loguniform", (1e-5, 1e-2)),
+}
+
+
+def all_features(feature_sets: Sequence[str], attributes: Sequence[str] = ()) -> List[str]:
+    """Union of the candidate feature sets, in a stable order."""
+    seen: Dict[str, None] = {}
+    for name in feature_sets:
+        seen.update(dict.fromkeys(FEATURE_SETS[name]))
+    return list(seen) + [a for a in attributes if a not in seen]
+
+
+def candidate_sets(names: Sequence[str], attributes: Sequence[str] = ()):
+    """``(feature sets, features)`` of a search over the sets ``names``.
+
+    ``features`` are the feature-store columns only; the profile attributes
+    go through ``load_training_data(attributes=...)``, which appends them
+    after. With attributes, the ``other`` set is the union of both.
+    """
+    feature_sets = {name: FEATURE_SETS[name] for name in names}
+    features = all_features(names)
+    if attributes:
+        feature_sets["other"] = all_features(names, attributes)
+    return feature_sets, features
+
+
+def sample_params(rng: np.random.Generator) -> dict:
+    params = {}
+    for name, (kind, values) in SPACE.items():
+        if kind == "choice":
+            params[name] = values[rng.integers(len(values))]
+        elif kind == "uniform":
+            params[name] = float(rng.uniform(*values))
+        else:
+            params[name] = float(math.exp(rng.uniform(math.log(values[0]), math.log(values[1]))))
+    return params
+
+
+# ---------------------------------------------------------------------------
+# shared fold datasets
+
+def prepare_folds(data: TrainingData, target: str, cfg: TrainCfg, directory,
+                  features: Optional[Sequence[str]] = None) -> str:
+    """Write the preprocessed folds of ``target`` under ``directory/<hash>``.
+
+    With ``features`` (a feature set), only those columns are kept, and only
+    the rows with at least one of them. Reused as is when the directory
+    already exists for the same data.
+    """
+    features = list(features or data.features)
+    columns = [data.features.index(f) for f in features]
+    y = data.targets[target]
+    mask = ~np.isnan(y) & ~np.isnan(data.X[:, columns]).all(axis=1)
+    key = hashlib.sha256(",".join(features).encode()).hexdigest()[:8]
+    out = os.path.join(str(directory), f"{data.digest}_{target}_{cfg.transform}_{cfg.n_splits}_{key}")
+    if os.path.exists(os.path.join(out, "meta.json")):
+        return out
+    os.makedirs(out, exist_ok=True)
+
+    X, y, groups = data.X[mask][:, columns], y[mask], data.groups[mask]
+    tt = fit_target_transformer(y, cfg.transform)
+    y_t = tt.transform(y)
+    splits = list(GroupKFold(n_splits=cfg.n_splits).split(X, y_t, groups))
+    for k, (tr, va) in enumerate(splits):
+        # keep_empty_features: column positions must match features
+        imp = SimpleImputer(strategy="median", keep_empty_features=True).fit(X[tr])
+        sc = StandardScaler().fit(imp.transform(X[tr]))
+        arrays = {
+            "X_tr": sc.transform(imp.transform(X[tr])).astype(np.float32),
+            "X_va": sc.transform(imp.transform(X[va])).astype(np.float32),
+            "y_tr": y_t[tr], "y_va": y_t[va],
+            "w_tr": site_sample_weights(groups[tr]), "w_va": site_sample_weights(groups[va]),
+            "va": va,
+        }
+        for name, arr in arrays.items():
+            np.save(os.path.join(out, f"fold{k}_{name}.npy"), arr)
+    np.save(os.path.join(out, "y.npy"), y)
+    joblib.dump(tt, os.path.join(out, "transformer.pkl"))
+    with open(os.path.join(out, "meta.json"), "w") as fh:
+        json.dump({"features": features, "n_splits": cfg.n_splits, "target": target, "rows": int(mask.sum())}, fh)
+    return out
+
+
+def _load(directory: str, name: str) -> np.ndarray:
+    return np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+
+
+# ---------------------------------------------------------------------------
+# trials
+
+@dataclass
+class TrialSpec:
+    number: int
+    # folds of the trial's feature set (prepare_folds)
+    data_dir: str
+    cfg: TrainCfg
+    # (folds, epochs) median of the finished trials' best-so-far losses
+    median: Optional[np.ndarray] = None
+    warmup: int = 20
+
+
+def median_curves(curves: Sequence[List[List[float]]], n_folds: int, epochs: int) -> Optional[np.ndarray]:
+    """Median best-so-far validation loss per (fold, epoch) of finished trials."""
+    if not curves:
+        return None
+    stacked = np.full((len(curves), n_folds, epochs), np.nan)
+    for i, trial in enumerate(curves):
+        for k, losses in enumerate(trial[:n_folds]):
+            if not losses:
+                continue
+            best = np.minimum.accumulate(np.asarray(losses[:epochs], dtype=float))
+            # a fold stopped early keeps its best loss for the remaining epochs
+            stacked[i, k, :len(best)] = best
+            stacked[i, k, len(best):] = best[-1]
+    with np.errstate(all="ignore"):
+        return np.nanmedian(stacked, axis=0)
+
+
+def run_trial(spec: TrialSpec) -> dict:
+    """Train the folds of one trial; returns a ``TrainingTrial`` field dict."""
+    t0 = time.monotonic()
+    with open(os.path.join(spec.data_dir, "meta.json")) as fh:
+        n_folds = json.load(fh)["n_splits"]
+    y = np.asarray(_load(spec.data_dir, "y"))
+    oof_t = np.full(len(y), np.nan)
+    curves: List[List[float]] = []
+    losses: List[float] = []
+    result = {"number": spec.number, "curves": curves, "epochs": 0}
+
+    try:
+        for k in range(n_folds):
+            def fold(name):
+                return _load(spec.data_dir, f"fold{k}_{name}")
+
+            def prune(epoch, best, k=k):
+                if spec.median is None or epoch < spec.warmup or epoch >= spec.median.shape[1]:
+                    return False
+                reference = spec.median[k, epoch]
+                return not np.isnan(reference) and best > reference
+
+            tracker = LossTracker()
+            curves.append(tracker.val)
+            _, yhat_va, best = train_one_fold(
+                np.asarray(fold("X_tr")), np.asarray(fold("y_tr")),
+                np.asarray(fold("X_va")), np.asarray(fold("y_va")),
+                np.asarray(fold("w_tr")), np.asarray(fold("w_va")),
+                cfg=spec.cfg, seed=spec.cfg.seed + k, tracker=tracker, prune=prune,
+            )
+            result["epochs"] += len(tracker.val)
+            oof_t[np.asarray(fold("va"))] = yhat_va
+            losses.append(best)
+    except TrialPruned:
+        result["epochs"] += len(curves[-1])
+        return {**result, "state": "pruned", "duration": time.monotonic() - t0}
+    except Exception:  # noqa: BLE001 - recorded on the leaderboard
+        return {**result, "state": "failed", "duration": time.monotonic() - t0}
+
+    oof = joblib.load(os.path.join(spec.data_dir, "transformer.pkl")).inverse_transform(oof_t)
+    ok = np.isfinite(oof)
+    return {
+        **result,
+        "state": "complete",
+        "value": float(np.mean(losses)),
+        "r2": float(r2_score(y[ok], oof[ok])) if ok.any() else None,
+        "rmse": float(np.sqrt(mean_squared_error(y[ok], oof[ok]))) if ok.any() else None,
+        "duration": time.monotonic() - t0,
+    }
+
+
+def trial_record(study: str, target: str, data_hash: str, feature_set: str,
+                 features: List[str], cfg: TrainCfg, result: dict):
+    from .models import TrainingTrial
+
+    return TrainingTrial(
+        study=study,
+        target=target,
+        data_hash=data_hash,
+        feature_set=feature_set,
+        features=features,
+        params={k: v for k, v in asdict(cfg).items() if k in SPACE or k in ("epochs", "patience", "seed")},
+        **{k: v for k, v in result.items() if k in (
+            "number", "state", "value", "r2", "rmse", "epochs", "curves", "duration"
+        )},
+    )
@@ -1,14 +1,12 @@
 from rest_framework_gis.serializers import GeoFeatureModelSerializer
 from rest_framework import serializers
 from django.contrib.gis.geos import Point
-from .models import SoilProfile, Layer, Source , Property , ProfileProperty , LayerProperty
-import pandas as pd
-from pyproj import Transformer
+from .models import SoilProfile, Layer, Source , Property , ProfileProperty , LayerProperty, Zone, PropertySet, PurgeJob
 from django.db import transaction
-from dbfread import DBF
-from simpledbf import Dbf5
 import tempfile
 
+from . import stats
+
 
 from itertools import groupby
 from operator import attrgetter
@@ -32,15 +30,75 @@ class LayerPropertySerializer(serializers.ModelSerializer):
     class Meta:
         model = LayerProperty
         fields = '__all__'
+class PropertySetSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = PropertySet
+        fields = ['name', 'level', 'properties', 'columns', 'description', 'refreshed_at']
+
+
+class PurgeJobSerializer(serializers.ModelSerializer):
+    source = serializers.SlugRelatedField(slug_field='name', read_only=True)
+    progress = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = PurgeJob
+        fields = ['id', 'source', 'scope', 'status', 'total', 'deleted', 'progress', 'error',
+                  'created_at', 'started_at', 'heartbeat_at', 'finished_at']
+
+
+class NestedPropertySerializer(serializers.Serializer):
+    # shared by ProfileProperty and LayerProperty, read only
+    name = serializers.CharField()
+    value = serializers.CharField()
+    value_num = serializers.FloatField()
+    value_date = serializers.DateField()
+    unit = serializers.CharField()
+
+
+class NestedLayerSerializer(serializers.ModelSerializer):
+    properties = NestedPropertySerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Layer
+        fields = ['id', 'name', 'depth_top', 'depth_bottom', 'carbon_content', 'description', 'properties']
+
+
+class SoilProfileNestedSerializer(GeoFeatureModelSerializer):
+    """Profile with its layers (and their properties) and its properties.
+
+    Read only; the view prefetches every level (see
+    ``SoilProfileViewSet.nested_queryset``), so serialising a batch costs a
+    fixed number of queries.
+    """
+    source = SourceSerializer(read_only=True)
+    layers = NestedLayerSerializer(many=True, read_only=True)
+    properties = NestedPropertySerializer(many=True, read_only=True)
+
+    class Meta:
+        model = SoilProfile
+        geo_field = 'location'
+        fields = ['id', 'code', 'profile_id', 'source', 'location', 'properties', 'layers']
 
 
 class SoilProfileSerializer(GeoFeatureModelSerializer):
     source = SourceSerializer(read_only=True)
+    # compatibilité : JSON reconstruit depuis la table RemoteSensingFeature
+    teledection_data = serializers.SerializerMethodField()
+
+    def get_teledection_data(self, obj):
+        return obj.teledection_json()
+
     class Meta:
         model = SoilProfile
         geo_field = 'location'
         fields = '__all__'
 
+class ZoneSerializer(GeoFeatureModelSerializer):
+    class Meta:
+        model = Zone
+        geo_field = 'geometry'
+        fields = '__all__'
+
 class SoilProfileSerializerCsv(serializers.ModelSerializer):
     CT = 'CT'
     LT = 'LT'
@@ -78,6 +136,8 @@ class SoilProfileSerializerCsv(serializers.ModelSerializer):
                 raise serializers.ValidationError("Unsupported file type. Only CSV, TSV, and DBF files are allowed.")
             
             elif type_file == 'dbf':
+                from simpledbf import Dbf5
+
                 with tempfile.NamedTemporaryFile(delete=False, suffix='.dbf') as tmp:
                     for chunk in file.chunks():
                         tmp.write(chunk)
@@ -98,6 +158,8 @@ class SoilProfileSerializerCsv(serializers.ModelSerializer):
                     raise serializers.ValidationError("Unsupported file type. Only CSV and TSV files are allowed.")
 
 
+                import pandas as pd
+
                 df = pd.read_csv(file, sep=sep, encoding='utf-8')
 
             print(df.columns)
@@ -107,6 +169,8 @@ class SoilProfileSerializerCsv(serializers.ModelSerializer):
      
                 
                 if validated_data['type_location'] == self.CT:
+                    from pyproj import Transformer
+
                     tr = Transformer.from_crs(32628, 4326, always_xy=True)
                     df[["lon", "lat"]] = df.apply(
                         lambda r: tr.transform(r["X_Centroid"], r["Y_Centroid"]),
@@ -173,6 +237,7 @@ class SoilProfileSerializerCsv(serializers.ModelSerializer):
                     update_fields=["location", "source", "profile_id"],
                     unique_fields=["location", "source"],
                 )
+            stats.refresh([source], imported=True)
 
 
         else:
@@ -214,6 +279,8 @@ class LayerSerializerCsv(serializers.ModelSerializer):
                 raise serializers.ValidationError("Unsupported file type. Only CSV, TSV, and DBF files are allowed.")
             
             elif type_file == 'dbf':
+                from simpledbf import Dbf5
+
                 with tempfile.NamedTemporaryFile(delete=False, suffix='.dbf') as tmp:
                     for chunk in file.chunks():
                         tmp.write(chunk)
@@ -233,6 +300,8 @@ class LayerSerializerCsv(serializers.ModelSerializer):
                 else:
                     raise serializers.ValidationError("Unsupported file type. Only CSV and TSV files are allowed.")
 
+                import pandas as pd
+
                 df = pd.read_csv(file, sep=sep, encoding='utf-8')
 
             print(df.columns)
@@ -252,6 +321,7 @@ class LayerSerializerCsv(serializers.ModelSerializer):
 
             with transaction.atomic():
                 Layer.objects.bulk_create(objs, batch_size=1000)
+            stats.refresh([source], imported=True)
 
         else:
             raise serializers.ValidationError("No file uploaded.")
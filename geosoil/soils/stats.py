@@ -0,0 +1,119 @@
+"""Per-source statistics (:class:`~soils.models.SourceStats`).
+
+The importers, the purges and the remote-sensing fetch commands recompute
+the statistics of the sources they touched, with one grouped query per
+statistic. The map and the admin only read the table
+(``/api/sources/stats``).
+"""
+from __future__ import annotations
+
+from typing import Iterable, List, Optional
+
+from asgiref.sync import sync_to_async
+from django.contrib.gis.db.models import Extent
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .models import Layer, RemoteSensingFeature, SoilProfile, Source, SourceStats
+
+
+def _source_ids(sources) -> List[int]:
+    """Ids of ``sources``: ``Source`` objects, names, ids or a queryset (``None``: all)."""
+    if sources is None:
+        return list(Source.objects.values_list("pk", flat=True))
+    if hasattr(sources, "values_list"):
+        return list(sources.values_list("pk", flat=True))
+    ids, names = [], []
+    for s in sources:
+        if isinstance(s, Source):
+            ids.append(s.pk)
+        elif isinstance(s, int):
+            ids.append(s)
+        else:
+            names.append(s)
+    if names:
+        ids += Source.objects.filter(name__in=names).values_list("pk", flat=True)
+    return ids
+
+
+def refresh(sources: Optional[Iterable] = None, imported: bool = False) -> List[SourceStats]:
+    """Recompute the statistics of ``sources``; ``imported`` stamps a new import."""
+    ids = _source_ids(sources)
+    if not ids:
+        return []
+    profiles = {
+        row["source"]: row
+        for row in SoilProfile.objects.filter(source__in=ids).values("source")
+        .annotate(n=Count("pk"), extent=Extent("location"), at=Max("created_at"))
+    }
+    layers = {
+        row["profile__source"]: row
+        for row in Layer.objects.filter(profile__source__in=ids).values("profile__source")
+        .annotate(n=Count("pk"), at=Max("updated_at"))
+    }
+    coverage = {}
+    for row in (RemoteSensingFeature.objects.filter(profile__source__in=ids)
+                .values("profile__source", "sensor")
+                .annotate(n=Count("profile", distinct=True), at=Max("updated_at"))):
+        coverage.setdefault(row["profile__source"], {})[row["sensor"]] = {
+            "profiles": row["n"],
+            "updated_at": row["at"].isoformat() if row["at"] else None,
+        }
+    previous = dict(SourceStats.objects.filter(source__in=ids).values_list("source", "imported_at"))
+
+    now = timezone.now()
+    objs = []
+    for pk in ids:
+        p, l = profiles.get(pk, {}), layers.get(pk, {})
+        stamps = [at for at in (p.get("at"), l.get("at")) if at is not None]
+        objs.append(SourceStats(
+            source_id=pk,
+            profile_count=p.get("n", 0),
+            layer_count=l.get("n", 0),
+            bbox=list(p["extent"]) if p.get("extent") else None,
+            coverage=coverage.get(pk, {}),
+            imported_at=now if imported else previous.get(pk) or (max(stamps) if stamps else None),
+        ))
+    return SourceStats.objects.bulk_create(
+        objs,
+        update_conflicts=True,
+        update_fields=["profile_count", "layer_count", "bbox", "coverage", "imported_at", "refreshed_at"],
+        unique_fields=["source"],
+    )
+
+
+def _summary(rows) -> dict:
+    sources = []
+    bbox = None
+    for st in rows:
+        sources.append({
+            "name": st.source.name,
+            "profile_count": st.profile_count,
+            "layer_count": st.layer_count,
+            "bbox": st.bbox,
+            "coverage": st.coverage,
+            "imported_at": st.imported_at,
+            "refreshed_at": st.refreshed_at,
+        })
+        if st.bbox:
+            bbox = st.bbox if bbox is None else [
+                min(bbox[0], st.bbox[0]), min(bbox[1], st.bbox[1]),
+                max(bbox[2], st.bbox[2]), max(bbox[3], st.bbox[3]),
+            ]
+    return {"sources": sources, "bbox": bbox}
+
+
+def summary() -> dict:
+    """Statistics of every source and the extent of all of them (map legend and initial view)."""
+    missing = Source.objects.filter(stats__isnull=True)
+    if missing.exists():
+        refresh(missing)
+    return _summary(SourceStats.objects.select_related("source").order_by("source__name"))
+
+
+async def asummary() -> dict:
+    """:func:`summary` with the async ORM."""
+    missing = Source.objects.filter(stats__isnull=True)
+    if await missing.aexists():
+        await sync_to_async(refresh)(missing)
+    return _summary([st async for st in SourceStats.objects.select_related("source").order_by("source__name")])
@@ -1,3 +1,645 @@
-from django.test import TestCase
+import datetime as dt
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+from datetime import date
+from importlib import import_module
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+from django.contrib.gis.geos import Point
+from django.db import IntegrityError, connection, transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from soils import features, pivot, prediction, purge, registry
+from soils.models import (
+    Layer,
+    LayerProperty,
+    ProfileProperty,
+    Property,
+    PurgeJob,
+    RemoteSensingFeature,
+    SamplingAttempt,
+    SocModelVersion,
+    SoilProfile,
+    Source,
+    Zone,
+    typed_value,
+)
 
 # Create your tests here.
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+# loaded on first use only (importers, tiles, training, explanations)
+HEAVY_MODULES = ("pandas", "pyproj", "dbfread", "simpledbf", "rasterio", "torch", "shap", "sklearn", "ee")
+# total self time of every module imported by django.setup() + the URLconf
+IMPORT_BUDGET_MS = int(os.getenv("GEOSOIL_IMPORT_BUDGET_MS", "1500"))
+
+
+def import_times(code):
+    """``{module: self time in µs}`` of a fresh interpreter running ``code`` (``python -X importtime``)."""
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE="geosoil.settings")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=PROJECT_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(self_us)
+    return times
+
+
+class ImportTimeTests(SimpleTestCase):
+    """What a gunicorn worker / ``manage.py`` pays before serving a request."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.times = import_times("import django; django.setup(); import geosoil.urls")
+
+    def test_heavy_modules_are_lazy(self):
+        loaded = sorted({name.split(".")[0] for name in self.times} & set(HEAVY_MODULES))
+        self.assertEqual(loaded, [], "imported at startup: %s" % ", ".join(loaded))
+
+    def test_import_time_budget(self):
+        total_ms = sum(self.times.values()) / 1000
+        slowest = sorted(self.times.items(), key=lambda kv: kv[1], reverse=True)[:10]
+        self.assertLess(
+            total_ms, IMPORT_BUDGET_MS,
+            "startup imports took %.0f ms (budget %d ms), slowest: %s"
+            % (total_ms, IMPORT_BUDGET_MS, ", ".join("%s %.0f ms" % (n, t / 1000) for n, t in slowest)),
+        )
+
+
+class DepthHarmonizationTests(SimpleTestCase):
+    """Equal-area spline and overlap means (``soils.depth``) on hand-checked profiles."""
+
+    def harmonize(self, layers, intervals, method, **kwargs):
+        """``layers``: ``[(profile, top, bottom, value)]`` sorted by profile then top."""
+        from soils.depth import harmonize
+
+        pids, top, bottom, y = zip(*layers)
+        return harmonize(pids, top, bottom, y, method, intervals, **kwargs)
+
+    def test_single_horizon(self):
+        for method in ("spline", "overlap"):
+            _, values = self.harmonize([(1, 0, 30, 5.0)], [(0, 10), (10, 30)], method)
+            np.testing.assert_allclose(values, [[5.0, 5.0]])
+
+    def test_spline_two_horizons(self):
+        # mpspline, lambda 0.1: (I + Z) sbar = y gives sbar = (27/26, 77/26)
+        _, values = self.harmonize(
+            [(1, 0, 10, 1.0), (1, 10, 30, 3.0)], [(0, 10), (10, 30), (0, 30), (5, 15)], "spline", lam=0.1
+        )
+        np.testing.assert_allclose(values, [[27 / 26, 77 / 26, 1810 / 780, 707 / 416]], rtol=1e-9)
+
+    def test_spline_gapped_profile(self):
+        # lambda 0: horizon means are kept, the 10-20 gap is the linear segment 2.4 -> 3.6
+        _, values = self.harmonize(
+            [(1, 0, 10, 2.0), (1, 20, 30, 4.0)], [(0, 10), (20, 30), (10, 20), (0, 30)], "spline", lam=0.0
+        )
+        np.testing.assert_allclose(values, [[2.0, 4.0, 3.0, 3.0]], atol=1e-9)
+
+    def test_overlap_means(self):
+        profile_ids, values = self.harmonize(
+            [(1, 0, 10, 1.0), (1, 10, 30, 3.0), (2, 5, 30, 2.0)], [(0, 10), (0, 30), (5, 15)], "overlap"
+        )
+        self.assertEqual(profile_ids.tolist(), [1, 2])
+        np.testing.assert_allclose(values, [[1.0, 70 / 30, 2.0], [np.nan, np.nan, 2.0]])
+
+    def test_overlap_extensive(self):
+        # a stock of 10 over 0-20 cm: 5 over 0-10 cm
+        _, values = self.harmonize([(1, 0, 20, 10.0)], [(0, 10)], "overlap", extensive=True)
+        np.testing.assert_allclose(values, [[5.0]])
+
+    def test_uncovered_interval_is_nan(self):
+        for method in ("spline", "overlap"):
+            _, values = self.harmonize([(1, 5, 30, 2.0)], [(0, 10), (10, 30), (20, 40)], method)
+            self.assertTrue(np.isnan(values[0, 0]), method)
+            self.assertAlmostEqual(values[0, 1], 2.0)
+            self.assertTrue(np.isnan(values[0, 2]), method)
+
+
+# EAV strings and what typed_value() / the 0011 backfill make of them
+TYPED_VALUES = {
+    "12": (12.0, None),
+    "1,5": (1.5, None),
+    " -,5 ": (-0.5, None),
+    "2.5e3": (2500.0, None),
+    "-1,25E-2": (-0.0125, None),
+    "1e308": (1e308, None),
+    "0e400": (0.0, None),
+    # out of the double precision range: overflow / underflow
+    "1e400": (None, None),
+    "-1e400": (None, None),
+    "1e-400": (None, None),
+    "1e5000": (None, None),
+    "2023-02-28": (None, date(2023, 2, 28)),
+    "2023-02-30": (None, None),
+    "1,5,6": (None, None),
+    "sableux": (None, None),
+    "": (None, None),
+}
+
+
+def make_profile(code, **fields):
+    return SoilProfile.objects.create(profile_id=code, code=code, location=Point(0, 0, srid=4326), **fields)
+
+
+def add_property(profile, name, value):
+    prop, _ = Property.objects.get_or_create(name=name, defaults={"value": ""})
+    return ProfileProperty.objects.create(profile=profile, property=prop, name=name, value=value)
+
+
+class TypedValueTests(SimpleTestCase):
+    def test_typed_value(self):
+        for value, expected in TYPED_VALUES.items():
+            with self.subTest(value=value):
+                self.assertEqual(typed_value(value), expected)
+
+
+class TypedValueBackfillTests(TestCase):
+    """The SQL of migration 0011 parses numbers like :func:`typed_value`, without aborting."""
+
+    def test_backfill_matches_typed_value(self):
+        migration = import_module("soils.migrations.0011_typed_property_values")
+        profile = make_profile("backfill")
+        values = list(TYPED_VALUES)
+        properties = Property.objects.bulk_create([Property(name=f"p{i}", value="") for i in range(len(values))])
+        # bulk_create skips save(): value_num stays NULL, as before the migration
+        ProfileProperty.objects.bulk_create([
+            ProfileProperty(profile=profile, property=prop, name=prop.name, value=value)
+            for prop, value in zip(properties, values)
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute(migration.backfill_numbers(ProfileProperty._meta.db_table).sql)
+
+        stored = dict(ProfileProperty.objects.values_list("value", "value_num"))
+        for value in values:
+            with self.subTest(value=value):
+                self.assertEqual(stored[value], typed_value(value)[0])
+
+
+class PivotRefreshTests(TestCase):
+    """An incremental refresh ends with the same rows as a full one."""
+
+    def set_property(self, profile, prop, value):
+        row, _ = ProfileProperty.objects.get_or_create(
+            profile=profile, property=prop, defaults={"name": prop.name, "value": value}
+        )
+        row.value = value
+        row.save()
+
+    def test_incremental_matches_full(self):
+        ph = Property.objects.create(name="ph", value="")
+        texture = Property.objects.create(name="texture", value="")
+        first, second = make_profile("pivot-1"), make_profile("pivot-2")
+        self.set_property(first, ph, "5,5")
+        self.set_property(first, texture, "argileux")
+        self.set_property(second, ph, "7")
+        ps = pivot.create("roundtrip", Property.PF, ["ph", "texture"])
+        self.assertEqual([c["type"] for c in ps.columns], ["num", "text"])
+
+        self.set_property(first, ph, "6,5")
+        self.set_property(second, texture, "sableux")
+        third = make_profile("pivot-3")
+        self.set_property(third, ph, "8")
+        self.assertTrue(pivot.is_stale(ps))
+        self.assertEqual(pivot.refresh(ps), 3)
+        header, incremental = pivot.read(ps, refresh_if_stale=False)
+
+        self.assertEqual(header, ["profile_id", "ph", "texture"])
+        self.assertEqual(incremental, [
+            (first.pk, 6.5, "argileux"), (second.pk, 7.0, "sableux"), (third.pk, 8.0, None),
+        ])
+        pivot.refresh(ps, full=True)
+        self.assertEqual(pivot.read(ps, refresh_if_stale=False)[1], incremental)
+
+
+def make_version(version, role=SocModelVersion.CANDIDATE):
+    return SocModelVersion.objects.create(version=version, directory=f"/registry/{version}", role=role)
+
+
+class ModelRegistryTests(TestCase):
+    """Roles of the SOC model versions: one live, one shadow, rollback to the previous live."""
+
+    def role(self, version):
+        return SocModelVersion.objects.get(version=version).role
+
+    def test_promote_then_rollback(self):
+        for version in ("aaa1", "bbb2", "ccc3"):
+            make_version(version)
+        registry.promote("aaa1")
+        registry.promote("bbb2")
+        self.assertEqual(self.role("aaa1"), SocModelVersion.RETIRED)
+        registry.promote("ccc3")
+        self.assertEqual(registry.live_version().version, "ccc3")
+
+        # the most recently retired first, then back and forth
+        self.assertEqual(registry.rollback().version, "bbb2")
+        self.assertEqual(self.role("ccc3"), SocModelVersion.RETIRED)
+        self.assertEqual(registry.rollback().version, "ccc3")
+        self.assertEqual(registry.rollback().version, "bbb2")
+        self.assertEqual(
+            list(SocModelVersion.objects.filter(role=SocModelVersion.LIVE).values_list("version", flat=True)),
+            ["bbb2"],
+        )
+
+    def test_rollback_without_previous_version(self):
+        make_version("aaa1")
+        with self.assertRaises(SocModelVersion.DoesNotExist):
+            registry.rollback()
+        registry.promote("aaa1")
+        with self.assertRaises(SocModelVersion.DoesNotExist):
+            registry.rollback()
+
+    def test_version_prefix(self):
+        make_version("aaa1")
+        make_version("aab2")
+        self.assertEqual(registry.promote("aab").version, "aab2")
+        with self.assertRaises(SocModelVersion.DoesNotExist):
+            registry.promote("aa")
+        with self.assertRaises(SocModelVersion.DoesNotExist):
+            registry.promote("zzz")
+
+    def test_shadow_to_live(self):
+        make_version("aaa1")
+        make_version("bbb2")
+        make_version("ccc3")
+        registry.promote("aaa1")
+        with self.assertRaises(ValueError):
+            registry.set_shadow("aaa1")
+
+        registry.set_shadow("bbb2")
+        registry.set_shadow("ccc3")
+        # one shadow at a time: the previous one is a candidate again
+        self.assertEqual(self.role("bbb2"), SocModelVersion.CANDIDATE)
+        self.assertEqual(registry.shadow_version().version, "ccc3")
+
+        registry.promote("ccc3")
+        self.assertEqual(registry.live_version().version, "ccc3")
+        self.assertIsNone(registry.shadow_version())
+        self.assertEqual(self.role("aaa1"), SocModelVersion.RETIRED)
+        self.assertEqual(registry.rollback().version, "aaa1")
+
+        registry.set_shadow("bbb2")
+        self.assertIsNone(registry.set_shadow(None))
+        self.assertEqual(self.role("bbb2"), SocModelVersion.CANDIDATE)
+
+    def test_single_live_and_shadow(self):
+        make_version("aaa1", SocModelVersion.LIVE)
+        make_version("bbb2", SocModelVersion.SHADOW)
+        for role in (SocModelVersion.LIVE, SocModelVersion.SHADOW):
+            with self.subTest(role=role), self.assertRaises(IntegrityError), transaction.atomic():
+                make_version(f"{role}-2", role)
+        # any number of candidates and retired versions
+        for version in ("ccc3", "ddd4"):
+            make_version(version)
+            make_version(f"{version}-r", SocModelVersion.RETIRED)
+
+
+class FakePredictor:
+    """Stands in for :class:`~soils.prediction.SocPredictor`; the version is the directory name."""
+
+    loads = []
+
+    def __init__(self, directory):
+        if "broken" in str(directory):
+            raise ValueError(f"cannot load {directory}")
+        self.directory = str(directory)
+        self.version = os.path.basename(self.directory)
+        self.loads.append(self.version)
+
+
+@override_settings(SOC_MODEL_CHECK_SECONDS=0, SOC_MODEL_CACHE_SIZE=3)
+class PredictorSwapTests(TestCase):
+    """Workers keep serving the current version until the promoted one is loaded."""
+
+    def setUp(self):
+        FakePredictor.loads = []
+        patches = [
+            mock.patch.object(prediction, "SocPredictor", FakePredictor),
+            mock.patch.multiple(prediction, _live=None, _loaded=OrderedDict(), _checked_at=0.0, _swapping=None),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def wait_for_swap(self):
+        deadline = time.monotonic() + 5
+        while prediction._swapping is not None:
+            self.assertLess(time.monotonic(), deadline, "swap thread did not finish")
+            time.sleep(0.01)
+
+    def test_promote_swaps_the_live_predictor(self):
+        make_version("aaa1")
+        make_version("bbb2")
+        registry.promote("aaa1")
+        self.assertEqual(prediction.get_predictor().version, "aaa1")
+
+        registry.set_shadow("bbb2")
+        self.assertEqual(prediction.get_predictor().version, "aaa1")
+        # the shadow is loaded on demand, next to the live one
+        self.assertEqual(prediction.get_predictor("bbb2").version, "bbb2")
+
+        registry.promote("bbb2")
+        prediction.get_predictor()
+        self.wait_for_swap()
+        self.assertEqual(prediction.get_predictor().version, "bbb2")
+
+        registry.rollback()
+        prediction.get_predictor()
+        self.wait_for_swap()
+        self.assertEqual(prediction.get_predictor().version, "aaa1")
+        # both versions stayed in the per-process cache
+        self.assertEqual(FakePredictor.loads, ["aaa1", "bbb2"])
+
+    def test_failed_load_keeps_the_current_version(self):
+        make_version("aaa1")
+        make_version("broken")
+        registry.promote("aaa1")
+        self.assertEqual(prediction.get_predictor().version, "aaa1")
+
+        registry.promote("broken")
+        with self.assertLogs("soils.prediction", "ERROR"):
+            prediction.get_predictor()
+            self.wait_for_swap()
+        self.assertEqual(prediction.get_predictor().version, "aaa1")
+
+    def test_unknown_version(self):
+        make_version("aaa1", SocModelVersion.LIVE)
+        with self.assertRaises(KeyError):
+            prediction.get_predictor("zzz9")
+
+
+class SearchFeatureSetsTests(TestCase):
+    """Profile attributes of ``search_soc_models`` are columns of the training data, not store bands."""
+
+    def test_attributes_are_appended_once(self):
+        from soils.search import FEATURE_SETS, candidate_sets
+        from soils.training import load_training_data
+
+        feature_sets, features = candidate_sets(["landsat", "sentinel"], ["Texture"])
+        self.assertEqual(features, FEATURE_SETS["landsat"] + FEATURE_SETS["sentinel"])
+        self.assertEqual(feature_sets["other"], features + ["Texture"])
+
+        profile = make_profile("search")
+        RemoteSensingFeature.objects.create(profile=profile, sensor="L8", band="SR_B1", value=0.25)
+        add_property(profile, "SOC_10", "1,2")
+        add_property(profile, "Texture", "argileux")
+        data = load_training_data(features, ("SOC_10",), "Site", ["Texture"])
+
+        self.assertEqual(data.features, features + ["Texture"])
+        self.assertEqual(data.X.shape, (1, len(features) + 1))
+        columns = [data.features.index(f) for f in feature_sets["other"]]
+        row = data.X[0, columns]
+        self.assertEqual(row[0], 0.25)
+        # a text attribute is ordinal-coded
+        self.assertEqual(row[-1], 0.0)
+
+    def test_folds_keep_the_rows_of_the_feature_set(self):
+        import json
+
+        from soils import training
+        from soils.search import FEATURE_SETS, prepare_folds
+        from soils.training import TrainCfg, TrainingData
+
+        landsat, sentinel = FEATURE_SETS["landsat"], FEATURE_SETS["sentinel"]
+        X = np.full((6, len(landsat) + len(sentinel)), np.nan)
+        X[:3, 0] = [0.1, 0.2, 0.3]  # SR_B1
+        X[3:, len(landsat)] = [0.4, 0.5, 0.6]  # B1
+        data = TrainingData(
+            np.arange(1, 7), X, {"SOC_10": np.arange(1.0, 7.0)}, np.array(list("abcdef")), landsat + sentinel,
+        )
+        with tempfile.TemporaryDirectory() as tmp, override_settings(SOC_TRAINING_CACHE_DIR=tmp), \
+                mock.patch.object(training, "_memory", None):
+            out = prepare_folds(data, "SOC_10", TrainCfg(n_splits=3), tmp, landsat)
+            with open(os.path.join(out, "meta.json")) as fh:
+                meta = json.load(fh)
+            X_tr = np.load(os.path.join(out, "fold0_X_tr.npy"))
+            y = np.load(os.path.join(out, "y.npy"))
+            self.assertNotEqual(out, prepare_folds(data, "SOC_10", TrainCfg(n_splits=3), tmp, sentinel))
+
+        self.assertEqual((meta["features"], meta["rows"]), (landsat, 3))
+        self.assertEqual(X_tr.shape, (2, len(landsat)))
+        self.assertEqual(sorted(y.tolist()), [1.0, 2.0, 3.0])
+
+
+class TrainingBundleTests(SimpleTestCase):
+    def test_attributes_are_refused(self):
+        from soils.training import TrainCfg, TrainingData, train_soc_models
+
+        data = TrainingData(
+            np.array([1]), np.zeros((1, 2)), {"SOC_10": np.ones(1), "SOC_30": np.ones(1)},
+            np.array(["a"]), ["SR_B1", "Texture"],
+        )
+        with self.assertRaisesRegex(ValueError, "Texture"):
+            train_soc_models(data, TrainCfg(), TrainCfg())
+
+
+class PointsCacheKeyTests(SimpleTestCase):
+    def test_key_is_memcached_safe(self):
+        import warnings
+
+        from django.core.cache.backends.base import BaseCache
+
+        from soils.points import cache_key
+
+        at = dt.datetime(2026, 5, 1, 12, 30, tzinfo=dt.timezone.utc)
+        key = cache_key("soc10", "v 1", {"at": at, "n": 3})
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            BaseCache({}).validate_key(key)
+        self.assertNotEqual(key, cache_key("soc10", "v 1", {"at": at, "n": 4}))
+        self.assertNotEqual(key, cache_key("soc30", "v 1", {"at": at, "n": 3}))
+
+
+class LoadZonesTests(TestCase):
+    """Features sharing a name in one file (zones_villages.shp) do not break the upsert."""
+
+    def load(self, *args):
+        import io
+        import json
+
+        from django.core.management import call_command
+
+        def square(x):
+            return {"type": "Polygon", "coordinates": [[[x, 0], [x + 1, 0], [x + 1, 1], [x, 1], [x, 0]]]}
+
+        collection = {
+            "type": "FeatureCollection",
+            "features": [
+                {"type": "Feature", "properties": {"name": name}, "geometry": square(x)}
+                for x, name in ((0, "Ndiaye"), (2, "Ndiaye"), (4, "Keur"))
+            ],
+        }
+        out = io.StringIO()
+        with tempfile.NamedTemporaryFile("w", suffix=".geojson") as fh:
+            json.dump(collection, fh)
+            fh.flush()
+            call_command("load_zones", fh.name, "--name-field", "name", "--kind", "test", *args, stdout=out)
+        return out.getvalue()
+
+    def test_duplicates_are_merged(self):
+        self.assertIn("1 entités", self.load())
+        zones = dict(Zone.objects.filter(kind="test").values_list("name", "geometry"))
+        self.assertEqual(sorted(zones), ["Keur", "Ndiaye"])
+        self.assertEqual(len(zones["Ndiaye"]), 2)
+        self.assertAlmostEqual(zones["Ndiaye"].area, 2.0)
+        # a second load upserts the same zones
+        self.load()
+        self.assertEqual(Zone.objects.filter(kind="test").count(), 2)
+
+    def test_duplicates_are_suffixed(self):
+        self.load("--duplicates", "suffix")
+        self.assertEqual(
+            sorted(Zone.objects.filter(kind="test").values_list("name", flat=True)),
+            ["Keur", "Ndiaye", "Ndiaye (2)"],
+        )
+
+
+class PurgeTests(TestCase):
+    """Chunked, set-based purges (``soils.purge``) and the takeover of stale jobs."""
+
+    def setUp(self):
+        self.ird, self.wosis = Source.objects.create(name="IRD"), Source.objects.create(name="WOSIS")
+        for source, n in ((self.ird, 3), (self.wosis, 1)):
+            for i in range(n):
+                profile = make_profile(f"{source.name}-{i}", source=source)
+                layer = Layer.objects.create(profile=profile, name="A", depth_top=0, depth_bottom=10)
+                LayerProperty.objects.create(layer=layer, name="SOC", value="1,5")
+                add_property(profile, "Site", source.name)
+                RemoteSensingFeature.objects.create(profile=profile, sensor="L8", band="SR_B1", value=0.1)
+
+    def counts(self, source):
+        return (
+            SoilProfile.objects.filter(source=source).count(),
+            Layer.objects.filter(profile__source=source).count(),
+            LayerProperty.objects.filter(layer__profile__source=source).count(),
+            ProfileProperty.objects.filter(profile__source=source).count(),
+            RemoteSensingFeature.objects.filter(profile__source=source).count(),
+        )
+
+    def test_source_purge_in_chunks(self):
+        job, created = purge.submit(self.ird, chunk_size=2)
+        self.assertTrue(created)
+        with mock.patch.object(purge, "delete_where", wraps=purge.delete_where) as delete_where:
+            job = purge.run(job)
+        self.assertEqual((job.status, job.total, job.deleted), (PurgeJob.DONE, 3, 3))
+        self.assertIsNotNone(job.heartbeat_at)
+        # per chunk of profiles, one DELETE per table of the cascade, children before parents
+        cascade = purge.cascade_tables(SoilProfile)
+        self.assertEqual(delete_where.call_count, 2 * len(cascade))
+        tables = [c.args[1]._meta.db_table for c in delete_where.call_args_list[:len(cascade)]]
+        self.assertEqual(sorted(tables), sorted(cascade))
+        self.assertLess(tables.index(LayerProperty._meta.db_table), tables.index(Layer._meta.db_table))
+        self.assertEqual(tables[-1], SoilProfile._meta.db_table)
+        self.assertEqual(self.counts(self.ird), (0, 0, 0, 0, 0))
+        self.assertEqual(self.counts(self.wosis), (1, 1, 1, 1, 1))
+
+    def test_layers_scope_keeps_profiles(self):
+        purge.run(purge.submit(self.ird, PurgeJob.LAYERS)[0])
+        self.assertEqual(self.counts(self.ird), (3, 0, 0, 3, 3))
+        self.assertEqual(self.counts(self.wosis), (1, 1, 1, 1, 1))
+
+    def test_every_source_is_truncated(self):
+        # TRUNCATE refuses tables with pending (deferred) FK checks in the test transaction
+        with connection.cursor() as cursor:
+            cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        with mock.patch.object(purge, "delete_where") as delete_where:
+            job = purge.run(purge.submit(None)[0])
+        delete_where.assert_not_called()
+        self.assertEqual((job.status, job.deleted), (PurgeJob.DONE, 4))
+        self.assertFalse(SoilProfile.objects.exists())
+        self.assertFalse(LayerProperty.objects.exists())
+        self.assertEqual(Source.objects.count(), 2)
+
+    def test_resumed_job_keeps_its_progress(self):
+        job = PurgeJob.objects.create(source=self.ird, status=PurgeJob.FAILED, deleted=1, chunk_size=2)
+        job = purge.run(job)
+        self.assertEqual((job.status, job.total, job.deleted), (PurgeJob.DONE, 4, 4))
+
+    @override_settings(PURGE_STALE_SECONDS=600)
+    def test_stale_job_is_taken_over(self):
+        from django.utils import timezone
+
+        job, _ = purge.submit(self.ird)
+        PurgeJob.objects.filter(pk=job.pk).update(status=PurgeJob.RUNNING, heartbeat_at=timezone.now())
+        # still beating: returned as is, not started again
+        same, created = purge.submit(self.ird)
+        self.assertEqual((same.pk, created), (job.pk, False))
+
+        silent = timezone.now() - dt.timedelta(seconds=601)
+        PurgeJob.objects.filter(pk=job.pk).update(heartbeat_at=silent)
+        first, second = PurgeJob.objects.get(pk=job.pk), PurgeJob.objects.get(pk=job.pk)
+        self.assertTrue(purge.is_stale(first))
+        self.assertTrue(purge.reclaim(first))
+        # a second process read the same stale state: it loses the race
+        self.assertFalse(purge.reclaim(second))
+        self.assertEqual(PurgeJob.objects.get(pk=job.pk).status, PurgeJob.PENDING)
+
+        PurgeJob.objects.filter(pk=job.pk).update(status=PurgeJob.RUNNING, heartbeat_at=silent)
+        taken, created = purge.submit(self.ird)
+        self.assertEqual((taken.pk, created, taken.status), (job.pk, True, PurgeJob.PENDING))
+        self.assertEqual(PurgeJob.objects.filter(source=self.ird).count(), 1)
+
+
+class SamplingBackoffTests(TestCase):
+    """Windows that came back empty are retried after a doubling delay (``SamplingAttempt``)."""
+
+    def setUp(self):
+        self.profile = make_profile("backoff")
+        self.profiles = SoilProfile.objects.filter(pk=self.profile.pk)
+        self.window = (date(2025, 1, 1), date(2025, 2, 1))
+
+    def sample(self, values=None):
+        """Request the missing windows; ``values`` is what Earth Engine returns for each."""
+        todo = features.missing_windows(self.profiles, ["S1"], [self.window])
+        rows = []
+        if values is not None:
+            for a, b in todo[self.profile.pk]["S1"]:
+                rows += features.build_features(self.profile.pk, "S1", a, b, values)
+        features.save_features(rows)
+        features.record_attempts(todo, rows)
+        return todo[self.profile.pk]["S1"]
+
+    def test_empty_window_backs_off(self):
+        from django.utils import timezone
+
+        self.assertEqual(self.sample(), [self.window])
+        attempt = SamplingAttempt.objects.get(profile=self.profile)
+        self.assertEqual(attempt.failures, 1)
+        self.assertAlmostEqual(
+            (attempt.retry_at - timezone.now()).total_seconds(), features.RETRY_BASE.total_seconds(), delta=60
+        )
+        # waiting: neither requested again nor missing, unless asked to retry
+        self.assertEqual(self.sample(), [])
+        self.assertEqual(
+            features.waiting_windows(self.profiles, ["S1"], [self.window]), {(self.profile.pk, "S1", *self.window)}
+        )
+        retry = features.missing_windows(self.profiles, ["S1"], [self.window], retry_waiting=True)
+        self.assertEqual(retry[self.profile.pk]["S1"], [self.window])
+
+        # each new failure doubles the delay, up to RETRY_MAX
+        for failures, days in ((2, 2), (3, 4), (8, 64), (30, 64)):
+            SamplingAttempt.objects.filter(pk=attempt.pk).update(retry_at=timezone.now(), failures=failures - 1)
+            self.assertEqual(self.sample(), [self.window])
+            attempt.refresh_from_db()
+            self.assertEqual(attempt.failures, failures)
+            self.assertAlmostEqual((attempt.retry_at - timezone.now()).total_seconds(), days * 86400, delta=60)
+
+    def test_window_with_data_clears_the_attempt(self):
+        from django.utils import timezone
+
+        self.sample()
+        SamplingAttempt.objects.update(retry_at=timezone.now())
+        self.assertEqual(self.sample({"VV": -12.0, "VH": -18.0}), [self.window])
+        self.assertFalse(SamplingAttempt.objects.exists())
+        self.assertEqual(self.sample(), [])
@@ -0,0 +1,199 @@
+"""XYZ tiles and colour breaks for the SOC rasters written by ``build_soc_rasters``.
+
+A tile only reads the window it covers, at the overview level matching the
+zoom (decimated read through a Web Mercator :class:`WarpedVRT`), colours it
+with the map palette and encodes it as PNG or WebP. Tiles are files under
+``SOC_TILE_DIR/<layer>/<raster mtime>/``, so a regenerated map is never served
+from stale entries and the previous version's directory is simply removed;
+stats go to the ``tiles`` cache.
+
+rasterio is imported on the first tile, not when the URLconf loads this module.
+"""
+from __future__ import annotations
+
+import io
+import os
+import shutil
+import threading
+from typing import Dict, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import caches
+
+from .prediction import OUTPUTS
+
+TILE_SIZE = 256
+# half the width of the EPSG:3857 world
+ORIGIN = 20037508.342789244
+# pixels read to compute the quantile breaks (from the overviews)
+STATS_PIXELS = 1024 * 1024
+# 6 classes, same palette as getColor() in map.html
+PALETTE = np.array([
+    (0xf7, 0xfc, 0xf5), (0xc7, 0xe9, 0xc0), (0x74, 0xc4, 0x76),
+    (0x31, 0xa3, 0x54), (0x00, 0x6d, 0x2c), (0x00, 0x44, 0x1b),
+], dtype=np.uint8)
+FORMATS = {"png": ("PNG", "image/png"), "webp": ("WEBP", "image/webp")}
+
+_local = threading.local()
+# raster version whose tile directory this process has already pruned, per layer
+_tile_versions: Dict[str, str] = {}
+
+
+def raster_path(layer: str) -> str:
+    if layer not in OUTPUTS:
+        raise KeyError(layer)
+    return os.path.join(str(settings.SOC_RASTER_DIR), f"{layer}.tif")
+
+
+def _version(path: str) -> int:
+    return os.stat(path).st_mtime_ns
+
+
+def raster_version(layer: str) -> int:
+    """Changes whenever the raster is rewritten (cache key component)."""
+    return _version(raster_path(layer))
+
+
+def _datasets(path: str):
+    """``(src, vrt)`` kept open per thread until the file changes."""
+    import rasterio
+    from rasterio.enums import Resampling
+    from rasterio.vrt import WarpedVRT
+
+    opened: Dict[str, Tuple[int, object, WarpedVRT]] = _local.__dict__.setdefault("opened", {})
+    version = _version(path)
+    if path in opened and opened[path][0] == version:
+        return opened[path][1:]
+    if path in opened:
+        opened[path][2].close()
+        opened[path][1].close()
+    src = rasterio.open(path)
+    vrt = WarpedVRT(src, crs="EPSG:3857", resampling=Resampling.nearest, nodata=np.nan)
+    opened[path] = (version, src, vrt)
+    return src, vrt
+
+
+def tile_bounds(z: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """Web Mercator bounds of an XYZ tile."""
+    size = 2 * ORIGIN / 2 ** z
+    minx = -ORIGIN + x * size
+    maxy = ORIGIN - y * size
+    return minx, maxy - size, minx + size, maxy
+
+
+def read_tile(path: str, z: int, x: int, y: int) -> np.ndarray:
+    """``TILE_SIZE`` square float array, NaN outside the raster."""
+    from rasterio.enums import Resampling
+    from rasterio.errors import WindowError
+    from rasterio.windows import Window, from_bounds
+
+    _, vrt = _datasets(path)
+    data = np.full((TILE_SIZE, TILE_SIZE), np.nan, dtype=np.float32)
+    window = from_bounds(*tile_bounds(z, x, y), transform=vrt.transform)
+    try:
+        inside = window.intersection(Window(0, 0, vrt.width, vrt.height))
+    except WindowError:
+        return data
+
+    # where the readable part lands in the tile
+    sx, sy = TILE_SIZE / window.width, TILE_SIZE / window.height
+    col = int(round((inside.col_off - window.col_off) * sx))
+    row = int(round((inside.row_off - window.row_off) * sy))
+    width = min(int(round(inside.width * sx)), TILE_SIZE - col)
+    height = min(int(round(inside.height * sy)), TILE_SIZE - row)
+    if width <= 0 or height <= 0:
+        return data
+
+    # out_shape smaller than the window -> GDAL reads the matching overview
+    data[row:row + height, col:col + width] = vrt.read(
+        1, window=inside, out_shape=(height, width), resampling=Resampling.nearest
+    )
+    return data
+
+
+def colorize(data: np.ndarray, breaks) -> np.ndarray:
+    """RGBA array, transparent on nodata."""
+    classes = np.digitize(data, breaks, right=True)
+    rgba = np.zeros(data.shape + (4,), dtype=np.uint8)
+    rgba[..., :3] = PALETTE[np.clip(classes, 0, len(PALETTE) - 1)]
+    rgba[..., 3] = np.where(np.isnan(data), 0, 255)
+    return rgba
+
+
+def encode(rgba: np.ndarray, fmt: str) -> bytes:
+    from PIL import Image
+
+    buf = io.BytesIO()
+    Image.fromarray(rgba, "RGBA").save(buf, format=FORMATS[fmt][0])
+    return buf.getvalue()
+
+
+def raster_stats(layer: str) -> dict:
+    """Min/max, 5 quantile breaks and lon/lat bounds; computed once per file version."""
+    path = raster_path(layer)
+    cache = caches["tiles"]
+    key = f"soc-stats:{layer}:{_version(path)}"
+    stats = cache.get(key)
+    if stats is not None:
+        return stats
+
+    from rasterio.warp import transform_bounds
+
+    src, _ = _datasets(path)
+    # decimated read: served from the overviews, not the full-resolution band
+    factor = max(1.0, (src.width * src.height / STATS_PIXELS) ** 0.5)
+    shape = (max(1, int(src.height / factor)), max(1, int(src.width / factor)))
+    values = src.read(1, out_shape=shape, masked=True).astype(np.float64).filled(np.nan)
+    values = values[np.isfinite(values)]
+    if values.size:
+        breaks = np.quantile(values, [1 / 6, 2 / 6, 3 / 6, 4 / 6, 5 / 6]).tolist()
+        vmin, vmax = float(values.min()), float(values.max())
+    else:
+        breaks, vmin, vmax = [], None, None
+
+    stats = {
+        "layer": layer,
+        "min": vmin,
+        "max": vmax,
+        "breaks": breaks,
+        "colors": ["#%02x%02x%02x" % tuple(c) for c in PALETTE.tolist()],
+        "bounds": list(transform_bounds(src.crs, "EPSG:4326", *src.bounds)),
+        "model_version": src.tags().get("model_version"),
+    }
+    cache.set(key, stats)
+    return stats
+
+
+def tile_dir(layer: str, version: str) -> str:
+    """Tile directory of a raster version; the first call prunes the other versions."""
+    directory = os.path.join(str(settings.SOC_TILE_DIR), layer, version)
+    if _tile_versions.get(layer) != version:
+        parent = os.path.dirname(directory)
+        if os.path.isdir(parent):
+            for name in os.listdir(parent):
+                if name != version:
+                    shutil.rmtree(os.path.join(parent, name), ignore_errors=True)
+        _tile_versions[layer] = version
+    return directory
+
+
+def render_tile(layer: str, z: int, x: int, y: int, fmt: str = "png") -> Tuple[bytes, str]:
+    """Encoded tile (transparent outside the raster) and the raster version."""
+    path = raster_path(layer)
+    version = str(_version(path))
+    tile = os.path.join(tile_dir(layer, version), str(z), str(x), f"{y}.{fmt}")
+    try:
+        with open(tile, "rb") as fh:
+            return fh.read(), version
+    except FileNotFoundError:
+        pass
+
+    data = read_tile(path, z, x, y)
+    body = encode(colorize(data, raster_stats(layer)["breaks"]), fmt)
+    os.makedirs(os.path.dirname(tile), exist_ok=True)
+    tmp = f"{tile}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as fh:
+        fh.write(body)
+    os.replace(tmp, tile)
+    return body, version
@@ -0,0 +1,438 @@
+"""SOC model training, promoted from ``notebooks/train_mlp.ipynb``.
+
+The flow is the notebook's: GroupKFold out-of-fold models for SOC10, then for
+SOC30 with the SOC10 OOF prediction as an extra feature (to report honest
+metrics), then the final models trained on every row, SOC30 chained on the
+SOC10 prediction. The result is a bundle directory with
+``final_model_soc10.pkl``, ``final_model_soc30.pkl`` and ``metrics.json``,
+loadable by :class:`~soils.prediction.SocPredictor`.
+
+- The training frame is read from the feature store (:func:`load_training_data`),
+  targets and groups from the profile properties.
+- Fitted preprocessing (target transformer, per-fold imputer/scaler) is
+  cached on disk by :mod:`joblib.Memory`, keyed by a hash of the data.
+- Folds are trained in parallel spawned processes on CPU, each with a fixed
+  seed, so a run is reproducible for given data and configuration.
+
+This module is imported by the spawned workers, the Django models are
+imported lazily.
+"""
+from __future__ import annotations
+
+import datetime as dt
+import hashlib
+import json
+import math
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from multiprocessing import get_context
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import joblib
+import numpy as np
+import torch
+import torch.nn as nn
+from sklearn.impute import SimpleImputer
+from sklearn.metrics import mean_squared_error, r2_score
+from sklearn.model_selection import GroupKFold
+from sklearn.preprocessing import StandardScaler
+from torch.utils.data import DataLoader, Dataset
+
+from .ml import MLP, Log1pTransformer, YeoJohnsonTransformer, predict_ensemble
+from .prediction import SOC10_FEATURE, SOC10_FILE, SOC30_FILE, feature_column
+
+LANDSAT_BANDS = [f"SR_B{i}" for i in range(1, 8)]
+TARGET_10 = "SOC_10"
+TARGET_30 = "SOC_30"
+GROUP_PROPERTY = "Site"
+
+
+@dataclass
+class TrainCfg:
+    # Configuration des hyperparamètres d'entraînement
+    epochs: int = 500
+    batch_size: int = 128
+    lr: float = 1e-3
+    weight_decay: float = 1e-3
+    patience: int = 40
+    # epochs of the final model trained on every row (no early stopping)
+    final_epochs: int = 500
+    hidden: List[int] = field(default_factory=lambda: [256, 128, 64])
+    dropout: float = 0.25
+    transform: str = "yeo-johnson"
+    n_splits: int = 3
+    seed: int = 42
+
+
+@dataclass
+class TrainingData:
+    profile_ids: np.ndarray
+    X: np.ndarray
+    targets: Dict[str, np.ndarray]
+    groups: np.ndarray
+    features: List[str]
+
+    @property
+    def digest(self) -> str:
+        h = hashlib.sha256()
+        for arr in (self.profile_ids, self.X, *self.targets.values(), self.groups.astype(str)):
+            h.update(np.ascontiguousarray(arr).tobytes())
+        h.update(",".join(self.features).encode())
+        return h.hexdigest()[:12]
+
+
+@dataclass
+class LossTracker:
+    """Per-epoch losses of one fold (train, validation)."""
+    train: List[float] = field(default_factory=list)
+    val: List[float] = field(default_factory=list)
+
+
+class TrialPruned(Exception):
+    """Raised by ``train_one_fold`` when its ``prune`` callback asks to stop."""
+
+
+class TabDataset(Dataset):
+    """Dataset PyTorch pour les données tabulaires."""
+    def __init__(self, X, y, sample_weight=None):
+        self.X = torch.tensor(X, dtype=torch.float32)
+        self.y = torch.tensor(y, dtype=torch.float32).reshape(-1, 1)
+        self.w = None if sample_weight is None else torch.tensor(sample_weight, dtype=torch.float32).reshape(-1, 1)
+
+    def __len__(self): return self.X.size(0)
+    def __getitem__(self, idx):
+        if self.w is None:
+            return self.X[idx], self.y[idx]
+        return self.X[idx], self.y[idx], self.w[idx]
+
+
+def set_seed(seed: int) -> None:
+    random.seed(seed)
+    np.random.seed(seed)
+    torch.manual_seed(seed)
+
+
+def mse_loss(pred, target, weight=None):
+    if weight is None:
+        return nn.functional.mse_loss(pred, target)
+    return torch.mean(weight * (pred - target) ** 2)
+
+
+def site_sample_weights(sites: np.ndarray) -> np.ndarray:
+    _, inverse, counts = np.unique(sites, return_inverse=True, return_counts=True)
+    return 1.0 / counts[inverse]
+
+
+# ---------------------------------------------------------------------------
+# data
+
+def load_training_data(
+    features: Sequence[str],
+    target_properties: Sequence[str] = (TARGET_10, TARGET_30),
+    group_property: str = GROUP_PROPERTY,
+    attributes: Sequence[str] = (),
+    depth_method: Optional[str] = None,
+) -> TrainingData:
+    """Feature-store matrix of the profiles that have at least one target.
+
+    Targets are read from the profile properties, or with ``depth_method``
+    from the layers harmonised by :mod:`soils.depth` (``harmonize_layers``)
+    over each target's interval. The group falls back to the profile's
+    source name when the ``group_property`` is missing.
+    ``attributes`` are extra profile properties appended as columns (the
+    notebook's ``OTHER``), numeric or ordinal-coded when they are not. They
+    are for the hyperparameter search: :func:`train_soc_models` refuses
+    them, the served model has no attribute inputs.
+    """
+    from .features import feature_matrix
+    from .models import ProfileProperty, SoilProfile
+
+    wanted = set(target_properties) | {group_property} | set(attributes)
+    props: Dict[int, Dict[str, str]] = {}
+    numbers: Dict[Tuple[int, str], float] = {}
+    rows = ProfileProperty.objects.filter(name__in=wanted).values_list("profile_id", "name", "value", "value_num")
+    for pk, name, value, number in rows:
+        props.setdefault(pk, {})[name] = value
+        if number is not None:
+            numbers[pk, name] = number
+
+    def number(pk, name):
+        return numbers.get((pk, name), np.nan)
+
+    if depth_method:
+        from .depth import DEPTH_TARGETS
+        from .models import HarmonizedValue
+
+        intervals = {t: DEPTH_TARGETS[t] for t in target_properties}
+        labelled = sorted(set(
+            HarmonizedValue.objects.filter(method=depth_method, value__isnull=False)
+            .values_list("profile_id", flat=True)
+        ))
+    else:
+        labelled = sorted(pk for pk, p in props.items() if any(t in p for t in target_properties))
+    pids, X = feature_matrix([feature_column(f) for f in features], profiles=labelled)
+    sources = dict(SoilProfile.objects.filter(pk__in=pids.tolist()).values_list("pk", "source__name"))
+
+    if depth_method:
+        from .depth import harmonized_targets
+
+        targets = harmonized_targets(pids.tolist(), intervals, depth_method)
+    else:
+        targets = {t: np.array([number(pk, t) for pk in pids.tolist()]) for t in target_properties}
+    groups = np.array([props.get(pk, {}).get(group_property) or sources.get(pk) or "" for pk in pids.tolist()])
+
+    columns = [X.astype(np.float64)]
+    for name in attributes:
+        raw = [props.get(pk, {}).get(name) for pk in pids.tolist()]
+        values = np.array([number(pk, name) for pk in pids.tolist()])
+        if np.isnan(values).all():
+            codes = {v: i for i, v in enumerate(sorted({v for v in raw if v is not None}))}
+            values = np.array([codes.get(v, np.nan) for v in raw], dtype=np.float64)
+        columns.append(values[:, None])
+    return TrainingData(pids, np.hstack(columns), targets, groups, list(features) + list(attributes))
+
+
+# ---------------------------------------------------------------------------
+# cached preprocessing
+
+_memory = None
+
+
+def memory():
+    """``joblib.Memory`` in ``SOC_TRAINING_CACHE_DIR`` (arguments hashed by content)."""
+    global _memory
+    if _memory is None:
+        from django.conf import settings
+
+        _memory = joblib.Memory(str(settings.SOC_TRAINING_CACHE_DIR), verbose=0)
+    return _memory
+
+
+def _fit_target_transformer(y: np.ndarray, transform: str):
+    return (Log1pTransformer() if transform == "log1p" else YeoJohnsonTransformer()).fit(y)
+
+
+def _fit_preprocessing(X: np.ndarray):
+    imp = SimpleImputer(strategy="median").fit(X)
+    sc = StandardScaler().fit(imp.transform(X))
+    return imp, sc
+
+
+def fit_target_transformer(y, transform):
+    return memory().cache(_fit_target_transformer)(y, transform)
+
+
+def fit_preprocessing(X):
+    return memory().cache(_fit_preprocessing)(X)
+
+
+# ---------------------------------------------------------------------------
+# training
+
+def train_one_fold(X_tr, y_tr, X_va, y_va, sample_w_tr=None, sample_w_va=None, cfg=TrainCfg(), seed=0,
+                   tracker: Optional[LossTracker] = None, prune=None):
+    """Notebook ``train_one_fold`` on CPU; returns ``(model, yhat_va, best_loss)``.
+
+    ``prune(epoch, best_loss)`` is called after every epoch; when it returns
+    true :class:`TrialPruned` is raised.
+    """
+    set_seed(seed)
+    model = MLP(X_tr.shape[1], hidden=cfg.hidden, dropout=cfg.dropout)
+    opt = torch.optim.AdamW(model.parameters(), lr=cfg.lr, weight_decay=cfg.weight_decay)
+    scheduler = torch.optim.lr_scheduler.ReduceLROnPlateau(opt, mode="min", factor=0.5, patience=10)
+
+    ds_tr = TabDataset(X_tr, y_tr, sample_w_tr)
+    ds_va = TabDataset(X_va, y_va, sample_w_va)
+    dl_tr = DataLoader(ds_tr, batch_size=cfg.batch_size, shuffle=True,
+                       generator=torch.Generator().manual_seed(seed))
+    dl_va = DataLoader(ds_va, batch_size=512, shuffle=False)
+
+    best_state, best_loss, no_improve = None, float("inf"), 0
+    for epoch in range(cfg.epochs):
+        model.train()
+        train_loss = 0.0
+        for batch in dl_tr:
+            xb, yb, *wb = batch
+            opt.zero_grad()
+            loss = mse_loss(model(xb), yb, wb[0] if wb else None)
+            loss.backward()
+            opt.step()
+            train_loss += loss.item() * xb.size(0)
+
+        model.eval()
+        val_loss = 0.0
+        with torch.no_grad():
+            for batch in dl_va:
+                xb, yb, *wb = batch
+                val_loss += mse_loss(model(xb), yb, wb[0] if wb else None).item() * xb.size(0)
+        val_loss /= len(ds_va)
+        if tracker is not None:
+            tracker.train.append(train_loss / len(ds_tr))
+            tracker.val.append(val_loss)
+        if math.isnan(val_loss):
+            best_state = {k: v.detach().clone() for k, v in model.state_dict().items()}
+            break
+        scheduler.step(val_loss)
+
+        if epoch == 0 or val_loss < best_loss - 1e-6:
+            best_loss = val_loss
+            best_state = {k: v.detach().clone() for k, v in model.state_dict().items()}
+            no_improve = 0
+        else:
+            no_improve += 1
+            if no_improve >= cfg.patience:
+                break
+        if prune is not None and prune(epoch, best_loss):
+            raise TrialPruned(f"pruned at epoch {epoch}")
+
+    if best_state is not None:
+        model.load_state_dict(best_state)
+    model.eval()
+    with torch.no_grad():
+        yhat_va = model(torch.tensor(X_va, dtype=torch.float32)).numpy().ravel()
+    return model, yhat_va, best_loss
+
+
+def _init_worker(threads: int) -> None:
+    torch.set_num_threads(threads)
+
+
+def _run_fold(args):
+    X, y_t, groups, tr, va, cfg, fold = args
+    imp, sc = fit_preprocessing(X[tr])
+    model, yhat_va_t, best_loss = train_one_fold(
+        sc.transform(imp.transform(X[tr])), y_t[tr],
+        sc.transform(imp.transform(X[va])), y_t[va],
+        site_sample_weights(groups[tr]), site_sample_weights(groups[va]),
+        cfg=cfg, seed=cfg.seed + fold,
+    )
+    return model, imp, sc, yhat_va_t, best_loss
+
+
+def _metrics(y, yhat, groups) -> dict:
+    per_site = {}
+    for site in np.unique(groups):
+        m = groups == site
+        per_site[str(site)] = {
+            "R2": float(r2_score(y[m], yhat[m])) if np.unique(y[m]).size > 1 else None,
+            "RMSE": float(np.sqrt(mean_squared_error(y[m], yhat[m]))),
+            "n": int(m.sum()),
+        }
+    return {
+        "R2": float(r2_score(y, yhat)),
+        "RMSE": float(np.sqrt(mean_squared_error(y, yhat))),
+        "per_site": per_site,
+    }
+
+
+def fit_oof(X, y, groups, cfg: TrainCfg, workers: int = 1, threads: int = 1):
+    """GroupKFold out-of-fold ensemble; folds run in parallel processes."""
+    tt = fit_target_transformer(y, cfg.transform)
+    y_t = tt.transform(y)
+    splits = list(GroupKFold(n_splits=cfg.n_splits).split(X, y_t, groups))
+    jobs = [(X, y_t, groups, tr, va, cfg, fold) for fold, (tr, va) in enumerate(splits)]
+
+    if workers > 1:
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(jobs)),
+            mp_context=get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(threads,),
+        ) as pool:
+            results = list(pool.map(_run_fold, jobs))
+    else:
+        results = [_run_fold(job) for job in jobs]
+
+    oof_t = np.zeros_like(y_t)
+    for (_, va), (_, _, _, yhat_va_t, _) in zip(splits, results):
+        oof_t[va] = yhat_va_t
+    oof = tt.inverse_transform(oof_t)
+    artifact = {
+        "models": [r[0] for r in results],
+        "imputers": [r[1] for r in results],
+        "scalers": [r[2] for r in results],
+        "transformer": tt,
+        "best_losses": [r[4] for r in results],
+    }
+    return oof, artifact, _metrics(y, oof, groups)
+
+
+def fit_full(X, y, transformer, cfg: TrainCfg):
+    """Final model on every row (no early stopping, as in the notebook)."""
+    imp, sc = fit_preprocessing(X)
+    Xs = sc.transform(imp.transform(X))
+    y_t = transformer.transform(y)
+    full_cfg = TrainCfg(**{**asdict(cfg), "epochs": cfg.final_epochs, "patience": cfg.final_epochs + 1})
+    model, _, _ = train_one_fold(Xs, y_t, Xs, y_t, cfg=full_cfg, seed=cfg.seed)
+    return {"model": model, "imputer": imp, "scaler": sc, "transformer": transformer}
+
+
+def train_soc_models(
+    data: TrainingData,
+    cfg10: TrainCfg,
+    cfg30: TrainCfg,
+    workers: int = 1,
+    threads: int = 1,
+    targets: Sequence[str] = (TARGET_10, TARGET_30),
+) -> Dict[str, object]:
+    """Return ``{"soc10": artifact, "soc30": artifact, "metrics": {...}}``.
+
+    ``ValueError`` when ``data`` has profile attributes: the predictor only
+    reads feature-store columns, a bundle using them could not be loaded.
+    """
+    for name in data.features:
+        try:
+            feature_column(name)
+        except ValueError as exc:
+            raise ValueError(f"{exc}; profile attributes are for search_soc_models only") from None
+    target10, target30 = targets
+    y10 = data.targets[target10]
+    m10 = ~np.isnan(y10)
+    X10, g10 = data.X[m10], data.groups[m10]
+    oof10, art10, oof_metrics10 = fit_oof(X10, y10[m10], g10, cfg10, workers, threads)
+    final10 = fit_full(X10, y10[m10], art10["transformer"], cfg10)
+    final10["features"] = data.features
+
+    # SOC30: OOF on the SOC10 OOF prediction, final model on the SOC10 prediction
+    soc10_pred = predict_ensemble(
+        {"models": [final10["model"]], "imputers": [final10["imputer"]],
+         "scalers": [final10["scaler"]], "transformer": final10["transformer"]},
+        data.X,
+    )
+    soc10_oof = np.full(len(data.X), np.nan)
+    soc10_oof[m10] = oof10
+
+    y30 = data.targets[target30]
+    m30 = ~np.isnan(y30)
+    _, art30, oof_metrics30 = fit_oof(
+        np.column_stack([data.X, soc10_oof])[m30], y30[m30], data.groups[m30], cfg30, workers, threads
+    )
+    final30 = fit_full(np.column_stack([data.X, soc10_pred])[m30], y30[m30], art30["transformer"], cfg30)
+    final30["features"] = data.features + [SOC10_FEATURE]
+
+    metrics = {
+        "data_hash": data.digest,
+        "n_profiles": int(len(data.profile_ids)),
+        "soc10": {"oof": oof_metrics10, "n": int(m10.sum()), "cfg": asdict(cfg10)},
+        "soc30": {"oof": oof_metrics30, "n": int(m30.sum()), "cfg": asdict(cfg30)},
+    }
+    for artifact, target, meta in ((final10, target10, metrics["soc10"]), (final30, target30, metrics["soc30"])):
+        artifact.update({"target": target, "metrics": meta, "data_hash": data.digest})
+    return {"soc10": final10, "soc30": final30, "metrics": metrics}
+
+
+def save_bundle(result: Dict[str, object], directory) -> str:
+    """Write the two artifacts and ``metrics.json`` under ``directory``."""
+    os.makedirs(directory, exist_ok=True)
+    joblib.dump(result["soc10"], os.path.join(directory, SOC10_FILE))
+    joblib.dump(result["soc30"], os.path.join(directory, SOC30_FILE))
+    with open(os.path.join(directory, "metrics.json"), "w") as fh:
+        json.dump(result["metrics"], fh, indent=2)
+    return str(directory)
+
+
+def default_bundle_name(data: TrainingData, when: Optional[str] = None) -> str:
+    when = when or dt.datetime.now().strftime("%Y%m%d-%H%M%S")
+    return f"{when}_{data.digest}"
@@ -15,8 +15,21 @@ router = routers.DefaultRouter()
 router.register(r'soil-profiles', views.SoilProfileViewSet)
 router.register(r'layers', views.LayerViewSet)
 router.register(r'sources', views.SourceViewSet)
+router.register(r'zones', views.ZoneViewSet)
+router.register(r'property-sets', views.PropertySetViewSet)
+router.register(r'purge-jobs', views.PurgeJobViewSet)
 
 urlpatterns = [
     path('', views.geostreet_map, name='geostreet-map'),
+    path("api/predict", views.predict_soc, name='predict-soc'),
+    path("api/predictions/<str:depth>/points", views.soc_points, name='soc-points'),
+    path("api/explanations/importance", views.soc_importance, name='soc-importance'),
+    path("api/harmonized", views.harmonized_values, name='harmonized-values'),
+    path("api/profiles.geojson", views.profiles_geojson, name='profiles-geojson'),
+    path("api/sources/stats/", views.source_stats, name='source-stats'),
+    path("api/jobs/<str:kind>/<int:pk>/events", views.job_events, name='job-events'),
+    path("api/zonal-stats", views.zonal_stats, name='zonal-stats'),
+    path("api/rasters/<str:layer>/stats", views.soc_raster_stats, name='soc-raster-stats'),
+    path("tiles/<str:layer>/<int:z>/<int:x>/<int:y>.<str:fmt>", views.soc_tile, name='soc-tile'),
     path("api/", include(router.urls)),
 ]
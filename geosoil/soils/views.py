@@ -1,17 +1,33 @@
+import asyncio
+import csv
+import json
+from datetime import date
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.gzip import gzip_page
 from django.shortcuts import render
 
-from .serializers import SoilProfileSerializer , LayerSerializer, SourceSerializer ,SoilProfileSerializerCsv , LayerSerializerCsv
+from .serializers import SoilProfileSerializer , LayerSerializer, SourceSerializer ,SoilProfileSerializerCsv , LayerSerializerCsv, ZoneSerializer, PropertySetSerializer, SoilProfileNestedSerializer, PurgeJobSerializer
 
 from rest_framework import viewsets
-from rest_framework.permissions import IsAuthenticatedOrReadOnly
+from rest_framework.permissions import IsAdminUser, IsAuthenticatedOrReadOnly
 from rest_framework_gis.filters import GeoFilterSet
 from django_filters import rest_framework as filters
-from .models import SoilProfile, Layer, Source
+from .models import SoilProfile, Layer, Source, Zone, PropertySet, HarmonizedValue, LayerProperty, ProfileProperty, PurgeJob, RefreshRun
+from .features import feature_matrix
+from .indices import INDICES
+from .prediction import get_predictor
+from . import explain, pivot, points, purge, stats, tiles
+from .zonal import zonal_stats as compute_zonal_stats
 
 from rest_framework_gis.filterset import GeoFilterSet
 from rest_framework_gis.filters import GeometryFilter
 from django_filters import filters
-from rest_framework.decorators import action
+from rest_framework.decorators import action, api_view
 
 from rest_framework.response import Response
 from rest_framework import status
@@ -19,6 +35,10 @@ from rest_framework import status
 
 from rest_framework_gis.filters import DistanceToPointFilter
 from django.contrib.gis.db.models import PointField
+from django.contrib.gis.geos import GEOSException, GEOSGeometry, MultiPolygon
+from django.db import connection
+from django.db.models import Prefetch
+from rest_framework.exceptions import ValidationError
 
 class soilProfileFilter(GeoFilterSet):
     """Filter for SoilProfile based on geographic location."""
@@ -44,6 +64,48 @@ class soilProfileFilter(GeoFilterSet):
 #         fields = ['location']
 
 
+NESTED_MAX_IDS = 500
+
+
+def _ids(value, name):
+    try:
+        return [int(v) for v in value.split(",") if v.strip()]
+    except ValueError:
+        raise ValidationError({name: "comma separated integer ids expected"})
+
+
+def filter_layers(queryset, params):
+    """Layers of ``?profile=1,2,...`` overlapping ``?depth_min=``/``?depth_max=`` (cm)."""
+    if params.get("profile"):
+        queryset = queryset.filter(profile_id__in=_ids(params["profile"], "profile"))
+    for name, lookup in (("depth_min", "depth_bottom__gt"), ("depth_max", "depth_top__lt")):
+        if params.get(name):
+            try:
+                queryset = queryset.filter(**{lookup: float(params[name])})
+            except ValueError:
+                raise ValidationError({name: "number expected (cm)"})
+    return queryset
+
+
+def _purge(source, scope):
+    """Start (or return the running) background purge; 202 with the job to poll."""
+    job, created = purge.submit(source, scope)
+    if created:
+        purge.start(job)
+    return Response(PurgeJobSerializer(job).data, status=status.HTTP_202_ACCEPTED,
+                    headers={"Location": f"/api/purge-jobs/{job.pk}/"})
+
+
+def _purge_source(request):
+    name = request.query_params.get("source")
+    if not name:
+        return None
+    try:
+        return Source.objects.get(name=name)
+    except Source.DoesNotExist:
+        raise Http404(f"unknown source {name}")
+
+
 class LayerViewSet(viewsets.ModelViewSet):
     """ViewSet for Layer model."""
     
@@ -53,6 +115,12 @@ class LayerViewSet(viewsets.ModelViewSet):
     filter_backends = (DistanceToPointFilter,)
     # filterset_class = LayerFilter
     
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            queryset = filter_layers(queryset, self.request.query_params).order_by("profile_id", "depth_top")
+        return queryset
+
     
     def get_serializer_class(self):
         """Return the appropriate serializer class based on the action."""
@@ -60,11 +128,10 @@ class LayerViewSet(viewsets.ModelViewSet):
             return LayerSerializerCsv
         else :
             return LayerSerializer
-    @action(detail=False, methods=['get'], )
+    @action(detail=False, methods=['delete'], permission_classes=[IsAdminUser])
     def delete_all_layers(self, request):
-        """Custom action to delete all Layer instances."""
-        Layer.objects.all().delete()
-        return Response({"message": "All layers deleted successfully."}, status=status.HTTP_204_NO_CONTENT)
+        """Delete every layer (or those of ``?source=``) in the background."""
+        return _purge(_purge_source(request), PurgeJob.LAYERS)
     
     @action(detail=False, methods=['post'], url_path='create-from-csv')
     def create_from_csv(self, request):
@@ -90,18 +157,93 @@ class SourceViewSet(viewsets.ModelViewSet):
     queryset = Source.objects.all()
     serializer_class = SourceSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
-    # filter_backends = (
-    # filterset_class = SourceFilter
-    
-    
-    
-    
+
+    @action(detail=True, methods=['post', 'delete'], permission_classes=[IsAdminUser])
+    def purge(self, request, pk=None):
+        """Delete the source's profiles (``scope=profiles``) or only their layers (``scope=layers``).
+
+        Runs in the background, before reloading the source for instance;
+        poll ``/api/purge-jobs/<id>/`` for the progress.
+        """
+        source = self.get_object()
+        scope = request.data.get("scope") or request.query_params.get("scope") or PurgeJob.PROFILES
+        if scope not in dict(PurgeJob.SCOPES):
+            return Response({"error": f"scope must be one of {', '.join(dict(PurgeJob.SCOPES))}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return _purge(source, scope)
+
+
+class PurgeJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """Progress of the background purges."""
+
+    queryset = PurgeJob.objects.select_related("source")
+    serializer_class = PurgeJobSerializer
+    # same audience as the endpoints starting the purges (errors, counts)
+    permission_classes = [IsAdminUser]
+
+
+def _zonal_response(geometry, layers, model_version):
+    unknown = set(layers) - set(tiles.OUTPUTS)
+    if unknown:
+        return Response({"error": f"unknown layers: {', '.join(sorted(unknown))}"}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(compute_zonal_stats(geometry, layers, model_version), status=status.HTTP_200_OK)
+
+
+class ZoneViewSet(viewsets.ReadOnlyModelViewSet):
+    """Stored zones (village zones, grid cells...) and their SOC statistics."""
+
+    queryset = Zone.objects.all()
+    serializer_class = ZoneSerializer
+
+    @action(detail=True, methods=['get'])
+    def stats(self, request, pk=None):
+        """Zonal statistics of the zone (``?layers=soc10,soc30&model_version=``)."""
+        zone = self.get_object()
+        layers = request.query_params.get("layers", ",".join(tiles.OUTPUTS)).split(",")
+        return _zonal_response(zone.geometry, layers, request.query_params.get("model_version"))
+
+
+class PropertySetViewSet(viewsets.ReadOnlyModelViewSet):
+    """Property sets pivoted into wide tables (one typed column per property)."""
+
+    queryset = PropertySet.objects.all()
+    serializer_class = PropertySetSerializer
+    lookup_field = "name"
+
+    @action(detail=True, methods=['get'])
+    def rows(self, request, name=None):
+        """Pivot rows, refreshed first if properties changed.
+
+        ``source`` restricts the profiles, ``output=csv`` returns a file.
+        """
+        ps = self.get_object()
+        profiles = None
+        if request.query_params.get("source"):
+            profiles = SoilProfile.objects.filter(
+                source__name__in=request.query_params["source"].split(",")
+            ).values_list("pk", flat=True)
+        header, rows = pivot.read(ps, profiles)
+
+        if request.query_params.get("output") == "csv":
+            response = HttpResponse(content_type="text/csv")
+            response["Content-Disposition"] = f'attachment; filename="{ps.name}.csv"'
+            writer = csv.writer(response)
+            writer.writerow(header)
+            writer.writerows(("" if v is None else v for v in row) for row in rows)
+            return response
+
+        return Response({
+            "columns": header,
+            "types": [c["type"] for c in ps.columns],
+            "refreshed_at": ps.refreshed_at,
+            "rows": rows,
+        }, status=status.HTTP_200_OK)
 
 
 class SoilProfileViewSet(viewsets.ModelViewSet):
     """ViewSet for SoilProfile model."""
     
-    queryset = SoilProfile.objects.all()
+    queryset = SoilProfile.objects.select_related("source").prefetch_related("features")
     # serializer_class = SoilProfileSerializer
     # permission_classes = [IsAuthenticatedOrReadOnly]
     filter_backends = (DistanceToPointFilter,)
@@ -133,27 +275,173 @@ class SoilProfileViewSet(viewsets.ModelViewSet):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-    @action(detail=False, methods=['get'], )
+    def nested_queryset(self):
+        """Profiles with every level prefetched: one query per level, whatever the batch size.
+
+        The layers (ordered by depth) honour the ``filter_layers`` parameters.
+        """
+        layers = filter_layers(Layer.objects.all(), self.request.query_params).order_by("depth_top")
+        return SoilProfile.objects.select_related("source").prefetch_related(
+            Prefetch("layers", queryset=layers.prefetch_related(
+                Prefetch("properties", queryset=LayerProperty.objects.order_by("name"))
+            )),
+            Prefetch("properties", queryset=ProfileProperty.objects.order_by("name")),
+        )
+
+
+    @action(detail=True, methods=['get'], url_path='nested', url_name='nested-detail')
+    def nested_detail(self, request, pk=None):
+        """Profile with its properties and layers (with their properties)."""
+        try:
+            profile = self.nested_queryset().get(pk=pk)
+        except (SoilProfile.DoesNotExist, ValueError):
+            raise Http404("no such profile")
+        return Response(SoilProfileNestedSerializer(profile).data, status=status.HTTP_200_OK)
+
+
+    @action(detail=False, methods=['get'], url_path='nested')
+    def nested(self, request):
+        """Nested representation of a batch of profiles (``?ids=1,2,...``, at most 500)."""
+        ids = _ids(request.query_params.get("ids", ""), "ids")
+        if not ids:
+            raise ValidationError({"ids": "at least one profile id is required"})
+        if len(ids) > NESTED_MAX_IDS:
+            raise ValidationError({"ids": f"at most {NESTED_MAX_IDS} profiles per request"})
+        profiles = self.nested_queryset().filter(pk__in=ids).order_by("pk")
+        return Response(SoilProfileNestedSerializer(profiles, many=True).data, status=status.HTTP_200_OK)
+
+
+    @action(detail=False, methods=['delete'], permission_classes=[IsAdminUser])
     def delete_all_soil_profiles(self, request):
-        """Custom action to delete all SoilProfile instances."""
-        SoilProfile.objects.all().delete()
-        return Response({"message": "All soil profiles deleted successfully."}, status=status.HTTP_204_NO_CONTENT)
+        """Delete every profile (or those of ``?source=``) in the background."""
+        return _purge(_purge_source(request), PurgeJob.PROFILES)
+
+
+    @action(detail=True, methods=['get'], )
+    def timeseries(self, request, pk=None):
+        """Remote-sensing composites of a profile, one entry per sensor and window.
+
+        Optional filters: ``sensor``, ``band`` (comma separated), ``start`` and
+        ``end`` (YYYY-MM-DD, applied to the window bounds).
+        """
+        profile = self.get_object()
+        features = profile.features.exclude(window_start=None).order_by("sensor", "window_start", "window_end")
+
+        params = request.query_params
+        try:
+            if params.get("start"):
+                features = features.filter(window_start__gte=date.fromisoformat(params["start"]))
+            if params.get("end"):
+                features = features.filter(window_end__lte=date.fromisoformat(params["end"]))
+        except ValueError:
+            return Response({"error": "start/end must be YYYY-MM-DD"}, status=status.HTTP_400_BAD_REQUEST)
+        if params.get("sensor"):
+            features = features.filter(sensor__in=params["sensor"].split(","))
+        if params.get("band"):
+            features = features.filter(band__in=params["band"].split(","))
+
+        series = {}
+        for f in features.values("sensor", "window_start", "window_end", "band", "value"):
+            windows = series.setdefault(f["sensor"], [])
+            window = (f["window_start"], f["window_end"])
+            if not windows or (windows[-1]["window_start"], windows[-1]["window_end"]) != window:
+                windows.append({"window_start": f["window_start"], "window_end": f["window_end"], "bands": {}})
+            windows[-1]["bands"][f["band"]] = f["value"]
+        return Response({"profile": profile.pk, "series": series}, status=status.HTTP_200_OK)
+
+
+    @action(detail=True, methods=['get'], )
+    def soc(self, request, pk=None):
+        """SOC10/SOC30 predicted from the profile's stored bands."""
+        profile = self.get_object()
+        try:
+            predictor = get_predictor()
+        except FileNotFoundError as exc:
+            return Response({"error": f"SOC model not available: {exc}"}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+        _, X = feature_matrix(predictor.columns, profiles=[profile.pk])
+        if not len(X):
+            return Response({"error": "No remote-sensing features for this profile."}, status=status.HTTP_404_NOT_FOUND)
+        soc10, soc30 = predictor.predict(X)[0].tolist()
+        return Response({
+            "profile": profile.pk,
+            "model_version": predictor.version,
+            "SOC10": soc10,
+            "SOC30": soc30,
+        }, status=status.HTTP_200_OK)
+
+
+    @action(detail=True, methods=['get'], )
+    def explanation(self, request, pk=None):
+        """Precomputed SHAP contributions of the profile's SOC10/SOC30 (``?model_version=``)."""
+        profile = self.get_object()
+        result = explain.profile_explanation(profile.pk, request.query_params.get("model_version"))
+        if result is None:
+            return Response({"error": "No explanation for this profile yet."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(result, status=status.HTTP_200_OK)
+
+
+    @action(detail=True, methods=['get'], )
+    def harmonized(self, request, pk=None):
+        """Layer values harmonised over the standard depth intervals (``harmonize_layers``)."""
+        profile = self.get_object()
+        rows = profile.harmonized_values.order_by("variable", "method", "depth_top")
+        if request.query_params.get("method"):
+            rows = rows.filter(method=request.query_params["method"])
+        return Response({
+            "profile": profile.pk,
+            "values": list(rows.values("variable", "method", "depth_top", "depth_bottom", "value", "computed_at")),
+        }, status=status.HTTP_200_OK)
+
+
+    @action(detail=False, methods=['get'], url_path='feature-matrix')
+    def feature_matrix(self, request):
+        """Profile × feature matrix from the feature store (bands and indices).
+
+        ``columns`` is a comma separated list of ``SENSOR:BAND`` (defaults to
+        every registered spectral index), ``source`` restricts the profiles,
+        ``start``/``end`` select one window and ``output=csv`` returns a file.
+        """
+        params = request.query_params
+        if params.get("columns"):
+            columns = [tuple(c.split(":", 1)) for c in params["columns"].split(",")]
+            if any(len(c) != 2 for c in columns):
+                return Response({"error": "columns must be SENSOR:BAND,..."}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            columns = [(ix.sensor, ix.name) for ix in INDICES.values()]
+
+        profiles = None
+        if params.get("source"):
+            profiles = SoilProfile.objects.filter(source__name__in=params["source"].split(","))
+        ids, X = feature_matrix(columns, profiles, params.get("start"), params.get("end"))
+        codes = dict(SoilProfile.objects.filter(pk__in=ids.tolist()).values_list("pk", "code"))
+        header = [f"{sensor}:{band}" for sensor, band in columns]
+
+        if params.get("output") == "csv":
+            response = HttpResponse(content_type="text/csv")
+            response["Content-Disposition"] = 'attachment; filename="feature_matrix.csv"'
+            writer = csv.writer(response)
+            writer.writerow(["id", "code", *header])
+            for pid, row in zip(ids.tolist(), X.tolist()):
+                writer.writerow([pid, codes.get(pid), *("" if v != v else v for v in row)])
+            return response
+
+        return Response({
+            "columns": header,
+            "profiles": [{"id": pid, "code": codes.get(pid)} for pid in ids.tolist()],
+            "values": [[None if v != v else v for v in row] for row in X.tolist()],
+        }, status=status.HTTP_200_OK)
 
 
     @action(detail=False, methods=['get'], )
     def filter_sources(self, request):
         """Custom action to filter sources based on a query parameter."""
         query = request.query_params.get('query', []).split(',')
-        print(f"Query: {query}")
-        
-        
+
+        profiles = SoilProfile.objects.select_related("source").prefetch_related("features")
         if query:
-            profiles = SoilProfile.objects.filter(source__name__in=query)
-        else:
-            profiles = SoilProfile.objects.all()
-            
-            
-        print(f"Filtered Profiles Count: {profiles.count()}")
+            profiles = profiles.filter(source__name__in=query)
+
         serializer = SoilProfileSerializer(profiles, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
@@ -162,7 +450,286 @@ class SoilProfileViewSet(viewsets.ModelViewSet):
 def geostreet_map(request):
     """Display an OpenStreetMap using Leaflet."""
 
-    sources = Source.objects.all()
+    # profile counts come from SourceStats (one join, no COUNT per source)
+    sources = Source.objects.select_related("stats").order_by("name")
 
     return render(request, "soils/map.html", {"sources": sources})
 
+
+@api_view(['POST'])
+def predict_soc(request):
+    """Predict SOC10/SOC30 for posted feature rows.
+
+    Body: ``{"features": [{"SR_B1": ..., ...}, ...]}`` (a single object is
+    accepted too). All rows go through the models in one batch, with the live
+    model or the registered ``?model_version=`` (A/B comparisons).
+    """
+    rows = request.data.get("features") if isinstance(request.data, dict) else request.data
+    if isinstance(rows, dict):
+        rows = [rows]
+    if not isinstance(rows, list) or not all(isinstance(r, dict) for r in rows):
+        return Response({"error": "features must be an object or a list of objects"}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        predictor = get_predictor(request.query_params.get("model_version"))
+    except KeyError:
+        return Response({"error": "unknown model_version"}, status=status.HTTP_404_NOT_FOUND)
+    except FileNotFoundError as exc:
+        return Response({"error": f"SOC model not available: {exc}"}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    Y = predictor.predict_records(rows)
+    return Response({
+        "model_version": predictor.version,
+        "features": predictor.features,
+        "predictions": [{"SOC10": soc10, "SOC30": soc30} for soc10, soc30 in Y.tolist()],
+    }, status=status.HTTP_200_OK)
+
+
+async def soc_tile(request, layer, z, x, y, fmt):
+    """XYZ tile of a SOC raster (``layer`` is soc10 or soc30), PNG or WebP."""
+    if fmt not in tiles.FORMATS:
+        raise Http404("unknown tile format")
+    try:
+        # file reads and encoding, no database: any executor thread will do
+        body, version = await sync_to_async(tiles.render_tile, thread_sensitive=False)(layer, z, x, y, fmt)
+    except (KeyError, FileNotFoundError):
+        raise Http404(f"no raster for {layer}")
+
+    etag = f'"{layer}-{version}-{z}-{x}-{y}"'
+    if request.headers.get("If-None-Match") == etag:
+        response = HttpResponse(status=304)
+    else:
+        response = HttpResponse(body, content_type=tiles.FORMATS[fmt][1])
+    response["ETag"] = etag
+    patch_cache_control(response, public=True, max_age=86400)
+    return response
+
+
+async def soc_raster_stats(request, layer):
+    """Colour breaks, bounds and model version of a SOC raster."""
+    try:
+        result = await sync_to_async(tiles.raster_stats, thread_sensitive=False)(layer)
+    except (KeyError, FileNotFoundError):
+        raise Http404(f"no raster for {layer}")
+    return JsonResponse(result)
+
+
+@api_view(['POST'])
+def zonal_stats(request):
+    """SOC statistics over a polygon.
+
+    Body: ``{"geometry": <GeoJSON Polygon/MultiPolygon>}`` or ``{"zone": <id>}``,
+    optionally ``"layers"`` and ``"model_version"``.
+    """
+    data = request.data if isinstance(request.data, dict) else {}
+    if data.get("zone") is not None:
+        try:
+            geometry = Zone.objects.get(pk=data["zone"]).geometry
+        except (Zone.DoesNotExist, ValueError):
+            return Response({"error": "unknown zone"}, status=status.HTTP_404_NOT_FOUND)
+    else:
+        try:
+            geometry = GEOSGeometry(json.dumps(data.get("geometry")))
+        except (GEOSException, ValueError, TypeError):
+            return Response({"error": "geometry must be a GeoJSON polygon"}, status=status.HTTP_400_BAD_REQUEST)
+        if geometry.geom_type == "Polygon":
+            geometry = MultiPolygon(geometry, srid=geometry.srid)
+        if geometry.geom_type != "MultiPolygon":
+            return Response({"error": "geometry must be a GeoJSON polygon"}, status=status.HTTP_400_BAD_REQUEST)
+
+    return _zonal_response(geometry, data.get("layers") or list(tiles.OUTPUTS), data.get("model_version"))
+
+
+async def soc_importance(request):
+    """Global SHAP importance (mean |SHAP| per feature) of a model version."""
+    result = await sync_to_async(explain.global_importance)(request.GET.get("model_version"))
+    if result is None:
+        raise Http404("no explanations yet")
+    response = JsonResponse(result)
+    patch_cache_control(response, public=True, max_age=300)
+    return response
+
+
+@gzip_page
+async def harmonized_values(request):
+    """Harmonised layer values of one interval for every profile.
+
+    ``method`` (spline), ``variable`` (carbon_content), ``top``/``bottom``
+    (0/10 cm), ``source`` and ``output=csv``.
+    """
+    params = request.GET
+    try:
+        top, bottom = int(params.get("top", 0)), int(params.get("bottom", 10))
+    except ValueError:
+        return JsonResponse({"error": "top and bottom must be integers (cm)"}, status=400)
+    rows = HarmonizedValue.objects.filter(
+        method=params.get("method", HarmonizedValue.SPLINE),
+        variable=params.get("variable", "carbon_content"),
+        depth_top=top,
+        depth_bottom=bottom,
+        value__isnull=False,
+    )
+    if params.get("source"):
+        rows = rows.filter(profile__source__name__in=params["source"].split(","))
+    rows = rows.order_by("profile_id").values_list("profile_id", "profile__code", "value")
+    rows = [row async for row in rows.aiterator(chunk_size=5000)]
+
+    if params.get("output") == "csv":
+        response = HttpResponse(content_type="text/csv")
+        response["Content-Disposition"] = f'attachment; filename="harmonized_{top}_{bottom}.csv"'
+        writer = csv.writer(response)
+        writer.writerow(["profile", "code", "value"])
+        writer.writerows(rows)
+        return response
+    return JsonResponse({
+        "depth_top": top,
+        "depth_bottom": bottom,
+        "values": [{"profile": pk, "code": code, "value": value} for pk, code, value in rows],
+    })
+
+
+@gzip_page
+async def soc_points(request, depth):
+    """Point predictions of one depth (soc10/soc30) as compact typed arrays.
+
+    See :mod:`soils.points` for the layout; ``?model_version=`` defaults to
+    the live model version (:func:`soils.registry.serving_version`).
+    """
+    try:
+        body = await points.acached_points(depth, request.GET.get("model_version"))
+    except KeyError:
+        raise Http404(f"unknown depth {depth}")
+    if body is None:
+        raise Http404("no predictions yet")
+    response = HttpResponse(body, content_type=points.CONTENT_TYPE)
+    patch_cache_control(response, public=True, max_age=300)
+    return response
+
+
+async def source_stats(request):
+    """Precomputed per-source statistics (counts, extent, remote-sensing coverage)."""
+    response = JsonResponse(await stats.asummary())
+    patch_cache_control(response, public=True, max_age=60)
+    return response
+
+
+@gzip_page
+async def profiles_geojson(request):
+    """Profiles of ``?source=A,B`` as a streamed GeoJSON FeatureCollection (map layer).
+
+    Only the profile columns are sent; see ``soil-profiles/<id>/nested/``
+    for the layers and properties. Under WSGI the stream is a plain
+    iterator: Django would read an async one into memory before sending it.
+    """
+    profiles = SoilProfile.objects.order_by("pk").values_list(
+        "pk", "code", "profile_id", "pays", "location", "source__name"
+    )
+    if request.GET.get("source"):
+        profiles = profiles.filter(source__name__in=request.GET["source"].split(","))
+
+    def feature(row, separator):
+        pk, code, profile_id, pays, location, source = row
+        return separator + json.dumps({
+            "type": "Feature",
+            "id": pk,
+            "geometry": {"type": "Point", "coordinates": [location.x, location.y]},
+            "properties": {"code": code, "profile_id": profile_id, "pays": pays, "source": {"name": source}},
+        })
+
+    async def afeatures():
+        yield '{"type": "FeatureCollection", "features": ['
+        separator = ""
+        async for row in profiles.aiterator(chunk_size=2000):
+            yield feature(row, separator)
+            separator = ","
+        yield "]}"
+
+    def features():
+        yield '{"type": "FeatureCollection", "features": ['
+        separator = ""
+        for row in profiles.iterator(chunk_size=2000):
+            yield feature(row, separator)
+            separator = ","
+        yield "]}"
+
+    stream = afeatures() if isinstance(request, ASGIRequest) else features()
+    return StreamingHttpResponse(stream, content_type="application/geo+json")
+
+
+SSE_POLL_SECONDS = 1
+SSE_KEEPALIVE_SECONDS = 15
+SSE_MAX_SECONDS = 3600
+
+# progress of the long-running jobs streamed by job_events
+JOB_PROGRESS = {
+    "purge": (PurgeJob, lambda job: {
+        "id": job.pk,
+        "status": job.status,
+        "total": job.total,
+        "deleted": job.deleted,
+        "progress": job.progress,
+        "error": job.error,
+        "finished": job.status in (PurgeJob.DONE, PurgeJob.FAILED),
+    }),
+    "refresh": (RefreshRun, lambda run: {
+        "id": run.pk,
+        "selected": run.profiles_selected,
+        "processed": run.profiles_processed,
+        "requests": run.requests_made,
+        "features": run.features_written,
+        "errors": run.errors,
+        "progress": run.profiles_processed / run.profiles_selected if run.profiles_selected else 0.0,
+        "finished": run.finished_at is not None,
+    }),
+}
+
+
+async def job_events(request, kind, pk):
+    """Server-sent events with the progress of a job until it finishes.
+
+    ``kind`` is ``purge`` (:class:`PurgeJob`) or ``refresh``
+    (``refresh_remote_sensing`` runs). Each change is one ``data:`` event;
+    the stream ends with an ``end`` event. ASGI only (``geosoil-asgi``):
+    under WSGI the events would only be sent once the job is over, while
+    the stream holds a worker thread, so the request gets a 501.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse(
+            {"error": "server-sent events need the ASGI service (geosoil-asgi); "
+                      "purge jobs can be polled at /api/purge-jobs/<id>/"},
+            status=501,
+        )
+    try:
+        model, describe = JOB_PROGRESS[kind]
+    except KeyError:
+        raise Http404(f"unknown job kind {kind}")
+    if not await model.objects.filter(pk=pk).aexists():
+        raise Http404(f"no {kind} job {pk}")
+
+    async def events():
+        loop = asyncio.get_running_loop()
+        started = sent = loop.time()
+        last = None
+        while loop.time() - started < SSE_MAX_SECONDS:
+            job = await model.objects.filter(pk=pk).afirst()
+            if job is None:
+                break
+            state = describe(job)
+            if state != last:
+                yield f"data: {json.dumps(state, cls=DjangoJSONEncoder)}\n\n"
+                last, sent = state, loop.time()
+            elif loop.time() - sent > SSE_KEEPALIVE_SECONDS:
+                yield ": keepalive\n\n"
+                sent = loop.time()
+            if state["finished"]:
+                break
+            # back to the pool while sleeping: an open stream must not hold a connection
+            await sync_to_async(connection.close)()
+            await asyncio.sleep(SSE_POLL_SECONDS)
+        yield "event: end\ndata: {}\n\n"
+
+    response = StreamingHttpResponse(events(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # no buffering by nginx in front
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -0,0 +1,185 @@
+"""SOC statistics over a polygon, from the rasters and from the point predictions.
+
+Raster statistics read only the blocks of the polygon's bounding window in the
+COGs, mask them with the polygon and accumulate block by block: count, mean,
+min/max and total are exact, quantiles come from a fine histogram over the
+raster range, so memory does not grow with the polygon. Pixel values are taken
+as stocks in t/ha, the total in tonnes is their sum times the pixel area.
+
+Point statistics aggregate :class:`~soils.models.SocPrediction` in PostGIS.
+Results are cached on the geometry hash and the raster / prediction versions.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+from typing import TYPE_CHECKING, Dict, Iterable, Sequence
+
+import numpy as np
+from django.contrib.gis.geos import GEOSGeometry
+from django.core.cache import caches
+from django.db.models import Aggregate, Avg, Count, FloatField, Max, Min
+
+from .models import SocPrediction
+from .prediction import OUTPUTS
+from .registry import serving_version
+from .tiles import raster_path, raster_stats, raster_version
+
+if TYPE_CHECKING:
+    from rasterio.windows import Window
+
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+HIST_BINS = 4096
+# pixels per side of the blocks read inside the polygon's window
+READ_BLOCK = 2048
+
+
+class PercentileCont(Aggregate):
+    """PostgreSQL ``percentile_cont(p) WITHIN GROUP (ORDER BY expr)``."""
+
+    function = "percentile_cont"
+    template = "%(function)s(%(percentile)s) WITHIN GROUP (ORDER BY %(expressions)s)"
+    output_field = FloatField()
+
+    def __init__(self, expression, percentile: float, **extra):
+        super().__init__(expression, percentile=float(percentile), **extra)
+
+
+def _blocks(window: Window, size: int) -> Iterable[Window]:
+    from rasterio.windows import Window
+
+    for row in range(0, int(window.height), size):
+        for col in range(0, int(window.width), size):
+            yield Window(
+                window.col_off + col, window.row_off + row,
+                min(size, window.width - col), min(size, window.height - row),
+            )
+
+
+def _hist_quantiles(hist: np.ndarray, edges: np.ndarray, qs: Sequence[float]) -> Dict[str, float]:
+    cdf = np.cumsum(hist)
+    out = {}
+    for q in qs:
+        target = q * cdf[-1]
+        i = int(np.searchsorted(cdf, target))
+        i = min(i, len(hist) - 1)
+        before = cdf[i - 1] if i else 0
+        frac = (target - before) / hist[i] if hist[i] else 0.0
+        out[f"p{round(q * 100):02d}"] = float(edges[i] + frac * (edges[i + 1] - edges[i]))
+    return out
+
+
+def raster_zonal_stats(layer: str, geometry: GEOSGeometry) -> dict:
+    """Stats of the ``layer`` raster pixels whose centre falls in ``geometry``."""
+    import rasterio
+    from rasterio.errors import WindowError
+    from rasterio.features import geometry_mask, geometry_window
+    from rasterio.warp import transform_geom
+
+    path = raster_path(layer)
+    info = raster_stats(layer)
+    stats = {"layer": layer, "pixel_count": 0}
+
+    with rasterio.open(path) as src:
+        shape = transform_geom(f"EPSG:{geometry.srid or 4326}", src.crs, json.loads(geometry.geojson))
+        try:
+            window = geometry_window(src, [shape])
+        except WindowError:
+            return stats
+        if info["min"] is None:
+            return stats
+
+        edges = np.linspace(info["min"], info["max"], HIST_BINS + 1)
+        hist = np.zeros(HIST_BINS, dtype=np.int64)
+        count, total = 0, 0.0
+        vmin, vmax = np.inf, -np.inf
+        for block in _blocks(window, READ_BLOCK):
+            data = src.read(1, window=block, masked=True).astype(np.float64).filled(np.nan)
+            inside = geometry_mask([shape], out_shape=data.shape, transform=src.window_transform(block), invert=True)
+            values = data[inside & np.isfinite(data)]
+            if not values.size:
+                continue
+            hist += np.histogram(np.clip(values, edges[0], edges[-1]), bins=edges)[0]
+            count += values.size
+            total += float(values.sum())
+            vmin, vmax = min(vmin, float(values.min())), max(vmax, float(values.max()))
+
+        pixel_ha = abs(src.transform.a * src.transform.e) / 10_000 if src.crs.is_projected else None
+
+    if not count:
+        return stats
+    stats.update({
+        "pixel_count": count,
+        "mean": total / count,
+        "min": vmin,
+        "max": vmax,
+        "quantiles": _hist_quantiles(hist, edges, QUANTILES),
+        "area_ha": count * pixel_ha if pixel_ha else None,
+        "total_tonnes": total * pixel_ha if pixel_ha else None,
+    })
+    return stats
+
+
+def point_zonal_stats(geometry: GEOSGeometry, model_version: str) -> dict:
+    """Count/mean/min/max/quartiles of the predictions of profiles in ``geometry``."""
+    aggregates = {}
+    for depth in OUTPUTS:
+        aggregates.update({
+            f"{depth}_count": Count(depth),
+            f"{depth}_mean": Avg(depth),
+            f"{depth}_min": Min(depth),
+            f"{depth}_max": Max(depth),
+            **{f"{depth}_p{round(q * 100):02d}": PercentileCont(depth, q) for q in QUANTILES},
+        })
+    row = SocPrediction.objects.filter(
+        model_version=model_version, profile__location__within=geometry
+    ).aggregate(**aggregates)
+
+    return {
+        depth: {
+            "count": row[f"{depth}_count"],
+            "mean": row[f"{depth}_mean"],
+            "min": row[f"{depth}_min"],
+            "max": row[f"{depth}_max"],
+            "quantiles": {f"p{round(q * 100):02d}": row[f"{depth}_p{round(q * 100):02d}"] for q in QUANTILES},
+        }
+        for depth in OUTPUTS
+    }
+
+
+def zonal_stats(geometry: GEOSGeometry, layers: Sequence[str] = OUTPUTS, model_version: str = None) -> dict:
+    """Raster and point statistics of ``geometry``, cached until an input changes."""
+    model_version = model_version or serving_version()
+    versions = {}
+    for layer in layers:
+        try:
+            versions[layer] = raster_version(layer)
+        except FileNotFoundError:
+            versions[layer] = None
+    predicted = (
+        SocPrediction.objects.filter(model_version=model_version).aggregate(at=Max("predicted_at"))["at"]
+        if model_version else None
+    )
+
+    digest = hashlib.sha256(geometry.ewkb).hexdigest()
+    key = "zonal:" + hashlib.sha256(json.dumps(
+        [digest, versions, model_version, str(predicted)], sort_keys=True
+    ).encode()).hexdigest()
+    cache = caches["tiles"]
+    result = cache.get(key)
+    if result is not None:
+        return result
+
+    result = {
+        "geometry_hash": digest,
+        "rasters": {
+            layer: raster_zonal_stats(layer, geometry) if version is not None else None
+            for layer, version in versions.items()
+        },
+        "points": {
+            "model_version": model_version,
+            **(point_zonal_stats(geometry, model_version) if model_version else {}),
+        },
+    }
+    cache.set(key, result)
+    return result